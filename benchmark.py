@@ -0,0 +1,263 @@
+import sys
+import time
+
+import numpy as np
+
+from bitboard import BitboardGame2048, packed_board, unpack_board
+from game2048 import make_game
+from observations import OBSERVATION_ENCODERS
+from rl_env import Game2048RLEnv
+
+# name -> setup(seed) returning a run() callable that does some work and
+# returns the number of operations it performed
+BENCHMARKS = {}
+
+MOVES = ('move_left', 'move_up', 'move_right', 'move_down')
+REWARD_COMPONENTS = ('_corner_strategy_reward', '_smoothness_penalty',
+                     '_monotonicity_bonus', '_empty_cells_bonus')
+
+
+def benchmark(name):
+    """Register a benchmark setup function under `name`"""
+    def register(setup):
+        BENCHMARKS[name] = setup
+        return setup
+    return register
+
+
+def sample_states(num_boards=1000, seed=0, size=4):
+    """Packed boards visited by seeded random-policy games"""
+    rng = np.random.default_rng(seed)
+    states = []
+    while len(states) < num_boards:
+        game = BitboardGame2048(rng, size)
+        while game.can_move() and len(states) < num_boards:
+            states.append(game.state)
+            if game._move(int(rng.integers(4))):
+                game.add_new_tile()
+    return states
+
+
+def _register_engine_benchmarks(engine):
+    def moves(method):
+        def setup(seed):
+            states = sample_states(seed=seed)
+            game = make_game(engine)
+            move = getattr(game, method)
+
+            # Restoring the board is part of the timing; keep it cheap
+            if engine == 'bitboard':
+                def run():
+                    for state in states:
+                        game.state = state
+                        move()
+                    return len(states)
+            else:
+                boards = [unpack_board(state) for state in states]
+
+                def run():
+                    for board in boards:
+                        game.board = [row[:] for row in board]
+                        move()
+                    return len(boards)
+            return run
+        return setup
+
+    # afterstates() computes all four moves of a board at once
+    for method in MOVES + ('afterstates',):
+        benchmark(f'engine.{engine}.{method}')(moves(method))
+
+    def query(method):
+        def setup(seed):
+            games = []
+            for board in (unpack_board(state) for state in sample_states(seed=seed)):
+                game = make_game(engine)
+                game.board = board
+                games.append(getattr(game, method))
+
+            def run():
+                for call in games:
+                    call()
+                return len(games)
+            return run
+        return setup
+
+    for method in ('can_move', 'get_max_tile'):
+        benchmark(f'engine.{engine}.{method}')(query(method))
+
+    @benchmark(f'rollout.{engine}.random')
+    def rollout(seed):
+        def run():
+            rng = np.random.default_rng(seed)
+            moves = 0
+            for _ in range(20):
+                game = make_game(engine, rng=rng)
+                step = (game.move_left, game.move_up, game.move_right, game.move_down)
+                while game.can_move():
+                    if step[rng.integers(4)]():
+                        game.add_new_tile()
+                    moves += 1
+            return moves
+        return run
+
+
+for _engine in ('classic', 'bitboard'):
+    _register_engine_benchmarks(_engine)
+
+
+def _register_size_benchmarks(size):
+    # Other board sizes: table lookups up to 5x5, the sliding fallback beyond
+    @benchmark(f'engine.bitboard.{size}x{size}.afterstates')
+    def afterstates(seed):
+        states = sample_states(seed=seed, size=size)
+        board = packed_board(size)
+
+        def run():
+            for state in states:
+                board.afterstates(state)
+            return len(states)
+        return run
+
+
+for _size in (3, 5, 6):
+    _register_size_benchmarks(_size)
+
+
+def _register_env_step_benchmark(size):
+    @benchmark('env.step' if size == 4 else f'env.{size}x{size}.step')
+    def env_step(seed):
+        env = Game2048RLEnv(size=size)
+        actions = np.random.default_rng(seed).integers(4, size=5000).tolist()
+
+        def run():
+            env.reset(seed=seed)
+            for action in actions:
+                obs, reward, done, truncated, info = env.step(action)
+                if done:
+                    env.reset()
+            return len(actions)
+        return run
+
+
+for _size in (4, 3, 5, 6):
+    _register_env_step_benchmark(_size)
+
+
+@benchmark('env.get_valid_actions')
+def env_valid_actions(seed):
+    env = Game2048RLEnv()
+    states = sample_states(seed=seed)
+
+    def run():
+        for state in states:
+            env.game.state = state
+            env.get_valid_actions()
+        return len(states)
+    return run
+
+
+def _register_reward_benchmark(component):
+    @benchmark(f'reward.{component.strip("_")}')
+    def setup(seed):
+        env = Game2048RLEnv()
+        states = sample_states(seed=seed)
+        call = getattr(env, component)
+
+        def run():
+            for state in states:
+                env.game.state = state
+                call()
+            return len(states)
+        return run
+
+
+for _component in REWARD_COMPONENTS:
+    _register_reward_benchmark(_component)
+
+
+@benchmark('reward.total')
+def reward_total(seed):
+    env = Game2048RLEnv()
+    states = sample_states(seed=seed)
+
+    def run():
+        for state in states:
+            env.game.state = state
+            env._calculate_enhanced_reward(True, 0, 2)
+        return len(states)
+    return run
+
+
+def _register_observation_benchmark(observation):
+    @benchmark(f'observation.{observation}')
+    def setup(seed):
+        env = Game2048RLEnv(observation=observation)
+        states = sample_states(seed=seed)
+
+        def run():
+            for state in states:
+                env.game.state = state
+                env._get_observation()
+            return len(states)
+        return run
+
+
+for _observation in OBSERVATION_ENCODERS:
+    _register_observation_benchmark(_observation)
+
+
+@benchmark('vec_env.step_1024')
+def vec_env_step(seed):
+    from vec_env import VectorGame2048Env
+
+    env = VectorGame2048Env(1024)
+    env.reset(seed=seed)
+    actions = np.random.default_rng(seed).integers(4, size=(50, 1024))
+
+    def run():
+        for step_actions in actions:
+            env.step(step_actions)
+        return actions.size
+    return run
+
+
+def run_benchmarks(names=None, repeats=5, seed=0):
+    """Run benchmarks and return {name: best ops/sec over `repeats` runs}"""
+    results = {}
+    for name in names or BENCHMARKS:
+        run = BENCHMARKS[name](seed)
+        run()  # warm up caches and lazily built tables
+        best = 0.0
+        for _ in range(repeats):
+            start = time.perf_counter()
+            ops = run()
+            elapsed = time.perf_counter() - start
+            best = max(best, ops / elapsed)
+        results[name] = best
+    return results
+
+
+def compare(results, baseline, threshold=0.1):
+    """Names of benchmarks more than `threshold` slower than the baseline"""
+    regressions = []
+    for name, ops_per_sec in results.items():
+        reference = baseline.get(name)
+        if reference and ops_per_sec < reference * (1 - threshold):
+            regressions.append(name)
+    return regressions
+
+
+def print_results(results, baseline=None, regressions=()):
+    for name, ops_per_sec in results.items():
+        line = f"{name:40s} {ops_per_sec:14,.0f} ops/sec"
+        if baseline and name in baseline:
+            change = ops_per_sec / baseline[name] - 1
+            line += f"  {change:+7.1%}"
+            if name in regressions:
+                line += "  REGRESSION"
+        print(line)
+
+
+if __name__ == "__main__":
+    from cli import main as cli_main
+    sys.exit(cli_main(['bench', *sys.argv[1:]]))
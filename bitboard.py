@@ -0,0 +1,685 @@
+import array
+from functools import lru_cache
+import os
+
+from game2048 import TileSpawner
+
+# Board layout: the 4x4 board is packed into one 64-bit integer of 4-bit
+# tile exponents (0 = empty, 1 = 2, 2 = 4, ..., 15 = 32768). Cell (i, j)
+# lives in nibble 4 * i + j counted from the least significant end, so row i
+# is the 16-bit word (state >> 16 * i) & 0xFFFF with column j at nibble j.
+# Other board sizes use the same layout with N nibbles per row (PackedBoard).
+# A nibble holds at most a 32768 tile, so two 32768 tiles cannot merge: the
+# move tables leave them apart, and BitboardGame2048 stops with an
+# OverflowError rather than play on differently from Game2048.
+ROW_MASK = 0xFFFF
+MAX_EXPONENT = 15
+
+# Largest board size with per-row move tables (16 ** size entries each);
+# larger boards slide all of their lines at once with slide_lines()
+TABLE_MAX_SIZE = 5
+# Where the move tables of each size are cached between runs
+TABLE_DIR = os.environ.get('GAME2048_TABLE_DIR',
+                           os.path.join(os.path.expanduser('~'), '.cache', '2048rl'))
+# Rows remembered by a PackedBoard without tables before starting over
+_ROW_CACHE_LIMIT = 1 << 20
+# Bump when the table contents change, so stale cache files are ignored
+_TABLE_VERSION = 1
+# array typecodes of the cached 4x4 lookup tables (see _build_tables()).
+# Loading them needs no NumPy, which the table-building functions import
+# when called, so 4x4 games such as the terminal game start without it.
+_LOOKUP_TYPECODES = ('H', 'H', 'Q', 'Q', 'I', 'B', 'B')
+
+
+def line_keys(lines):
+    """Pack (..., N) exponent lines into integer line keys (nibble j = column j)"""
+    import numpy as np
+
+    lines = np.asarray(lines).astype(np.uint64)
+    keys = lines[..., 0].copy()
+    for j in range(1, lines.shape[-1]):
+        keys |= lines[..., j] << np.uint64(4 * j)
+    return keys
+
+
+def key_lines(keys, size):
+    """Unpack integer line keys into (..., size) uint8 exponent lines"""
+    import numpy as np
+
+    keys = np.asarray(keys).astype(np.uint64)
+    shifts = np.arange(0, 4 * size, 4, dtype=np.uint64)
+    return ((keys[..., None] >> shifts) & np.uint64(0xF)).astype(np.uint8)
+
+
+def slide_lines(lines):
+    """Slide (N, L) exponent lines towards index 0, merging each pair once
+
+    Returns (new_lines, score_gain). This builds the move tables and is
+    the move itself for boards too large to have them.
+    """
+    import numpy as np
+
+    lines = np.asarray(lines, dtype=np.uint8)
+    # A stable sort moves the empty cells to the end, keeping the tiles in order
+    tiles = np.take_along_axis(lines, np.argsort(lines == 0, axis=1, kind='stable'), axis=1)
+    score = np.zeros(len(lines), dtype=np.int64)
+    for j in range(lines.shape[1] - 1):
+        # A merged tile leaves an empty cell behind, so it cannot merge again
+        merge = (tiles[:, j] != 0) & (tiles[:, j] == tiles[:, j + 1]) & (tiles[:, j] < MAX_EXPONENT)
+        tiles[merge, j] += 1
+        tiles[merge, j + 1] = 0
+        score[merge] += np.left_shift(1, tiles[merge, j].astype(np.int64))
+    tiles = np.take_along_axis(tiles, np.argsort(tiles == 0, axis=1, kind='stable'), axis=1)
+    return tiles, score
+
+
+def _build_move_tables(size):
+    import numpy as np
+
+    keys = np.arange(16 ** size, dtype=np.uint64)
+    lines = key_lines(keys, size)
+    left, score = slide_lines(lines)
+    right, _ = slide_lines(lines[:, ::-1])
+    # Equal tiles form runs that merge pairwise the same way from either
+    # end, so the score gain does not depend on the direction.
+    return line_keys(left), line_keys(right[:, ::-1]), score
+
+
+@lru_cache(maxsize=None)
+def load_move_tables(size):
+    """(left, right, score) row tables of a board size, as numpy arrays
+
+    Indexed by a row key (nibble j = column j): the row slid towards
+    column 0, slid towards the last column, and the score gained either
+    way. Built once per size and cached in TABLE_DIR.
+    """
+    import zipfile
+
+    import numpy as np
+
+    if not 2 <= size <= TABLE_MAX_SIZE:
+        raise ValueError(f"Move tables are built for sizes 2 to {TABLE_MAX_SIZE}, not {size}")
+    path = os.path.join(TABLE_DIR, f'move_tables_v{_TABLE_VERSION}_{size}.npz')
+    try:
+        with np.load(path) as tables:
+            return tables['left'], tables['right'], tables['score']
+    except (OSError, KeyError, ValueError, zipfile.BadZipFile):
+        pass
+
+    left, right, score = _build_move_tables(size)
+    dtype = np.uint16 if size <= 4 else np.uint32
+    left, right, score = left.astype(dtype), right.astype(dtype), score.astype(np.uint32)
+    try:
+        os.makedirs(TABLE_DIR, exist_ok=True)
+        # Written under a per-process name and renamed, as worker processes
+        # may build the same tables at once
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            np.savez(f, left=left, right=right, score=score)
+        os.replace(tmp, path)
+    except OSError:
+        pass  # Read-only home: rebuild next time
+    return left, right, score
+
+
+def lookup_table(values):
+    """A numpy table as a Python sequence that is fast to index
+
+    Lists up to 4x4 tables (65536 entries); larger tables become compact
+    array.array objects, as a list of a million ints takes tens of MB.
+    """
+    import numpy as np
+
+    if len(values) <= 65536:
+        return values.tolist()
+    return array.array('I', values.astype(np.uintc).tobytes())
+
+
+def _unpack_col(row):
+    """Spread the nibbles of 16-bit rows down one column of the board"""
+    return ((row & 0xF) | ((row & 0xF0) << 12) |
+            ((row & 0xF00) << 24) | ((row & 0xF000) << 36))
+
+
+def _compute_tables():
+    import numpy as np
+
+    left, right, score = load_move_tables(4)
+    keys = np.arange(65536, dtype=np.uint64)
+    left = left.astype(np.uint64)
+    right = right.astype(np.uint64)
+
+    # Bit 0: the row changes when slid towards nibble 0, bit 1: towards nibble 3
+    row_moves = (left != keys).astype(np.uint8) | ((right != keys).astype(np.uint8) << 1)
+    row_empty = (key_lines(keys, 4) == 0).sum(axis=1)
+
+    return (left.tolist(), right.tolist(), _unpack_col(left).tolist(),
+            _unpack_col(right).tolist(), score.tolist(), row_moves.tolist(),
+            row_empty.tolist())
+
+
+def _build_tables():
+    """Python lists of the 4x4 row tables for fast scalar lookups
+
+    They are cached in TABLE_DIR as raw arrays that load without NumPy;
+    only a missing or stale cache builds them from the move tables.
+    """
+    path = os.path.join(TABLE_DIR, f'lookup_tables_v{_TABLE_VERSION}_4.bin')
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+        tables = []
+        offset = 0
+        for typecode in _LOOKUP_TYPECODES:
+            table = array.array(typecode)
+            end = offset + 65536 * table.itemsize
+            table.frombytes(data[offset:end])
+            tables.append(table.tolist())
+            offset = end
+        if offset == len(data) and len(tables[-1]) == 65536:
+            return tuple(tables)
+    except (OSError, ValueError):
+        pass
+
+    tables = _compute_tables()
+    try:
+        os.makedirs(TABLE_DIR, exist_ok=True)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            for typecode, table in zip(_LOOKUP_TYPECODES, tables):
+                array.array(typecode, table).tofile(f)
+        os.replace(tmp, path)
+    except OSError:
+        pass
+    return tables
+
+
+ROW_LEFT, ROW_RIGHT, COL_UP, COL_DOWN, ROW_SCORE, ROW_MOVES, ROW_EMPTY = _build_tables()
+
+
+def transpose(state):
+    """Transpose a packed board so that columns become rows"""
+    a1 = state & 0xF0F00F0FF0F00F0F
+    a2 = state & 0x0000F0F00000F0F0
+    a3 = state & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
+
+
+def pack_board(board):
+    """Pack a (square) list board of tile values into a 64-bit integer"""
+    state = 0
+    shift = 0
+    for row in board:
+        for value in row:
+            if value:
+                exponent = value.bit_length() - 1
+                if value != 1 << exponent or not 0 < exponent <= MAX_EXPONENT:
+                    raise ValueError(f"Tile value {value} cannot be packed")
+                state |= exponent << shift
+            shift += 4
+    return state
+
+
+def game_state(game):
+    """Packed board of any engine's game, without repacking a bitboard"""
+    state = getattr(game, 'state', None)
+    return state if state is not None else pack_board(game.board)
+
+
+def unpack_board(state, size=4):
+    """Unpack a packed board into a size x size list of tile values"""
+    board = []
+    for i in range(size):
+        row = []
+        for j in range(size):
+            exponent = (state >> (4 * (size * i + j))) & 0xF
+            row.append(1 << exponent if exponent else 0)
+        board.append(row)
+    return board
+
+
+def move_state(state, action):
+    """Apply a move to a packed board, returning (new_state, score_gain)
+
+    Actions use the environment ordering: 0=left, 1=up, 2=right, 3=down.
+    """
+    if action == 0 or action == 2:
+        table = ROW_LEFT if action == 0 else ROW_RIGHT
+        r0 = state & ROW_MASK
+        r1 = (state >> 16) & ROW_MASK
+        r2 = (state >> 32) & ROW_MASK
+        r3 = state >> 48
+        result = table[r0] | (table[r1] << 16) | (table[r2] << 32) | (table[r3] << 48)
+    else:
+        table = COL_UP if action == 1 else COL_DOWN
+        t = transpose(state)
+        r0 = t & ROW_MASK
+        r1 = (t >> 16) & ROW_MASK
+        r2 = (t >> 32) & ROW_MASK
+        r3 = t >> 48
+        result = table[r0] | (table[r1] << 4) | (table[r2] << 8) | (table[r3] << 12)
+    score = ROW_SCORE[r0] + ROW_SCORE[r1] + ROW_SCORE[r2] + ROW_SCORE[r3]
+    return result, score
+
+
+def afterstates(state):
+    """(afterstate, score gain, moved) of each action on a packed board
+
+    In action order (0=left, 1=up, 2=right, 3=down). The rows are split
+    once for left and right and the transpose once for up and down; the
+    score gain of a line is the same in both directions.
+    """
+    r0 = state & ROW_MASK
+    r1 = (state >> 16) & ROW_MASK
+    r2 = (state >> 32) & ROW_MASK
+    r3 = state >> 48
+    left = ROW_LEFT[r0] | (ROW_LEFT[r1] << 16) | (ROW_LEFT[r2] << 32) | (ROW_LEFT[r3] << 48)
+    right = ROW_RIGHT[r0] | (ROW_RIGHT[r1] << 16) | (ROW_RIGHT[r2] << 32) | (ROW_RIGHT[r3] << 48)
+    horizontal = ROW_SCORE[r0] + ROW_SCORE[r1] + ROW_SCORE[r2] + ROW_SCORE[r3]
+
+    t = transpose(state)
+    c0 = t & ROW_MASK
+    c1 = (t >> 16) & ROW_MASK
+    c2 = (t >> 32) & ROW_MASK
+    c3 = t >> 48
+    up = COL_UP[c0] | (COL_UP[c1] << 4) | (COL_UP[c2] << 8) | (COL_UP[c3] << 12)
+    down = COL_DOWN[c0] | (COL_DOWN[c1] << 4) | (COL_DOWN[c2] << 8) | (COL_DOWN[c3] << 12)
+    vertical = ROW_SCORE[c0] + ROW_SCORE[c1] + ROW_SCORE[c2] + ROW_SCORE[c3]
+
+    return ((left, horizontal, left != state), (up, vertical, up != state),
+            (right, horizontal, right != state), (down, vertical, down != state))
+
+
+def game_afterstates(game):
+    """afterstates() of any engine's game, as packed boards"""
+    if hasattr(game, 'state'):
+        return game.afterstates()
+    return tuple((pack_board(board), gain, moved) for board, gain, moved in game.afterstates())
+
+
+def legal_moves(state):
+    """Bit mask of the moves that change a packed board
+
+    Bit a is set when action a (0=left, 1=up, 2=right, 3=down) is legal.
+    """
+    t = transpose(state)
+    horizontal = (ROW_MOVES[state & ROW_MASK] | ROW_MOVES[(state >> 16) & ROW_MASK] |
+                  ROW_MOVES[(state >> 32) & ROW_MASK] | ROW_MOVES[state >> 48])
+    vertical = (ROW_MOVES[t & ROW_MASK] | ROW_MOVES[(t >> 16) & ROW_MASK] |
+                ROW_MOVES[(t >> 32) & ROW_MASK] | ROW_MOVES[t >> 48])
+    return (horizontal & 1) | ((vertical & 1) << 1) | ((horizontal & 2) << 1) | ((vertical & 2) << 2)
+
+
+def can_move(state):
+    """Whether any move changes a packed board
+
+    Cheaper than legal_moves(): the rows are checked first and the board
+    is only transposed when no row can move.
+    """
+    if (ROW_MOVES[state & ROW_MASK] or ROW_MOVES[(state >> 16) & ROW_MASK] or
+            ROW_MOVES[(state >> 32) & ROW_MASK] or ROW_MOVES[state >> 48]):
+        return True
+    t = transpose(state)
+    return bool(ROW_MOVES[t & ROW_MASK] or ROW_MOVES[(t >> 16) & ROW_MASK] or
+                ROW_MOVES[(t >> 32) & ROW_MASK] or ROW_MOVES[t >> 48])
+
+
+def count_empty(state):
+    """Count the empty cells of a packed board"""
+    return (ROW_EMPTY[state & ROW_MASK] + ROW_EMPTY[(state >> 16) & ROW_MASK] +
+            ROW_EMPTY[(state >> 32) & ROW_MASK] + ROW_EMPTY[state >> 48])
+
+
+def empty_cell_shift(state, k):
+    """Bit offset of the k-th empty cell (row-major) of a packed board"""
+    # Skip whole rows, then nibbles, until the k-th empty cell
+    shift = 0
+    while k >= ROW_EMPTY[(state >> shift) & ROW_MASK]:
+        k -= ROW_EMPTY[(state >> shift) & ROW_MASK]
+        shift += 16
+    while True:
+        if not (state >> shift) & 0xF:
+            if k == 0:
+                return shift
+            k -= 1
+        shift += 4
+
+
+def max_exponent(state):
+    """Largest tile exponent on a packed board"""
+    best = 0
+    while state:
+        exponent = state & 0xF
+        if exponent > best:
+            best = exponent
+        state >>= 4
+    return best
+
+
+class PackedBoard:
+    """The packed-board functions above for any board size
+
+    An NxN board packs the same way as the 4x4 one, into a Python int of
+    4 * N * N bits: cell (i, j) is nibble N * i + j and row i the 4N-bit
+    key (state >> 4 * N * i) & row_mask. Up to TABLE_MAX_SIZE rows move by
+    table lookups (load_move_tables()); larger boards slide all of their
+    lines at once with slide_lines(). PackedBoard(4) hands out the
+    unrolled module functions. Use packed_board() to share instances.
+    """
+
+    def __init__(self, size):
+        if size < 2:
+            raise ValueError(f"Board size must be at least 2, got {size}")
+        self.size = size
+        self.cells = size * size
+        self.row_bits = 4 * size
+        self.row_mask = (1 << self.row_bits) - 1
+        self.row_shifts = tuple(range(0, 4 * self.cells, self.row_bits))
+        self.cell_shifts = tuple(range(0, 4 * self.cells, 4))
+        # Lowest bit of every nibble
+        self._nibble_ones = sum(1 << shift for shift in self.cell_shifts)
+        # Lowest bit of the nibbles with a right (last column) and a lower
+        # (last row) neighbour
+        self._inner_cols = sum(1 << 4 * (size * i + j) for i in range(size) for j in range(size - 1))
+        self._inner_rows = sum(1 << 4 * (size * i + j) for i in range(size - 1) for j in range(size))
+        # The diagonal stays put; every other nibble moves from one shift to another
+        self._diagonal = sum(0xF << (4 * (size + 1) * i) for i in range(size))
+        self._transpose_shifts = tuple((4 * (size * i + j), 4 * (size * j + i))
+                                       for i in range(size) for j in range(size) if i != j)
+        if size <= TABLE_MAX_SIZE:
+            self._left, self._right, self._score = map(lookup_table, load_move_tables(size))
+        else:
+            self._left = self._right = self._score = None
+        # Row key -> (left, right, score) of the rows seen so far, without tables
+        self._row_cache = {}
+
+        if size == 4:
+            self.transpose = transpose
+            self.move_state = move_state
+            self.afterstates = afterstates
+            self.legal_moves = legal_moves
+            self.can_move = can_move
+            self.count_empty = count_empty
+            self.empty_cell_shift = empty_cell_shift
+
+    def __reduce__(self):
+        return packed_board, (self.size,)
+
+    def rows(self, state):
+        """Row keys of a packed board, top to bottom"""
+        mask = self.row_mask
+        return [(state >> shift) & mask for shift in self.row_shifts]
+
+    def join_rows(self, rows):
+        """Inverse of rows()"""
+        state = 0
+        for shift, row in zip(self.row_shifts, rows):
+            state |= row << shift
+        return state
+
+    def transpose(self, state):
+        """Transpose a packed board so that columns become rows"""
+        result = state & self._diagonal
+        for source, target in self._transpose_shifts:
+            result |= ((state >> source) & 0xF) << target
+        return result
+
+    def _row_results(self, rows):
+        """(left, right, score) table entries of each row key
+
+        Boards without tables slide the rows they have not seen yet all at
+        once and remember the results, up to _ROW_CACHE_LIMIT rows.
+        """
+        cache = self._row_cache
+        missing = [row for row in rows if row not in cache]
+        if missing:
+            if len(cache) > _ROW_CACHE_LIMIT:
+                cache.clear()
+            lines = key_lines(missing, self.size)
+            left, score = slide_lines(lines)
+            right, _ = slide_lines(lines[:, ::-1])
+            cache.update(zip(missing, zip(line_keys(left).tolist(),
+                                          line_keys(right[:, ::-1]).tolist(), score.tolist())))
+        return [cache[row] for row in rows]
+
+    def slide_rows(self, rows):
+        """(rows slid left, rows slid right, score gain) of a list of row keys"""
+        if self._left is not None:
+            left, right, score = self._left, self._right, self._score
+            return ([left[row] for row in rows], [right[row] for row in rows],
+                    sum([score[row] for row in rows]))
+        results = self._row_results(rows)
+        return ([result[0] for result in results], [result[1] for result in results],
+                sum([result[2] for result in results]))
+
+    def move_state(self, state, action):
+        """Apply a move to a packed board, returning (new_state, score_gain)"""
+        vertical = action & 1
+        if vertical:
+            state = self.transpose(state)
+        rows = self.rows(state)
+        if self._left is not None:
+            table = self._left if action < 2 else self._right
+            score = self._score
+            result = self.join_rows([table[row] for row in rows])
+            score = sum([score[row] for row in rows])
+        else:
+            index = 0 if action < 2 else 1
+            results = self._row_results(rows)
+            result = self.join_rows([entry[index] for entry in results])
+            score = sum([entry[2] for entry in results])
+        if vertical:
+            result = self.transpose(result)
+        return result, score
+
+    def afterstates(self, state):
+        """(afterstate, score gain, moved) of each action on a packed board"""
+        left, right, horizontal = self.slide_rows(self.rows(state))
+        left = self.join_rows(left)
+        right = self.join_rows(right)
+        up, down, vertical = self.slide_rows(self.rows(self.transpose(state)))
+        up = self.transpose(self.join_rows(up))
+        down = self.transpose(self.join_rows(down))
+        return ((left, horizontal, left != state), (up, vertical, up != state),
+                (right, horizontal, right != state), (down, vertical, down != state))
+
+    def legal_moves(self, state):
+        """Bit mask of the moves that change a packed board
+
+        Found without moving: a direction is legal when a tile has an empty
+        cell on that side or an equal neighbour along the line (two 32768
+        tiles excepted). All cells are checked at once on the packed board.
+        """
+        ones = self._nibble_ones
+        occupied = state | (state >> 1)
+        occupied = (occupied | (occupied >> 2)) & ones
+        empty = occupied ^ ones
+        mergeable = occupied & ~(state & (state >> 1) & (state >> 2) & (state >> 3))
+        moves = 0
+        for shift, inner, towards, away in ((4, self._inner_cols, 1, 4),
+                                            (self.row_bits, self._inner_rows, 2, 8)):
+            differ = state ^ (state >> shift)
+            differ = differ | (differ >> 1)
+            differ = (differ | (differ >> 2)) & ones
+            pairs = mergeable & ~differ & inner
+            if pairs or empty & (occupied >> shift) & inner:
+                moves |= towards
+            if pairs or occupied & (empty >> shift) & inner:
+                moves |= away
+        return moves
+
+    def can_move(self, state):
+        """Whether any move changes a packed board"""
+        return self.legal_moves(state) != 0
+
+    def count_max_tiles(self, state):
+        """Count the 32768 tiles (all four bits of the nibble set)"""
+        return (state & (state >> 1) & (state >> 2) & (state >> 3) & self._nibble_ones).bit_count()
+
+    def merges_max_tiles(self, state):
+        """Whether Game2048 could merge two 32768 tiles of a packed board
+
+        True when a row or column holds two of them with only empty cells
+        in between, which a packed board cannot merge.
+        """
+        for rows in (self.rows(state), self.rows(self.transpose(state))):
+            for row in rows:
+                prev = 0
+                for shift in range(0, self.row_bits, 4):
+                    exponent = (row >> shift) & 0xF
+                    if exponent:
+                        if exponent == prev == MAX_EXPONENT:
+                            return True
+                        prev = exponent
+        return False
+
+    def count_empty(self, state):
+        """Count the empty cells of a packed board"""
+        occupied = state | (state >> 1)
+        occupied |= occupied >> 2
+        return self.cells - (occupied & self._nibble_ones).bit_count()
+
+    def empty_cell_shift(self, state, k):
+        """Bit offset of the k-th empty cell (row-major) of a packed board"""
+        for shift in self.cell_shifts:
+            if not (state >> shift) & 0xF:
+                if k == 0:
+                    return shift
+                k -= 1
+        raise ValueError("No such empty cell")
+
+
+@lru_cache(maxsize=None)
+def packed_board(size=4):
+    """The shared PackedBoard of a board size"""
+    return PackedBoard(size)
+
+
+class BitboardGame2048:
+    """Drop-in replacement for Game2048 backed by a packed board
+
+    A 64-bit integer for the 4x4 board, 4 * size * size bits for other
+    sizes (see PackedBoard). Tiles are stored as 4-bit exponents, so the
+    largest representable tile is 32768. Where Game2048 could go on to merge
+    two of them, a move or a board assignment raises OverflowError instead.
+    Assigning game.state directly skips that check.
+    """
+
+    def __init__(self, rng=None, size=4):
+        self.size = size
+        # The board functions of this size, bound once
+        board = packed_board(size)
+        self._move_state = board.move_state
+        self._all_afterstates = board.afterstates
+        self._legal_moves = board.legal_moves
+        self._can_move = board.can_move
+        self._count_empty = board.count_empty
+        self._empty_cell_shift = board.empty_cell_shift
+        self.state = 0
+        self.score = 0
+        # Whether the board holds two 32768 tiles, checked by every move
+        self._max_tiles = False
+        self._decoded = (None, None)
+        self._afterstates = (None, None)
+        # Per-game numpy Generator; pass one in for reproducible games
+        self.spawner = TileSpawner(rng)
+        self.add_new_tile()
+        self.add_new_tile()
+
+    @property
+    def board(self):
+        """size x size list of tile values, decoded from the packed state
+
+        Each access returns new lists, so editing them does not change the
+        game; assign a whole board to game.board to do that. The decoded rows
+        are cached until the state changes.
+        """
+        state, rows = self._decoded
+        if state != self.state:
+            rows = tuple(map(tuple, unpack_board(self.state, self.size)))
+            self._decoded = (self.state, rows)
+        return [list(row) for row in rows]
+
+    @board.setter
+    def board(self, board):
+        self.state = pack_board(board)
+        self._check_max_tiles()
+
+    def _check_max_tiles(self):
+        """Raise OverflowError if Game2048 could merge two 32768 tiles here"""
+        board = packed_board(self.size)
+        self._max_tiles = board.count_max_tiles(self.state) >= 2
+        if self._max_tiles and board.merges_max_tiles(self.state):
+            raise OverflowError("Two 32768 tiles could merge, which a packed board cannot hold")
+
+    def add_new_tile(self):
+        """Add a new tile (2 or 4) to a random empty cell"""
+        state = self.state
+        num_empty = self._count_empty(state)
+        if num_empty:
+            k, exponent = self.spawner.draw(num_empty)
+            self.state = state | (exponent << self._empty_cell_shift(state, k))
+
+    def afterstates(self):
+        """(afterstate, score gain, moved) of each action on the current board
+
+        Packed afterstates in action order (0=left, 1=up, 2=right, 3=down),
+        cached until the board changes; the next move reuses them.
+        """
+        state, results = self._afterstates
+        if state != self.state:
+            results = self._all_afterstates(self.state)
+            self._afterstates = (self.state, results)
+        return results
+
+    def _move(self, action):
+        state, results = self._afterstates
+        if state == self.state:
+            new_state, score, moved = results[action]
+        else:
+            new_state, score = self._move_state(self.state, action)
+        if new_state == self.state:
+            return False
+        self.state = new_state
+        self.score += score
+        # A merge into a 32768 tile scores at least 32768
+        if self._max_tiles or score >= 1 << MAX_EXPONENT:
+            self._check_max_tiles()
+        return True
+
+    def move_left(self):
+        """Move all tiles to the left"""
+        return self._move(0)
+
+    def move_up(self):
+        """Move all tiles up"""
+        return self._move(1)
+
+    def move_right(self):
+        """Move all tiles to the right"""
+        return self._move(2)
+
+    def move_down(self):
+        """Move all tiles down"""
+        return self._move(3)
+
+    def can_move(self):
+        """Check if any move is possible"""
+        return self._can_move(self.state)
+
+    def is_won(self):
+        """Check if player has reached 2048"""
+        state = self.state
+        for shift in range(0, 4 * self.size * self.size, 4):
+            if (state >> shift) & 0xF == 11:
+                return True
+        return False
+
+    def get_max_tile(self):
+        """Get the maximum tile value"""
+        exponent = max_exponent(self.state)
+        return 1 << exponent if exponent else 0
@@ -0,0 +1,160 @@
+import copy
+import glob
+import os
+import pickle
+import queue
+import random
+import threading
+
+import numpy as np
+import torch
+from stable_baselines3.common.callbacks import BaseCallback
+
+# Algorithm attributes that carry the training loop position: timestep and
+# update counters, the exploration schedule and the pending observation
+_MODEL_ATTRIBUTES = ('num_timesteps', '_n_calls', '_n_updates', '_episode_num',
+                     '_current_progress_remaining', 'exploration_rate', '_last_obs',
+                     '_last_episode_starts', '_last_original_obs', 'ep_info_buffer',
+                     'ep_success_buffer')
+
+
+def checkpoint_path(checkpoint_dir, num_timesteps):
+    return os.path.join(checkpoint_dir, f'checkpoint_{num_timesteps:012d}.pt')
+
+
+def list_checkpoints(checkpoint_dir):
+    """Checkpoint files in checkpoint_dir, oldest first"""
+    return sorted(glob.glob(os.path.join(checkpoint_dir, 'checkpoint_*.pt')))
+
+
+def latest_checkpoint(checkpoint_dir):
+    checkpoints = list_checkpoints(checkpoint_dir)
+    return checkpoints[-1] if checkpoints else None
+
+
+def capture_state(model, callbacks=(), config=None):
+    """Copy everything needed to continue training model exactly
+
+    That is the policy (online and target networks) and optimizer state,
+    the training loop counters and exploration schedule position, the
+    replay buffer, the envs (their games and RNGs included), the global
+    NumPy/torch/random RNG states and the state of any callback offering
+    get_state(). The copy no longer shares memory with the model, so it
+    can be written out while training goes on.
+    """
+    rng = {
+        'numpy': np.random.get_state(),
+        'torch': torch.get_rng_state(),
+        'random': random.getstate(),
+    }
+    if torch.cuda.is_available():
+        rng['cuda'] = torch.cuda.get_rng_state_all()
+    return {
+        'config': config,
+        'policy': {name: tensor.detach().cpu().clone()
+                   for name, tensor in model.policy.state_dict().items()},
+        'optimizer': copy.deepcopy(model.policy.optimizer.state_dict()),
+        'attributes': copy.deepcopy({name: getattr(model, name, None)
+                                     for name in _MODEL_ATTRIBUTES}),
+        'replay_buffer': copy.deepcopy(model.replay_buffer),
+        # Envs and the action space (whose RNG drives random actions) are
+        # pickled now, as they change on the next step
+        'env': pickle.dumps(model.get_env()),
+        'action_space': pickle.dumps(model.action_space),
+        'rng': rng,
+        'callbacks': [callback.get_state() for callback in callbacks],
+    }
+
+
+def load_checkpoint(path):
+    return torch.load(path, map_location='cpu', weights_only=False)
+
+
+def restore_state(model, state, callbacks=()):
+    """Put a state from capture_state() back into a freshly built model"""
+    model.policy.load_state_dict(state['policy'])
+    model.policy.optimizer.load_state_dict(state['optimizer'])
+    for name, value in state['attributes'].items():
+        setattr(model, name, value)
+    model.replay_buffer = state['replay_buffer']
+    model.env = pickle.loads(state['env'])
+    model.action_space = pickle.loads(state['action_space'])
+
+    rng = state['rng']
+    np.random.set_state(rng['numpy'])
+    torch.set_rng_state(rng['torch'])
+    random.setstate(rng['random'])
+    if 'cuda' in rng and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(rng['cuda'])
+
+    for callback, callback_state in zip(callbacks, state['callbacks']):
+        callback.load_state(callback_state)
+
+
+class AsyncCheckpointCallback(BaseCallback):
+    """Checkpoint training every save_freq steps from a background thread
+
+    The state is captured in the training thread at the start of a rollout,
+    where the DQN loop is between a gradient update and the next env step,
+    so restoring it continues the run exactly. The end of training is such
+    a point too, and a final checkpoint is taken there, so a finished run
+    can be resumed with a larger total. Only the file writing happens on
+    the background thread. The newest keep_last checkpoints are kept.
+    callbacks are the other callbacks whose state is saved alongside.
+
+    A MemmapReplayBuffer is saved by reference to its files, which keep
+    changing after the checkpoint; once it has wrapped around, resuming
+    from it is no longer exact.
+    """
+
+    def __init__(self, save_freq, checkpoint_dir='checkpoints', keep_last=3,
+                 callbacks=(), config=None, verbose=1):
+        super().__init__(verbose)
+        self.save_freq = save_freq
+        self.checkpoint_dir = checkpoint_dir
+        self.keep_last = keep_last
+        self.callbacks = callbacks
+        self.config = config
+        self._last_save = 0
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def _on_training_start(self) -> None:
+        os.makedirs(self.checkpoint_dir, exist_ok=True)
+        self._last_save = self.num_timesteps
+        self._thread = threading.Thread(target=self._run, name='checkpoint', daemon=True)
+        self._thread.start()
+
+    def _on_rollout_start(self) -> None:
+        if self.num_timesteps - self._last_save >= self.save_freq:
+            self.save()
+
+    def _on_step(self) -> bool:
+        return True
+
+    def _on_training_end(self) -> None:
+        if self.num_timesteps > self._last_save:
+            self.save()
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+
+    def save(self):
+        """Capture the training state now and queue it for writing"""
+        self._last_save = self.num_timesteps
+        state = capture_state(self.model, self.callbacks, self.config)
+        self._queue.put((checkpoint_path(self.checkpoint_dir, self.num_timesteps), state))
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            path, state = item
+            torch.save(state, path + '.tmp')
+            os.replace(path + '.tmp', path)
+            for old in list_checkpoints(self.checkpoint_dir)[:-self.keep_last]:
+                os.remove(old)
+            if self.verbose:
+                print(f"Checkpoint written to '{path}'")
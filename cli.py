@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+
+import argparse
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+
+# Module behind each subcommand. It is imported only once the command line
+# has been parsed, so a subcommand loads just the dependencies it uses and
+# `play` starts without NumPy, torch or stable-baselines3.
+COMMAND_MODULES = {
+    'play': 'main',
+    'train': 'train_dqn',
+    'eval': 'evaluate',
+    'watch': 'test_agent',
+    'bench': 'benchmark',
+}
+
+# evaluate.PLAYERS, repeated here so that parsing imports nothing
+PLAYERS = ('dqn', 'expectimax', 'ntuple', 'random')
+
+# Modules `play` must not import, and the time its imports may take in a
+# fresh interpreter (best of several runs, seconds)
+PLAY_FORBIDDEN_MODULES = ('numpy', 'torch', 'stable_baselines3', 'gymnasium')
+PLAY_IMPORT_BUDGET = 0.15
+
+
+def load_command(command):
+    """Import the module running a subcommand"""
+    return importlib.import_module(COMMAND_MODULES[command])
+
+
+def measure_startup(command='play', repeats=5):
+    """Time the imports of a subcommand in fresh interpreters
+
+    Returns (seconds, modules): the best of repeats runs, after one
+    untimed run that warms the table caches (see bitboard.py), and the
+    top-level packages the subcommand loaded.
+    """
+    code = ("import sys, time\n"
+            "start = time.perf_counter()\n"
+            "import cli\n"
+            f"cli.load_command({command!r})\n"
+            "print(time.perf_counter() - start)\n"
+            "print(' '.join(sorted({name.split('.')[0] for name in sys.modules})))\n")
+    repo_dir = os.path.dirname(os.path.abspath(__file__))
+    best = None
+    for run in range(repeats + 1):
+        result = subprocess.run([sys.executable, '-c', code], cwd=repo_dir,
+                                capture_output=True, text=True, check=True)
+        elapsed, modules = result.stdout.splitlines()[-2:]
+        if run > 0 and (best is None or float(elapsed) < best):
+            best = float(elapsed)
+    return best, modules.split()
+
+
+def check_play_startup(budget=PLAY_IMPORT_BUDGET, repeats=5):
+    """Check that `play` avoids the heavy dependencies and its import budget"""
+    elapsed, modules = measure_startup('play', repeats)
+    heavy = [name for name in PLAY_FORBIDDEN_MODULES if name in modules]
+    print(f"play imports: {elapsed * 1000:.1f} ms (budget {budget * 1000:.0f} ms)")
+    if heavy:
+        print(f"play imports heavy dependencies: {', '.join(heavy)}")
+    return not heavy and elapsed <= budget
+
+
+def _play(main, args):
+    if args.autoplay == 'expectimax':
+        from expectimax import ExpectimaxAgent
+        agent = ExpectimaxAgent(max_depth=args.depth, time_budget=args.time_budget,
+                                workers=args.workers)
+        try:
+            main.autoplay(agent, engine=args.engine, delay=args.delay, fps=args.fps)
+        finally:
+            agent.close()
+    else:
+        main.main(engine=args.engine, fps=args.fps or 60, size=args.size)
+
+
+def _train(train_dqn, args):
+    train_dqn.train_enhanced_dqn(
+        num_envs=args.num_envs, profile=args.profile, buffer_size=args.buffer_size,
+        augment=args.augment, replay_dir=args.replay_dir, total_timesteps=args.timesteps,
+        checkpoint_dir=args.checkpoint_dir, checkpoint_freq=args.checkpoint_freq,
+        keep_checkpoints=args.keep_checkpoints, resume=args.resume,
+        expert_data=args.expert_data, pretrain=args.pretrain, size=args.size,
+        hyperparams=args.hyperparams, seed=args.seed)
+
+
+def _eval(evaluate, args):
+    report = evaluate.evaluate(
+        args.player, num_games=args.games, workers=args.workers, seed=args.seed,
+        max_steps=args.max_steps, model_path=args.model, depth=args.depth,
+        time_budget=args.time_budget, include_games=args.include_games,
+        batch_size=args.batch_size, record_file=args.record, record_spawns=args.record_spawns)
+    evaluate.print_report(report)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to '{args.report}'")
+
+
+def _watch(test_agent, args):
+    if args.detailed:
+        test_agent.test_single_game_detailed(model_path=args.model, delay=args.delay)
+    else:
+        test_agent.watch_agent(args.player, num_games=args.games, delay=args.delay,
+                               fps=args.fps, model_path=args.model, depth=args.depth,
+                               time_budget=args.time_budget)
+
+
+def _bench(benchmark, args):
+    if args.list:
+        print("\n".join(benchmark.BENCHMARKS))
+        return 0
+
+    names = [name for name in benchmark.BENCHMARKS
+             if not args.benchmarks or any(name.startswith(p) for p in args.benchmarks)]
+    results = benchmark.run_benchmarks(names, repeats=args.repeats, seed=args.seed)
+
+    baseline = None
+    regressions = []
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+        regressions = benchmark.compare(results, baseline, args.threshold)
+    benchmark.print_results(results, baseline, regressions)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.machine(),
+                'seed': args.seed,
+                'results': results,
+            }, f, indent=2)
+        print(f"Baseline written to '{args.save_baseline}'")
+
+    if regressions:
+        print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+        return 1
+    return 0
+
+
+COMMANDS = {'play': _play, 'train': _train, 'eval': _eval, 'watch': _watch, 'bench': _bench}
+
+
+def _add_player_arguments(parser):
+    parser.add_argument('--model', default=None, help="DQN model or n-tuple weights file")
+    parser.add_argument('--depth', type=int, default=2,
+                        help="expectimax search depth")
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help="expectimax seconds per move")
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m cli',
+                                     description="2048 game, agents and training")
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+
+    play = commands.add_parser('play', help="play 2048 in the terminal",
+                               description="Play 2048 in the terminal")
+    play.add_argument('--engine', default='bitboard', choices=['classic', 'bitboard'])
+    play.add_argument('--size', type=int, default=4, help="board size (interactive play)")
+    play.add_argument('--autoplay', choices=['expectimax'],
+                      help="let an agent play instead of reading the keyboard")
+    play.add_argument('--depth', type=int, default=3, help="expectimax search depth")
+    play.add_argument('--time-budget', type=float, default=None,
+                      help="expectimax seconds per move")
+    play.add_argument('--workers', type=int, default=4,
+                      help="expectimax worker processes (0 = search in-process)")
+    play.add_argument('--delay', type=float, default=0.0, help="seconds between moves")
+    play.add_argument('--fps', type=float, default=None,
+                      help="autoplay: redraw at most this often while the agent plays "
+                           "at full speed; interactive: input polls per second (default 60)")
+
+    train = commands.add_parser('train', help="train the enhanced DQN agent",
+                                description="Train the enhanced DQN agent")
+    train.add_argument('--num-envs', type=int, default=1,
+                       help="games stepped together through the NumPy vector env")
+    train.add_argument('--buffer-size', type=int, default=200000)
+    train.add_argument('--augment', action='store_true',
+                       help="sample replay transitions under random board symmetries")
+    train.add_argument('--replay-dir', default=None,
+                       help="keep the replay buffer in memmap files in this directory")
+    train.add_argument('--profile', action='store_true',
+                       help="log per-phase env step timings")
+    train.add_argument('--timesteps', type=int, default=None,
+                       help="total training steps (default 1000000, or the resumed run's)")
+    train.add_argument('--checkpoint-dir', default='checkpoints')
+    train.add_argument('--checkpoint-freq', type=int, default=50000,
+                       help="steps between checkpoints")
+    train.add_argument('--keep-checkpoints', type=int, default=3,
+                       help="number of most recent checkpoints to keep")
+    train.add_argument('--resume', action='store_true',
+                       help="continue from the latest checkpoint in --checkpoint-dir "
+                            "(its saved settings replace the options above, "
+                            "except --timesteps)")
+    train.add_argument('--expert-data', default=None,
+                       help="dataset directory from expert_data.py to warm start from")
+    train.add_argument('--pretrain', default='prefill', choices=('prefill', 'bc', 'both'),
+                       help="how to use --expert-data")
+    train.add_argument('--size', type=int, default=4,
+                       help="board size, e.g. 3 for a curriculum or 5/6 for scaling studies")
+    train.add_argument('--hyperparams', type=json.loads, default=None,
+                       help='JSON overrides of DEFAULT_HYPERPARAMS, e.g. \'{"gamma": 0.99}\'')
+    train.add_argument('--seed', type=int, default=None)
+
+    evaluate = commands.add_parser('eval', help="headless evaluation of a player",
+                                   description="Headless evaluation of a 2048 player")
+    evaluate.add_argument('--player', default='dqn', choices=PLAYERS)
+    _add_player_arguments(evaluate)
+    evaluate.add_argument('--games', type=int, default=1000)
+    evaluate.add_argument('--workers', type=int, default=4)
+    evaluate.add_argument('--seed', type=int, default=0)
+    evaluate.add_argument('--max-steps', type=int, default=None)
+    evaluate.add_argument('--batch-size', type=int, default=None,
+                          help="play this many games in lockstep per worker, batching predict()")
+    evaluate.add_argument('--report', default='evaluation_report.json',
+                          help="where to write the JSON report")
+    evaluate.add_argument('--include-games', action='store_true',
+                          help="add per-game results to the JSON report")
+    evaluate.add_argument('--record', default=None, metavar='FILE',
+                          help="also append every game to FILE in the game record format")
+    evaluate.add_argument('--record-spawns', action='store_true',
+                          help="store spawned tiles in the records too")
+
+    watch = commands.add_parser('watch', help="watch a player move by move",
+                                description="Watch a player move by move")
+    watch.add_argument('--player', default='dqn', choices=PLAYERS)
+    _add_player_arguments(watch)
+    watch.add_argument('--games', type=int, default=1)
+    watch.add_argument('--delay', type=float, default=0.3, help="seconds between moves")
+    watch.add_argument('--fps', type=float, default=None,
+                       help="redraw at most this often (use with --delay 0)")
+    watch.add_argument('--detailed', action='store_true',
+                       help="print every step of one DQN game with its valid actions")
+
+    bench = commands.add_parser('bench', help="throughput benchmarks",
+                                description="Throughput benchmarks for the 2048 engine and env")
+    bench.add_argument('benchmarks', nargs='*',
+                       help="benchmark names or prefixes (default: all)")
+    bench.add_argument('--list', action='store_true', help="list benchmark names and exit")
+    bench.add_argument('--repeats', type=int, default=5)
+    bench.add_argument('--seed', type=int, default=0)
+    bench.add_argument('--save-baseline', metavar='FILE',
+                       help="write the results to FILE as the new baseline")
+    bench.add_argument('--compare', metavar='FILE', help="compare against a saved baseline")
+    bench.add_argument('--threshold', type=float, default=0.1,
+                       help="slowdown fraction flagged as a regression (default 0.1)")
+    bench.add_argument('--startup', action='store_true',
+                       help="instead check that `play` imports no heavy dependencies and "
+                            f"stays within {PLAY_IMPORT_BUDGET * 1000:.0f} ms of imports")
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == 'play' and args.autoplay and args.size != 4:
+        parser.error("the expectimax agent plays 4x4 boards only")
+    if args.command == 'train' and args.expert_data and args.size != 4:
+        parser.error("--expert-data holds 4x4 games; use it with --size 4")
+    if args.command == 'bench' and args.startup:
+        return 0 if check_play_startup(repeats=args.repeats) else 1
+    return COMMANDS[args.command](load_command(args.command), args) or 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
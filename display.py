@@ -1,5 +1,33 @@
-import os
 import sys
+import time
+
+# ANSI control sequences
+CLEAR_SCREEN = '\033[2J\033[H'
+CLEAR_LINE = '\033[K'
+HIDE_CURSOR = '\033[?25l'
+SHOW_CURSOR = '\033[?25h'
+
+# Width of a board cell in characters
+CELL_WIDTH = 7
+
+
+def move_cursor(row, col):
+    """Escape sequence moving the cursor to a 1-based (row, col)"""
+    return f'\033[{row};{col}H'
+
+
+def grid_lines(size):
+    """Border lines of an empty size x size grid, top to bottom"""
+    def border(left, middle, right):
+        return left + middle.join(["─" * CELL_WIDTH] * size) + right
+
+    empty_row = "│" + "│".join([" " * CELL_WIDTH] * size) + "│"
+    lines = [border("┌", "┬", "┐")]
+    for i in range(size):
+        lines.append(empty_row)
+        lines.append(border("├", "┼", "┤") if i < size - 1 else border("└", "┴", "┘"))
+    return lines
+
 
 class GameDisplay:
     def __init__(self):
@@ -21,40 +49,27 @@ class GameDisplay:
     
     def clear_screen(self):
         """Clear the terminal screen"""
-        os.system('cls' if os.name == 'nt' else 'clear')
+        sys.stdout.write(CLEAR_SCREEN)
+        sys.stdout.flush()
+    
+    def format_cell(self, value):
+        """A board cell as CELL_WIDTH colored characters"""
+        if value == 0:
+            return " " * CELL_WIDTH
+        color = self.colors.get(value, self.colors[0])
+        return f"{color}{value:^{CELL_WIDTH}}{self.reset_color}"
     
     def print_board(self, game):
-        """Print the game board with colors"""
-        self.clear_screen()
-        print(f"Score: {game.score}")
-        print(f"Max Tile: {game.get_max_tile()}")
-        print()
-        
-        # Top border
-        print("┌" + "─" * 7 + "┬" + "─" * 7 + "┬" + "─" * 7 + "┬" + "─" * 7 + "┐")
-        
-        for i in range(game.size):
-            # Print row
-            print("│", end="")
-            for j in range(game.size):
-                value = game.board[i][j]
-                color = self.colors.get(value, self.colors[0])
-                
-                if value == 0:
-                    cell_str = "       "
-                else:
-                    cell_str = f"{color}{value:^7}{self.reset_color}"
-                
-                print(cell_str, end="│")
-            print()
-            
-            # Print separator (except for last row)
-            if i < game.size - 1:
-                print("├" + "─" * 7 + "┼" + "─" * 7 + "┼" + "─" * 7 + "┼" + "─" * 7 + "┤")
-        
-        # Bottom border
-        print("└" + "─" * 7 + "┴" + "─" * 7 + "┴" + "─" * 7 + "┴" + "─" * 7 + "┘")
-        print()
+        """Print the game board with colors, as one write"""
+        lines = [f"Score: {game.score}", f"Max Tile: {game.get_max_tile()}", ""]
+        grid = grid_lines(game.size)
+        lines.append(grid[0])
+        for i, row in enumerate(game.board):
+            lines.append("│" + "│".join(self.format_cell(value) for value in row) + "│")
+            lines.append(grid[2 * i + 2])
+        lines.append("")
+        sys.stdout.write(CLEAR_SCREEN + "\n".join(lines) + "\n")
+        sys.stdout.flush()
     
     def print_instructions(self):
         """Print game instructions"""
@@ -76,3 +91,77 @@ class GameDisplay:
         print(f"Final Score: {game.score}")
         print(f"Max Tile: {game.get_max_tile()}")
         print("=" * 40)
+
+
+class IncrementalRenderer(GameDisplay):
+    """Board renderer that only redraws what changed since its last frame
+
+    The first frame clears the screen and draws the grid. Later frames move
+    the cursor to each changed cell, the score lines and the status line
+    and rewrite just those, all in one buffered write. With fps set, draw()
+    skips frames arriving sooner than 1/fps seconds after the last one
+    drawn, so a game can run far faster than the terminal redraws
+    (spectator mode); the skipped changes appear in the next frame.
+    """
+
+    # Screen rows (1-based) of the score lines and the top of the grid
+    SCORE_ROW = 1
+    MAX_TILE_ROW = 2
+    GRID_ROW = 4
+
+    def __init__(self, out=None, fps=None):
+        super().__init__()
+        self.out = out if out is not None else sys.stdout
+        self.fps = fps
+        self._board = None
+        self._lines = {}
+        self._last_frame = 0.0
+
+    def draw(self, game, status='', force=False):
+        """Bring the screen up to date with game; returns False if skipped"""
+        if self.fps and not force:
+            now = time.perf_counter()
+            if now - self._last_frame < 1.0 / self.fps:
+                return False
+            self._last_frame = now
+
+        size = game.size
+        parts = []
+        if self._board is None or len(self._board) != size:
+            parts.append(HIDE_CURSOR + CLEAR_SCREEN)
+            for offset, line in enumerate(grid_lines(size)):
+                parts.append(move_cursor(self.GRID_ROW + offset, 1) + line)
+            self._board = [[None] * size for _ in range(size)]
+            self._lines = {}
+
+        for i, row in enumerate(game.board):
+            drawn = self._board[i]
+            for j, value in enumerate(row):
+                if drawn[j] != value:
+                    drawn[j] = value
+                    parts.append(move_cursor(self.GRID_ROW + 1 + 2 * i, 2 + (CELL_WIDTH + 1) * j) +
+                                 self.format_cell(value))
+
+        status_row = self.GRID_ROW + 2 * size + 1
+        for row, text in ((self.SCORE_ROW, f"Score: {game.score}"),
+                          (self.MAX_TILE_ROW, f"Max Tile: {game.get_max_tile()}"),
+                          (status_row, status)):
+            if self._lines.get(row) != text:
+                self._lines[row] = text
+                parts.append(move_cursor(row, 1) + text + CLEAR_LINE)
+
+        # Park the cursor below the frame
+        parts.append(move_cursor(status_row + 1, 1))
+        self.out.write(''.join(parts))
+        self.out.flush()
+        return True
+
+    def reset(self):
+        """Redraw everything on the next frame"""
+        self._board = None
+
+    def close(self):
+        """Leave the cursor visible below the last frame"""
+        self.out.write(SHOW_CURSOR)
+        self.out.flush()
+        self._board = None
@@ -0,0 +1,306 @@
+from concurrent.futures import ProcessPoolExecutor
+import math
+import time
+
+import numpy as np
+
+from bitboard import game_state
+from game_record import GameRecord, GameRecordWriter, pack_actions, unpack_actions
+from rl_env import Game2048RLEnv
+
+PLAYERS = ('dqn', 'expectimax', 'ntuple', 'random')
+# Players whose predict() accepts a batch of observations
+BATCHED_PLAYERS = ('dqn', 'random')
+
+
+class RandomPlayer:
+    """Uniformly random moves, as a baseline"""
+
+    def __init__(self, seed=None):
+        self.rng = np.random.default_rng(seed)
+
+    def predict(self, obs, deterministic=True):
+        obs = np.asarray(obs)
+        if obs.ndim > 1:
+            return self.rng.integers(4, size=len(obs)), None
+        return self.rng.integers(4), None
+
+
+def load_dqn(path=None):
+    """Load a trained DQN, falling back from the enhanced to the basic model"""
+    from stable_baselines3 import DQN
+
+    if path is not None:
+        return DQN.load(path)
+    try:
+        return DQN.load("dqn_2048_enhanced")
+    except FileNotFoundError:
+        return DQN.load("dqn_2048")
+
+
+def make_player(name, model_path=None, depth=2, time_budget=None):
+    """Create a player object offering an SB3-style predict(obs)"""
+    if name == 'dqn':
+        return load_dqn(model_path)
+    if name == 'expectimax':
+        from expectimax import ExpectimaxAgent
+        # Evaluation parallelises over games, so search in-process
+        return ExpectimaxAgent(max_depth=depth, time_budget=time_budget, workers=0)
+    if name == 'ntuple':
+        from ntuple import NTupleAgent
+        return NTupleAgent.load(model_path or 'ntuple_2048.bin')
+    if name == 'random':
+        return RandomPlayer()
+    raise ValueError(f"Unknown player '{name}', expected one of {PLAYERS}")
+
+
+def choose_action(player, env, obs):
+    """The player's move for the env's current board
+
+    Search players (with a choose_action method) are handed the board's
+    cached afterstates, which the following env.step() reuses, so no board
+    is moved twice in one direction.
+    """
+    if hasattr(player, 'choose_action'):
+        action = player.choose_action(game_state(env.game), env.afterstates())
+        return 0 if action is None else action
+    action, _ = player.predict(obs, deterministic=True)
+    return int(action)
+
+
+def play_game(player, env, seed, max_steps=None, record=False):
+    """Play one seeded game headlessly and return its statistics
+
+    Predicted moves that would not change the board are counted as invalid
+    and replaced by the first valid move, so every game terminates. With
+    record, the result also holds the 'actions' played (packed, see
+    game_record.pack_actions).
+    """
+    obs, info = env.reset(seed=seed)
+    done = False
+    steps = 0
+    invalid_moves = 0
+    actions = [] if record else None
+
+    while not done and (max_steps is None or steps < max_steps):
+        action = choose_action(player, env, obs)
+        if not env.action_masks()[action]:
+            invalid_moves += 1
+            action = env.get_valid_actions()[0]
+        obs, reward, done, truncated, info = env.step(action)
+        steps += 1
+        if record:
+            actions.append(action)
+
+    return _game_result(env, seed, steps, invalid_moves, actions)
+
+
+def play_games_batched(player, seeds, batch_size, max_steps=None, record=False):
+    """Play seeded games in lockstep with one predict() call per step
+
+    Up to batch_size games are live at once. Their observations are gathered
+    into one batch per step; finished games drop out and the next pending
+    seed takes their place. Results come back in seed order.
+    """
+    pending = list(reversed(seeds))
+    envs = [Game2048RLEnv() for _ in range(min(batch_size, len(seeds)))]
+    if not envs:
+        return []
+    space = envs[0].observation_space
+    obs_batch = np.zeros((len(envs),) + space.shape, dtype=space.dtype)
+
+    def start(env):
+        seed = pending.pop()
+        obs, info = env.reset(seed=seed)
+        return {'env': env, 'seed': seed, 'obs': obs, 'steps': 0, 'invalid_moves': 0,
+                'actions': [] if record else None}
+
+    live = [start(env) for env in envs]
+    results = []
+    while live:
+        for i, game in enumerate(live):
+            obs_batch[i] = game['obs']
+        actions, _ = player.predict(obs_batch[:len(live)], deterministic=True)
+
+        still_live = []
+        for game, action in zip(live, actions):
+            env = game['env']
+            action = int(action)
+            if not env.action_masks()[action]:
+                game['invalid_moves'] += 1
+                action = env.get_valid_actions()[0]
+            game['obs'], reward, done, truncated, info = env.step(action)
+            game['steps'] += 1
+            if record:
+                game['actions'].append(action)
+
+            if done or (max_steps is not None and game['steps'] >= max_steps):
+                results.append(_game_result(env, game['seed'], game['steps'],
+                                            game['invalid_moves'], game['actions']))
+                if pending:
+                    still_live.append(start(env))
+            else:
+                still_live.append(game)
+        live = still_live
+
+    results.sort(key=lambda game: game['seed'])
+    return results
+
+
+def _game_result(env, seed, steps, invalid_moves, actions=None):
+    max_tile = env.game.get_max_tile()
+    result = {
+        'seed': seed,
+        'score': env.game.score,
+        'max_tile': max_tile,
+        'won': max_tile >= 2048,
+        'steps': steps,
+        'invalid_moves': invalid_moves,
+    }
+    if actions is not None:
+        # Packed, to keep the results sent back by workers small
+        result['actions'] = pack_actions(actions)
+    return result
+
+
+# Player owned by each worker process
+_worker_player = None
+
+
+def _init_worker(player_spec):
+    global _worker_player
+    try:
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    _worker_player = make_player(**player_spec)
+
+
+def _play_games(seeds, max_steps, batch_size=None, record=False):
+    if batch_size:
+        return play_games_batched(_worker_player, seeds, batch_size, max_steps, record)
+    env = Game2048RLEnv()
+    return [play_game(_worker_player, env, seed, max_steps, record) for seed in seeds]
+
+
+def wilson_interval(successes, trials, z=1.96):
+    """Wilson score confidence interval for a binomial proportion"""
+    if trials == 0:
+        return 0.0, 0.0
+    p = successes / trials
+    denom = 1 + z * z / trials
+    centre = (p + z * z / (2 * trials)) / denom
+    margin = z * math.sqrt(p * (1 - p) / trials + z * z / (4 * trials * trials)) / denom
+    return max(0.0, centre - margin), min(1.0, centre + margin)
+
+
+def summarize(games, elapsed):
+    """Aggregate per-game results into the report statistics"""
+    scores = np.array([g['score'] for g in games])
+    max_tiles = [g['max_tile'] for g in games]
+    wins = sum(g['won'] for g in games)
+    steps = sum(g['steps'] for g in games)
+    invalid = sum(g['invalid_moves'] for g in games)
+
+    tile_counts = {}
+    for tile in max_tiles:
+        tile_counts[tile] = tile_counts.get(tile, 0) + 1
+
+    low, high = wilson_interval(wins, len(games))
+    return {
+        'num_games': len(games),
+        'score': {
+            'mean': float(scores.mean()),
+            'std': float(scores.std()),
+            'min': int(scores.min()),
+            'p25': float(np.percentile(scores, 25)),
+            'median': float(np.median(scores)),
+            'p75': float(np.percentile(scores, 75)),
+            'max': int(scores.max()),
+        },
+        'max_tile_counts': {str(tile): tile_counts[tile] for tile in sorted(tile_counts, reverse=True)},
+        'win_rate': wins / len(games),
+        'win_rate_ci95': [low, high],
+        'invalid_move_rate': invalid / steps if steps else 0.0,
+        'total_steps': steps,
+        'elapsed_sec': elapsed,
+        'steps_per_sec': steps / elapsed if elapsed > 0 else 0.0,
+        'games_per_sec': len(games) / elapsed if elapsed > 0 else 0.0,
+    }
+
+
+def evaluate(player='dqn', num_games=1000, workers=4, seed=0, chunk_size=10,
+             max_steps=None, model_path=None, depth=2, time_budget=None,
+             include_games=False, batch_size=None, record_file=None, record_spawns=False):
+    """Play num_games seeded games across a process pool and report statistics
+
+    Game i is played on the board seeded with seed + i, so reports of
+    different players (or of the same player before and after a change)
+    compare on identical spawn streams. With batch_size, each worker plays
+    its share of the games in lockstep batches (see play_games_batched).
+    With record_file, every game is also appended there as a GameRecord
+    (see game_record.py), including its spawned tiles if record_spawns.
+    """
+    if batch_size and player not in BATCHED_PLAYERS:
+        raise ValueError(f"Batched evaluation needs one of {BATCHED_PLAYERS}, not '{player}'")
+    player_spec = dict(name=player, model_path=model_path, depth=depth,
+                       time_budget=time_budget)
+    seeds = list(range(seed, seed + num_games))
+    record = record_file is not None
+    if batch_size:
+        # One large chunk per worker keeps every batch full
+        chunk_size = max(batch_size, math.ceil(num_games / max(workers, 1)))
+    chunks = [seeds[i:i + chunk_size] for i in range(0, num_games, chunk_size)]
+
+    start = time.perf_counter()
+    if workers:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=(player_spec,)) as pool:
+            results = pool.map(_play_games, chunks, [max_steps] * len(chunks),
+                               [batch_size] * len(chunks), [record] * len(chunks))
+            games = [game for chunk in results for game in chunk]
+    else:
+        _init_worker(player_spec)
+        games = [game for chunk in chunks
+                 for game in _play_games(chunk, max_steps, batch_size, record)]
+    elapsed = time.perf_counter() - start
+
+    if record:
+        with GameRecordWriter(record_file, spawns=record_spawns) as writer:
+            for game in games:
+                actions = unpack_actions(game.pop('actions'), game['steps'])
+                writer.write(GameRecord(game['seed'], actions, game['score']))
+
+    report = {'player': player, 'seed': seed, 'workers': workers, 'batch_size': batch_size}
+    report.update(summarize(games, elapsed))
+    if include_games:
+        report['games'] = games
+    return report
+
+
+def print_report(report):
+    """Human readable summary of an evaluation report"""
+    score = report['score']
+    low, high = report['win_rate_ci95']
+    print(f"{'='*50}")
+    print(f"EVALUATION RESULTS ({report['player']}):")
+    print(f"{'='*50}")
+    print(f"Games played: {report['num_games']}")
+    print(f"Win rate (2048+): {report['win_rate']*100:.1f}% "
+          f"(95% CI {low*100:.1f}-{high*100:.1f}%)")
+    print(f"Score: mean {score['mean']:.1f}, median {score['median']:.1f}, "
+          f"p25 {score['p25']:.1f}, p75 {score['p75']:.1f}, best {score['max']}")
+    print(f"Invalid move rate: {report['invalid_move_rate']*100:.2f}%")
+    print(f"Throughput: {report['steps_per_sec']:.0f} steps/sec, "
+          f"{report['games_per_sec']:.2f} games/sec")
+    print("Max tile achievements:")
+    for tile, count in report['max_tile_counts'].items():
+        print(f"  {tile}: {count} games ({count/report['num_games']*100:.1f}%)")
+
+
+if __name__ == "__main__":
+    import sys
+
+    from cli import main as cli_main
+    sys.exit(cli_main(['eval', *sys.argv[1:]]))
@@ -0,0 +1,221 @@
+from concurrent.futures import ProcessPoolExecutor
+import time
+
+from bitboard import ROW_MASK, afterstates, count_empty, transpose
+from observations import StatePlayer
+
+# Heuristic weights of the per-line board evaluation
+LOST_PENALTY = 200000.0
+MONOTONICITY_POWER = 4.0
+MONOTONICITY_WEIGHT = 47.0
+SUM_POWER = 3.5
+SUM_WEIGHT = 11.0
+MERGES_WEIGHT = 700.0
+EMPTY_WEIGHT = 270.0
+
+# How often (in visited nodes, leaves included) the search checks its
+# deadline; a power of two
+_DEADLINE_CHECK_INTERVAL = 64
+
+
+def _build_heuristic_table():
+    """Precompute the heuristic value of every 16-bit line"""
+    table = [0.0] * 65536
+    for key in range(65536):
+        line = [(key >> (4 * j)) & 0xF for j in range(4)]
+
+        total = 0.0
+        empty = 0
+        merges = 0
+        prev = 0
+        counter = 0
+        for rank in line:
+            total += rank ** SUM_POWER
+            if rank == 0:
+                empty += 1
+            else:
+                if prev == rank:
+                    counter += 1
+                elif counter > 0:
+                    merges += 1 + counter
+                    counter = 0
+                prev = rank
+        if counter > 0:
+            merges += 1 + counter
+
+        mono_left = 0.0
+        mono_right = 0.0
+        for a, b in zip(line, line[1:]):
+            if a > b:
+                mono_left += a ** MONOTONICITY_POWER - b ** MONOTONICITY_POWER
+            else:
+                mono_right += b ** MONOTONICITY_POWER - a ** MONOTONICITY_POWER
+
+        table[key] = (LOST_PENALTY + EMPTY_WEIGHT * empty + MERGES_WEIGHT * merges -
+                      MONOTONICITY_WEIGHT * min(mono_left, mono_right) - SUM_WEIGHT * total)
+    return table
+
+
+HEURISTIC = _build_heuristic_table()
+
+
+def evaluate(state):
+    """Heuristic value of a packed board: summed over its rows and columns"""
+    t = transpose(state)
+    return (HEURISTIC[state & ROW_MASK] + HEURISTIC[(state >> 16) & ROW_MASK] +
+            HEURISTIC[(state >> 32) & ROW_MASK] + HEURISTIC[state >> 48] +
+            HEURISTIC[t & ROW_MASK] + HEURISTIC[(t >> 16) & ROW_MASK] +
+            HEURISTIC[(t >> 32) & ROW_MASK] + HEURISTIC[t >> 48])
+
+
+class SearchTimeout(Exception):
+    """Raised inside a search when its deadline has passed"""
+
+
+class ExpectimaxSearch:
+    """Depth-limited expectimax over moves and tile spawns
+
+    Chance nodes average over every empty cell receiving a 2 (90%) or a 4
+    (10%); branches whose cumulative probability falls below prob_cutoff are
+    cut off and evaluated with the heuristic. Chance node values are kept in
+    a transposition table keyed by packed board, holding at most tt_size
+    entries; the oldest entries are evicted first.
+    """
+
+    def __init__(self, prob_cutoff=1e-4, tt_size=1000000):
+        self.prob_cutoff = prob_cutoff
+        self.tt_size = tt_size
+        self.table = {}
+        self.deadline = None
+        self.nodes = 0
+
+    def search(self, afterstate, depth, deadline=None):
+        """Expected value of a root afterstate searched to the given depth"""
+        self.deadline = deadline
+        self.nodes = 0
+        return self._chance(afterstate, depth - 1, 1.0)
+
+    def _chance(self, state, depth, prob):
+        self.nodes += 1
+        if (self.deadline is not None and not self.nodes & (_DEADLINE_CHECK_INTERVAL - 1)
+                and time.perf_counter() > self.deadline):
+            raise SearchTimeout()
+
+        if depth <= 0 or prob < self.prob_cutoff:
+            return evaluate(state)
+
+        entry = self.table.get(state)
+        if entry is not None and entry[0] >= depth:
+            return entry[1]
+
+        num_empty = count_empty(state)
+        prob /= num_empty
+        total = 0.0
+        for shift in range(0, 64, 4):
+            if not (state >> shift) & 0xF:
+                total += 0.9 * self._max(state | (1 << shift), depth, prob * 0.9)
+                total += 0.1 * self._max(state | (2 << shift), depth, prob * 0.1)
+        value = total / num_empty
+
+        table = self.table
+        if len(table) >= self.tt_size and state not in table:
+            del table[next(iter(table))]
+        table[state] = (depth, value)
+        return value
+
+    def _max(self, state, depth, prob):
+        best = 0.0
+        for new_state, _, moved in afterstates(state):
+            if moved:
+                value = self._chance(new_state, depth - 1, prob)
+                if value > best:
+                    best = value
+        return best
+
+
+# Searcher owned by each worker process, so its table persists across moves
+_worker_search = None
+
+
+def _init_worker(prob_cutoff, tt_size):
+    global _worker_search
+    _worker_search = ExpectimaxSearch(prob_cutoff, tt_size)
+
+
+def _search_root_move(afterstate, max_depth, deadline):
+    """Iteratively deepen one root move, returning its value per depth"""
+    values = []
+    for depth in range(1, max_depth + 1):
+        try:
+            # Depth 1 always completes so every move gets a value
+            values.append(_worker_search.search(afterstate, depth, deadline if depth > 1 else None))
+        except SearchTimeout:
+            break
+    return values
+
+
+class ExpectimaxAgent(StatePlayer):
+    """Search-based 2048 player
+
+    Each legal root move is searched in its own worker process (or in this
+    process when workers=0) by iterative deepening up to max_depth. With a
+    time_budget in seconds, deepening stops when the budget for the move is
+    spent and the deepest depth finished for every root move decides.
+    """
+
+    def __init__(self, max_depth=3, time_budget=None, prob_cutoff=1e-4,
+                 tt_size=1000000, workers=4):
+        self.max_depth = max_depth
+        self.time_budget = time_budget
+        self.prob_cutoff = prob_cutoff
+        self.tt_size = tt_size
+        self.workers = workers
+        self._pool = None
+
+    def choose_action(self, state, moves=None):
+        """Best action for a packed board, or None when no move is possible
+
+        moves are the board's afterstates() if the caller already has them.
+        """
+        if moves is None:
+            moves = afterstates(state)
+        roots = [(action, afterstate)
+                 for action, (afterstate, _, moved) in enumerate(moves) if moved]
+        if not roots:
+            return None
+        if len(roots) == 1:
+            return roots[0][0]
+
+        deadline = None
+        if self.time_budget is not None:
+            deadline = time.perf_counter() + self.time_budget
+
+        if self.workers:
+            pool = self._get_pool()
+            futures = [pool.submit(_search_root_move, afterstate, self.max_depth, deadline)
+                       for _, afterstate in roots]
+            results = [future.result() for future in futures]
+        else:
+            if _worker_search is None:
+                _init_worker(self.prob_cutoff, self.tt_size)
+            results = [_search_root_move(afterstate, self.max_depth, deadline)
+                       for _, afterstate in roots]
+
+        # Compare moves at the deepest depth all of them completed
+        depth = min(len(values) for values in results)
+        best = max(range(len(roots)), key=lambda i: results[i][depth - 1])
+        return roots[best][0]
+
+    def _get_pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker,
+                initargs=(self.prob_cutoff, self.tt_size)
+            )
+        return self._pool
+
+    def close(self):
+        """Shut down the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,189 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import os
+import time
+
+import numpy as np
+
+import evaluate
+from evaluate import PLAYERS, choose_action
+from observations import encoder_for_space, pack_observations
+from rl_env import Game2048RLEnv
+
+# Arrays of every shard, one entry per transition. Boards are packed uint64
+# (see bitboard.py) and decoded to the model's observation encoding on use.
+SHARD_FIELDS = ('states', 'actions', 'rewards', 'next_states', 'dones')
+
+
+def play_transitions(player, env, seed, max_steps=None):
+    """Play one seeded game and return its transitions as packed arrays"""
+    obs, info = env.reset(seed=seed)
+    states, actions, rewards, dones = [], [], [], []
+    done = False
+    while not done and (max_steps is None or len(actions) < max_steps):
+        action = choose_action(player, env, obs)
+        if not env.action_masks()[action]:
+            action = env.get_valid_actions()[0]
+        states.append(obs.copy())
+        obs, reward, done, truncated, info = env.step(action)
+        actions.append(action)
+        rewards.append(reward)
+        dones.append(done)
+    states.append(obs.copy())
+
+    packed = pack_observations(np.array(states))
+    return {
+        'states': packed[:-1],
+        'actions': np.array(actions, dtype=np.uint8),
+        'rewards': np.array(rewards, dtype=np.float32),
+        'next_states': packed[1:],
+        'dones': np.array(dones, dtype=np.bool_),
+    }, env.game.score
+
+
+def _write_shard(path, seeds, max_steps):
+    """Play the seeded games and save their transitions as one shard
+
+    Runs in a worker set up by evaluate._init_worker, which owns the player.
+    """
+    env = Game2048RLEnv()
+    games = []
+    scores = []
+    for seed in seeds:
+        transitions, score = play_transitions(evaluate._worker_player, env, seed, max_steps)
+        games.append(transitions)
+        scores.append(score)
+    shard = {field: np.concatenate([game[field] for game in games]) for field in SHARD_FIELDS}
+    np.savez_compressed(path, seeds=np.array(seeds, dtype=np.int64), **shard)
+    return path, len(shard['actions']), scores
+
+
+def generate_dataset(out_dir='expert_data', player='expectimax', num_games=200,
+                     games_per_shard=10, workers=4, seed=0, max_steps=None,
+                     model_path=None, depth=2, time_budget=None):
+    """Play num_games games with player across a process pool
+
+    Each task plays games_per_shard seeded games (seed, seed + 1, ...) and
+    writes their transitions to out_dir/shard_<n>.npz with
+    np.savez_compressed. Returns the list of shard files.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    player_spec = dict(name=player, model_path=model_path, depth=depth,
+                       time_budget=time_budget)
+    seeds = list(range(seed, seed + num_games))
+    chunks = [seeds[i:i + games_per_shard] for i in range(0, num_games, games_per_shard)]
+    paths = [os.path.join(out_dir, f'shard_{seed + i * games_per_shard:08d}.npz')
+             for i in range(len(chunks))]
+
+    start = time.perf_counter()
+    scores = []
+    transitions = 0
+    if workers:
+        with ProcessPoolExecutor(max_workers=workers, initializer=evaluate._init_worker,
+                                 initargs=(player_spec,)) as pool:
+            results = pool.map(_write_shard, paths, chunks, [max_steps] * len(chunks))
+            for path, count, shard_scores in results:
+                transitions += count
+                scores.extend(shard_scores)
+                print(f"Wrote '{path}': {len(shard_scores)} games, {count} transitions")
+    else:
+        evaluate._init_worker(player_spec)
+        for path, chunk in zip(paths, chunks):
+            path, count, shard_scores = _write_shard(path, chunk, max_steps)
+            transitions += count
+            scores.extend(shard_scores)
+            print(f"Wrote '{path}': {len(shard_scores)} games, {count} transitions")
+
+    elapsed = time.perf_counter() - start
+    print(f"{num_games} games, {transitions} transitions in {elapsed:.1f}s, "
+          f"mean score {np.mean(scores):.1f}")
+    return paths
+
+
+def iter_shards(data_dir):
+    """Yield the arrays of each shard in data_dir, in file order"""
+    for path in sorted(glob.glob(os.path.join(data_dir, 'shard_*.npz'))):
+        with np.load(path) as shard:
+            yield {field: shard[field] for field in SHARD_FIELDS}
+
+
+def load_dataset(data_dir):
+    """All transitions of a dataset directory as one dict of arrays"""
+    shards = list(iter_shards(data_dir))
+    if not shards:
+        raise FileNotFoundError(f"No dataset shards in '{data_dir}'")
+    return {field: np.concatenate([shard[field] for shard in shards]) for field in SHARD_FIELDS}
+
+
+def prefill_replay_buffer(model, data_dir):
+    """Copy a dataset into the model's CompactReplayBuffer
+
+    Returns the number of transitions added. Training then counts them
+    towards learning_starts (see train_enhanced_dqn).
+    """
+    added = 0
+    for shard in iter_shards(data_dir):
+        added += model.replay_buffer.extend(**shard)
+    return added
+
+
+def behaviour_cloning(model, data_dir, epochs=3, batch_size=256, learning_rate=1e-3):
+    """Pretrain the DQN's Q-network to pick the dataset's actions
+
+    The Q-values are trained as logits of a cross-entropy loss against the
+    expert action, then copied to the target network. This gives the greedy
+    policy the expert's preferences; TD learning then rescales the values.
+    """
+    import torch
+    import torch.nn.functional as F
+
+    data = load_dataset(data_dir)
+    encoder = encoder_for_space(model.observation_space)
+    q_net = model.policy.q_net
+    device = model.device
+    optimizer = torch.optim.Adam(q_net.parameters(), lr=learning_rate)
+    rng = np.random.default_rng(0)
+    num = len(data['actions'])
+
+    model.policy.set_training_mode(True)
+    for epoch in range(epochs):
+        order = rng.permutation(num)
+        total_loss = 0.0
+        correct = 0
+        for start in range(0, num, batch_size):
+            batch = order[start:start + batch_size]
+            obs = torch.as_tensor(encoder.encode_batch(data['states'][batch]), device=device)
+            actions = torch.as_tensor(data['actions'][batch].astype(np.int64), device=device)
+            logits = q_net(obs)
+            loss = F.cross_entropy(logits, actions)
+            optimizer.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total_loss += loss.item() * len(batch)
+            correct += (logits.argmax(dim=1) == actions).sum().item()
+        print(f"BC epoch {epoch + 1}/{epochs}: loss {total_loss / num:.4f}, "
+              f"expert action agreement {correct / num * 100:.1f}%")
+    model.policy.set_training_mode(False)
+    model.policy.q_net_target.load_state_dict(q_net.state_dict())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate an expert transition dataset")
+    parser.add_argument('--player', default='expectimax', choices=PLAYERS)
+    parser.add_argument('--model', default=None, help="DQN model or n-tuple weights file")
+    parser.add_argument('--games', type=int, default=200)
+    parser.add_argument('--games-per-shard', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--max-steps', type=int, default=None)
+    parser.add_argument('--depth', type=int, default=2, help="expectimax search depth")
+    parser.add_argument('--time-budget', type=float, default=None,
+                        help="expectimax seconds per move")
+    parser.add_argument('--out', default='expert_data', help="directory for the shards")
+    args = parser.parse_args()
+
+    generate_dataset(args.out, args.player, num_games=args.games,
+                     games_per_shard=args.games_per_shard, workers=args.workers,
+                     seed=args.seed, max_steps=args.max_steps, model_path=args.model,
+                     depth=args.depth, time_budget=args.time_budget)
@@ -1,23 +1,107 @@
 import random
-import numpy as np
+
+class TileSpawner:
+    """Tile spawn randomness drawn from a numpy Generator in blocks
+    
+    Each spawn uses one uniform to pick among the empty cells and one to
+    choose between a 2 (90%) and a 4 (10%). Both are generated block_size
+    at a time so a spawn costs two list lookups. Without a Generator the
+    spawner draws from its own unseeded random.Random, so unseeded games
+    (such as the terminal game) neither share a stream nor need NumPy.
+    """
+    
+    def __init__(self, rng=None, block_size=1024):
+        self.rng = rng
+        self._random = random.Random() if rng is None else None
+        self.block_size = block_size
+        self._cells = []
+        self._exponents = []
+        self._index = 0
+    
+    def draw(self, num_empty):
+        """Return (k, exponent): put tile 2**exponent on the k-th empty cell"""
+        if self._index >= len(self._cells):
+            self._refill()
+        i = self._index
+        self._index += 1
+        return int(self._cells[i] * num_empty), self._exponents[i]
+    
+    def _refill(self):
+        if self.rng is None:
+            draw = self._random.random
+            cells = [draw() for _ in range(self.block_size)]
+            values = [draw() for _ in range(self.block_size)]
+        else:
+            cells = self.rng.random(self.block_size).tolist()
+            values = self.rng.random(self.block_size).tolist()
+        self._cells = cells
+        self._exponents = [1 if value < 0.9 else 2 for value in values]
+        self._index = 0
 
 class Game2048:
-    def __init__(self):
-        self.size = 4
+    def __init__(self, rng=None, size=4):
+        self.size = size
         self.board = [[0 for _ in range(self.size)] for _ in range(self.size)]
         self.score = 0
+        # (board, afterstates) of the last afterstates() call
+        self._afterstates = None
+        # Per-game numpy Generator; pass one in for reproducible games
+        self.spawner = TileSpawner(rng)
         self.add_new_tile()
         self.add_new_tile()
     
+    def afterstates(self):
+        """(board, score gain, moved) of each action on the current board
+        
+        In action order (0=left, 1=up, 2=right, 3=down), computed together
+        and cached until the board changes; the next move reuses them. The
+        returned boards must not be modified.
+        """
+        cached = self._afterstates
+        if cached is not None and cached[0] == self.board:
+            return cached[1]
+        
+        board, score = self.board, self.score
+        results = []
+        for move in (self.move_left, self.move_up, self.move_right, self.move_down):
+            self.board = [row[:] for row in board]
+            self.score = 0
+            moved = move()
+            results.append((self.board, self.score, moved))
+        self.board, self.score = board, score
+        results = tuple(results)
+        self._afterstates = ([row[:] for row in board], results)
+        return results
+    
+    def _cached_move(self, action):
+        """Apply a move from the afterstates() cache; None if it is stale"""
+        cached = self._afterstates
+        if cached is None or cached[0] != self.board:
+            return None
+        board, score, moved = cached[1][action]
+        if moved:
+            self.board = [row[:] for row in board]
+            self.score += score
+        return moved
+    
     def add_new_tile(self):
         """Add a new tile (2 or 4) to a random empty cell"""
-        empty_cells = [(i, j) for i in range(self.size) for j in range(self.size) if self.board[i][j] == 0]
-        if empty_cells:
-            i, j = random.choice(empty_cells)
-            self.board[i][j] = 2 if random.random() < 0.9 else 4
+        num_empty = sum(row.count(0) for row in self.board)
+        if num_empty:
+            k, exponent = self.spawner.draw(num_empty)
+            for i in range(self.size):
+                for j in range(self.size):
+                    if self.board[i][j] == 0:
+                        if k == 0:
+                            self.board[i][j] = 1 << exponent
+                            return
+                        k -= 1
     
     def move_left(self):
         """Move all tiles to the left"""
+        cached = self._cached_move(0)
+        if cached is not None:
+            return cached
         moved = False
         for i in range(self.size):
             # Filter out zeros
@@ -48,6 +132,9 @@ class Game2048:
     
     def move_right(self):
         """Move all tiles to the right"""
+        cached = self._cached_move(2)
+        if cached is not None:
+            return cached
         # Reverse, move left, reverse back
         for i in range(self.size):
             self.board[i] = self.board[i][::-1]
@@ -58,6 +145,9 @@ class Game2048:
     
     def move_up(self):
         """Move all tiles up"""
+        cached = self._cached_move(1)
+        if cached is not None:
+            return cached
         # Transpose, move left, transpose back
         self.board = list(map(list, zip(*self.board)))
         moved = self.move_left()
@@ -66,6 +156,9 @@ class Game2048:
     
     def move_down(self):
         """Move all tiles down"""
+        cached = self._cached_move(3)
+        if cached is not None:
+            return cached
         # Transpose, move right, transpose back
         self.board = list(map(list, zip(*self.board)))
         moved = self.move_right()
@@ -104,3 +197,21 @@ class Game2048:
     def get_max_tile(self):
         """Get the maximum tile value"""
         return max(max(row) for row in self.board)
+
+
+ENGINES = ('classic', 'bitboard')
+
+
+def make_game(engine='bitboard', rng=None, size=4):
+    """Create a new size x size game using the requested engine backend
+
+    'classic' is the list-based Game2048 above, 'bitboard' the packed
+    implementation in bitboard.py. Both expose the same public API and draw
+    tile spawns from rng (a numpy Generator) in the same order.
+    """
+    if engine == 'classic':
+        return Game2048(rng, size)
+    if engine == 'bitboard':
+        from bitboard import BitboardGame2048
+        return BitboardGame2048(rng, size)
+    raise ValueError(f"Unknown engine '{engine}', expected one of {ENGINES}")
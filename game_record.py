@@ -0,0 +1,203 @@
+import argparse
+import os
+import struct
+
+import numpy as np
+
+from bitboard import BitboardGame2048, move_state
+
+# File layout (little endian):
+#   header: magic, version (uint16), flags (uint16)
+#   records: seed (uint64), number of actions (uint32), final score (uint32),
+#            [number of spawns (uint32) when FLAG_SPAWNS is set],
+#            the actions at 2 bits each, four to a byte (first action in the
+#            low bits), [one byte per spawn: cell | (exponent - 1) << 4]
+_FILE_MAGIC = b'GREC'
+_FILE_VERSION = 1
+_HEADER = struct.Struct('<HH')
+_RECORD = struct.Struct('<QII')
+_COUNT = struct.Struct('<I')
+
+# The record stores every spawned tile, so it replays without the RNG
+FLAG_SPAWNS = 1
+
+
+class GameRecord:
+    """A game as its spawn seed and the actions played on it
+
+    The seed is the one passed to Game2048RLEnv.reset() (or used for the
+    game's numpy Generator), so the actions replay exactly. Moves that did
+    not change the board are kept; they spawn nothing. spawns, if known,
+    is a list of (cell, exponent) pairs in spawn order, starting with the
+    two initial tiles.
+    """
+
+    def __init__(self, seed, actions, score=0, spawns=None):
+        self.seed = seed
+        self.actions = np.asarray(actions, dtype=np.uint8)
+        self.score = score
+        self.spawns = spawns
+
+    def __len__(self):
+        return len(self.actions)
+
+
+def pack_actions(actions):
+    """Pack actions (0-3) four to a byte"""
+    actions = np.asarray(actions, dtype=np.uint8)
+    padded = np.zeros(-(-len(actions) // 4) * 4, dtype=np.uint8)
+    padded[:len(actions)] = actions
+    quads = padded.reshape(-1, 4)
+    return (quads[:, 0] | quads[:, 1] << 2 | quads[:, 2] << 4 | quads[:, 3] << 6).tobytes()
+
+
+def unpack_actions(data, num_actions):
+    """Inverse of pack_actions()"""
+    packed = np.frombuffer(data, dtype=np.uint8)
+    quads = (packed[:, None] >> np.array([0, 2, 4, 6], dtype=np.uint8)) & 3
+    return quads.reshape(-1)[:num_actions]
+
+
+def replay_states(record):
+    """Play a record back on packed boards
+
+    Yields (state, action, score) before each action and finally
+    (state, None, score) for the final position. Tiles are taken from
+    record.spawns when present, otherwise from the seeded spawn stream.
+    """
+    if record.spawns is not None:
+        spawns = iter(record.spawns)
+        state = 0
+        for _ in range(2):
+            cell, exponent = next(spawns)
+            state |= exponent << (4 * cell)
+        score = 0
+        for action in record.actions.tolist():
+            yield state, action, score
+            new_state, gain = move_state(state, action)
+            if new_state != state:
+                cell, exponent = next(spawns)
+                state = new_state | exponent << (4 * cell)
+                score += gain
+        yield state, None, score
+    else:
+        game = BitboardGame2048(np.random.default_rng(record.seed))
+        for action in record.actions.tolist():
+            yield game.state, action, game.score
+            if game._move(action):
+                game.add_new_tile()
+        yield game.state, None, game.score
+
+
+def record_spawns(record):
+    """The (cell, exponent) spawns of a seeded record, found by replaying it"""
+    spawns = []
+    prev = None
+    for state, action, _ in replay_states(GameRecord(record.seed, record.actions)):
+        if prev is None:
+            spawns.extend((shift // 4, (state >> shift) & 0xF)
+                          for shift in range(0, 64, 4) if (state >> shift) & 0xF)
+        else:
+            afterstate, _ = move_state(*prev)
+            if afterstate != prev[0]:
+                cell = ((state ^ afterstate).bit_length() - 1) // 4
+                spawns.append((cell, (state >> (4 * cell)) & 0xF))
+        prev = (state, action)
+    return spawns
+
+
+def _read_header(f, filename):
+    """Check the header of a game record file and return its flags"""
+    if f.read(4) != _FILE_MAGIC:
+        raise ValueError(f"{filename} is not a game record file")
+    version, flags = _HEADER.unpack(f.read(_HEADER.size))
+    if version != _FILE_VERSION:
+        raise ValueError(f"Unsupported game record file version {version}")
+    return flags
+
+
+class GameRecordWriter:
+    """Append GameRecords to a compact binary file
+
+    With spawns=True every spawned tile is stored too (one byte each), so
+    the file replays without reproducing the RNG; the spawns of seeded
+    records are found by replaying them. Use as a context manager.
+
+    Records are added after those already in an existing file, whose header
+    must match spawns; append=False replaces the file instead.
+    """
+
+    def __init__(self, filename, spawns=False, append=True):
+        self.spawns = spawns
+        flags = FLAG_SPAWNS if spawns else 0
+        if append and os.path.exists(filename) and os.path.getsize(filename) > 0:
+            with open(filename, 'rb') as f:
+                existing = _read_header(f, filename)
+            if existing != flags:
+                raise ValueError(f"{filename} records spawns={bool(existing & FLAG_SPAWNS)}, "
+                                 f"not spawns={spawns}")
+            self._file = open(filename, 'ab')
+        else:
+            self._file = open(filename, 'wb')
+            self._file.write(_FILE_MAGIC)
+            self._file.write(_HEADER.pack(_FILE_VERSION, flags))
+
+    def write(self, record):
+        f = self._file
+        f.write(_RECORD.pack(record.seed, len(record.actions), record.score))
+        if self.spawns:
+            spawns = record.spawns if record.spawns is not None else record_spawns(record)
+            f.write(_COUNT.pack(len(spawns)))
+        f.write(pack_actions(record.actions))
+        if self.spawns:
+            f.write(bytes(cell | (exponent - 1) << 4 for cell, exponent in spawns))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_records(filename):
+    """Stream the GameRecords of a file written by GameRecordWriter"""
+    with open(filename, 'rb') as f:
+        flags = _read_header(f, filename)
+
+        while True:
+            header = f.read(_RECORD.size)
+            if not header:
+                return
+            seed, num_actions, score = _RECORD.unpack(header)
+            spawns = None
+            if flags & FLAG_SPAWNS:
+                num_spawns, = _COUNT.unpack(f.read(_COUNT.size))
+            actions = unpack_actions(f.read(-(-num_actions // 4)), num_actions)
+            if flags & FLAG_SPAWNS:
+                spawns = [(byte & 0xF, (byte >> 4) + 1) for byte in f.read(num_spawns)]
+            yield GameRecord(seed, actions, score, spawns)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Summarize or verify a game record file")
+    parser.add_argument('records')
+    parser.add_argument('--verify', action='store_true',
+                        help="replay every game and check its recorded score")
+    args = parser.parse_args()
+
+    num_games = 0
+    num_moves = 0
+    mismatches = 0
+    for record in read_records(args.records):
+        num_games += 1
+        num_moves += len(record)
+        if args.verify:
+            for state, action, score in replay_states(record):
+                pass
+            mismatches += score != record.score
+    print(f"{num_games} games, {num_moves} moves")
+    if args.verify:
+        print(f"{mismatches} score mismatches")
@@ -1,58 +1,161 @@
+from collections import deque
+import os
+import selectors
 import sys
-import termios
-import tty
+
+try:
+    import termios
+    import tty
+except ImportError:  # Windows
+    termios = None
+
+# Escape sequences of the arrow keys, in normal and application cursor mode
+ARROW_KEYS = {
+    '\x1b[A': 'up', '\x1bOA': 'up',
+    '\x1b[B': 'down', '\x1bOB': 'down',
+    '\x1b[C': 'right', '\x1bOC': 'right',
+    '\x1b[D': 'left', '\x1bOD': 'left',
+}
+
+
+def _escape_end(data, start):
+    """End index of the escape sequence at data[start], None if incomplete
+
+    ESC O (SS3) takes one more character. ESC [ (CSI) runs through its
+    parameter and intermediate bytes (' ' to '?') to a final byte ('@' to
+    '~'). ESC followed by anything else is the Esc key on its own.
+    """
+    i = start + 1
+    if i == len(data):
+        return None
+    if data[i] == 'O':
+        return i + 2 if i + 1 < len(data) else None
+    if data[i] != '[':
+        return i
+    for i in range(i + 1, len(data)):
+        if '@' <= data[i] <= '~':
+            return i + 1
+        if not ' ' <= data[i] <= '?':
+            # Malformed: end the sequence before the stray character
+            return i
+    return None
+
 
 class InputHandler:
+    """Keyboard input for interactive play
+
+    Used as a context manager, the terminal is put in cbreak mode (keys
+    arrive one at a time, unechoed; Ctrl-C still interrupts) once for the
+    whole session and restored on exit. poll() reads whatever bytes are
+    waiting through a selector without blocking longer than its timeout,
+    splits them into keys and returns the queued actions in the order the
+    keys were pressed, so bursts from key repeat are neither dropped nor
+    reordered. Without a terminal (piped stdin, Windows) it falls back to
+    line-buffered input.
+    """
+
     def __init__(self):
         self.key_mappings = {
             'w': 'up',
-            'a': 'left', 
+            'a': 'left',
             's': 'down',
             'd': 'right',
             'q': 'quit',
-            '\x1b[A': 'up',    # Arrow up
-            '\x1b[B': 'down',  # Arrow down
-            '\x1b[C': 'right', # Arrow right
-            '\x1b[D': 'left',  # Arrow left
+            'r': 'restart',
         }
-    
-    def get_key(self):
-        """Get a single keypress from user"""
+        self.key_mappings.update(ARROW_KEYS)
+        self.actions = deque()
+        self._pending = ''
+        self._fd = None
+        self._old_settings = None
+        self._selector = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    @property
+    def interactive(self):
+        """Whether keys are read one at a time from a terminal"""
+        return self._old_settings is not None
+
+    def start(self):
+        """Enter cbreak mode and start watching stdin"""
+        if termios is None:
+            return
         try:
-            # Save terminal settings
-            fd = sys.stdin.fileno()
-            old_settings = termios.tcgetattr(fd)
-            
-            # Set terminal to raw mode
-            tty.setraw(fd)
-            
-            # Read key
-            key = sys.stdin.read(1)
-            
-            # Handle arrow keys (escape sequences)
-            if key == '\x1b':
-                key += sys.stdin.read(2)
-            
-            return key
-        
-        except:
-            # Fallback for systems that don't support termios
-            return input().lower().strip()
-        
-        finally:
-            # Restore terminal settings
+            self._fd = sys.stdin.fileno()
+            self._old_settings = termios.tcgetattr(self._fd)
+        except (OSError, ValueError, termios.error):
+            self._old_settings = None
+            return
+        tty.setcbreak(self._fd)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self._fd, selectors.EVENT_READ)
+
+    def stop(self):
+        """Restore the terminal settings"""
+        if self._selector is not None:
+            self._selector.close()
+            self._selector = None
+        if self._old_settings is not None:
+            termios.tcsetattr(self._fd, termios.TCSADRAIN, self._old_settings)
+            self._old_settings = None
+
+    def poll(self, timeout=0.0):
+        """Read the keys pressed so far, waiting at most timeout seconds
+
+        Returns the list of queued actions (oldest first) and empties the
+        queue. timeout=None waits until there is input.
+        """
+        if not self.interactive:
             try:
-                termios.tcsetattr(fd, termios.TCSADRAIN, old_settings)
-            except:
-                pass
-    
+                self._feed(input().lower().strip())
+            except EOFError:
+                self.actions.append('quit')
+        elif self._selector.select(timeout):
+            self._feed(os.read(self._fd, 1024).decode('utf-8', errors='ignore'))
+        elif self._pending:
+            # Nothing completed the escape sequence: a lone Esc key
+            self._pending = ''
+        actions = list(self.actions)
+        self.actions.clear()
+        return actions
+
+    def _feed(self, data):
+        """Split data into keys and queue their actions
+
+        Escape sequences are read up to their final byte; those without an
+        action, such as modified arrows, are dropped whole.
+        """
+        data = self._pending + data
+        self._pending = ''
+        i = 0
+        while i < len(data):
+            if data[i] == '\x1b':
+                end = _escape_end(data, i)
+                if end is None:
+                    # The rest of the sequence may still be on its way
+                    self._pending = data[i:]
+                    return
+                key = data[i:end]
+                i = end
+            else:
+                key = data[i].lower()
+                i += 1
+            action = self.key_mappings.get(key)
+            if action:
+                self.actions.append(action)
+
     def get_action(self):
-        """Get user action"""
+        """Wait for the next action, taking queued keypresses first"""
         while True:
-            key = self.get_key()
-            action = self.key_mappings.get(key.lower())
-            
-            if action:
-                return action
-            else:
-                print(f"Invalid key: {key}. Use W/A/S/D or arrow keys.")
+            if self.actions:
+                return self.actions.popleft()
+            for action in self.poll(None):
+                self.actions.append(action)
+            if not self.actions:
+                print("Invalid key. Use W/A/S/D or arrow keys.")
@@ -1,66 +1,93 @@
 #!/usr/bin/env python3
 
-from game2048 import Game2048
-from display import GameDisplay
+import time
+
+from bitboard import game_afterstates, game_state
+from game2048 import make_game
+from display import IncrementalRenderer
 from input_handler import InputHandler
 
-def main():
-    """Main game loop"""
-    game = Game2048()
-    display = GameDisplay()
-    input_handler = InputHandler()
+def main(engine='bitboard', fps=60, size=4):
+    """Interactive game: an event loop reading keys and redrawing the board
+
+    Each iteration waits up to 1/fps seconds for input, applies every
+    queued key in order and redraws once if anything changed, so held-down
+    keys are processed as fast as they arrive with one frame per burst.
+    """
+    game = make_game(engine, size=size)
+    display = IncrementalRenderer()
+    help_text = "W/A/S/D or arrows move, R restart, Q quit"
+    status = "Welcome to 2048! Reach the 2048 tile to win.  " + help_text
+    over = False
+    dirty = True
     
-    print("Welcome to 2048!")
-    print("Reach the 2048 tile to win!")
-    input("Press Enter to start...")
+    with InputHandler() as input_handler:
+        try:
+            while True:
+                if dirty:
+                    display.draw(game, status)
+                    dirty = False
+                
+                for action in input_handler.poll(1.0 / fps):
+                    if action == 'quit':
+                        return
+                    if action == 'restart':
+                        game = make_game(engine, size=size)
+                        status = help_text
+                        over = False
+                        dirty = True
+                    elif not over:
+                        move = getattr(game, f'move_{action}')
+                        if move():
+                            game.add_new_tile()
+                            dirty = True
+                        
+                        # Check win/lose conditions
+                        if game.is_won() or not game.can_move():
+                            outcome = "YOU WON!" if game.is_won() else "GAME OVER!"
+                            status = f"{outcome} Final score {game.score}.  R play again, Q quit"
+                            over = dirty = True
+        finally:
+            display.close()
+            print("Thanks for playing!")
+
+def autoplay(agent, engine='bitboard', delay=0.0, fps=None):
+    """Let a search agent play one game on screen
+
+    With fps set the screen is redrawn at most fps times per second while
+    the agent plays at full speed (spectator mode).
+    """
+    game = make_game(engine)
+    display = IncrementalRenderer(fps=fps)
+    # Actions use the environment ordering: 0=left, 1=up, 2=right, 3=down
+    moves = [game.move_left, game.move_up, game.move_right, game.move_down]
+    num_moves = 0
+    start = time.perf_counter()
     
-    while True:
-        # Display current state
-        display.print_board(game)
-        
-        # Check win/lose conditions
-        if game.is_won():
-            display.print_game_over(game)
-            play_again = input("You won! Play again? (y/n): ").lower()
-            if play_again == 'y':
-                game = Game2048()
-                continue
-            else:
+    try:
+        while True:
+            elapsed = time.perf_counter() - start
+            rate = num_moves / elapsed if elapsed > 0 else 0.0
+            display.draw(game, f"Moves: {num_moves} ({rate:.0f}/sec)")
+            
+            action = agent.choose_action(game_state(game), game_afterstates(game))
+            if action is None:
                 break
-        
-        if not game.can_move():
-            display.print_game_over(game)
-            play_again = input("Play again? (y/n): ").lower()
-            if play_again == 'y':
-                game = Game2048()
-                continue
-            else:
-                break
-        
-        # Show instructions
-        display.print_instructions()
-        
-        # Get user input
-        action = input_handler.get_action()
-        
-        if action == 'quit':
-            print("Thanks for playing!")
-            break
-        
-        # Execute move
-        moved = False
-        if action == 'left':
-            moved = game.move_left()
-        elif action == 'right':
-            moved = game.move_right()
-        elif action == 'up':
-            moved = game.move_up()
-        elif action == 'down':
-            moved = game.move_down()
-        
-        # Add new tile if move was successful
-        if moved:
-            game.add_new_tile()
+            
+            if moves[action]():
+                game.add_new_tile()
+            num_moves += 1
+            
+            if delay:
+                time.sleep(delay)
+        display.draw(game, f"Moves: {num_moves}", force=True)
+    finally:
+        display.close()
+    
+    display.print_game_over(game)
 
 if __name__ == "__main__":
-    main()
+    import sys
+
+    from cli import main as cli_main
+    sys.exit(cli_main(['play', *sys.argv[1:]]))
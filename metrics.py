@@ -0,0 +1,186 @@
+import csv
+import os
+import queue
+import threading
+
+import numpy as np
+
+# Columns of the per-episode training log, in file order
+EPISODE_FIELDS = ('episode', 'timestep', 'score', 'max_tile', 'reward', 'length',
+                  'invalid_moves', 'wall_time')
+
+
+class RingBuffer:
+    """Fixed-capacity float64 buffer keeping the most recent values"""
+
+    def __init__(self, capacity):
+        self.capacity = capacity
+        self._data = np.zeros(capacity, dtype=np.float64)
+        self._next = 0
+        self._size = 0
+
+    def append(self, value):
+        self._data[self._next] = value
+        self._next = (self._next + 1) % self.capacity
+        self._size = min(self._size + 1, self.capacity)
+
+    def values(self):
+        """The stored values, oldest first"""
+        if self._size < self.capacity:
+            return self._data[:self._size].copy()
+        return np.roll(self._data, -self._next)
+
+    def mean(self):
+        return float(self._data[:self._size].mean()) if self._size else 0.0
+
+    def max(self):
+        return float(self._data[:self._size].max()) if self._size else 0.0
+
+    def __len__(self):
+        return self._size
+
+
+class EpisodeLogWriter:
+    """Append episode rows to a CSV or Parquet file from a background thread
+
+    write() only queues the row, so the training loop never waits on disk.
+    The format follows the file extension: '.parquet' (needs pyarrow) writes
+    one row group per `flush_every` rows, anything else appends CSV lines.
+    An existing log is replaced, unless append is set (as when resuming a
+    run), in which case its rows are kept and the new ones follow them.
+    """
+
+    def __init__(self, filename, fields=EPISODE_FIELDS, flush_every=100, append=False):
+        self.filename = filename
+        self.fields = tuple(fields)
+        self.flush_every = flush_every
+        self.append = append
+        self.parquet = filename.endswith('.parquet')
+        if self.parquet:
+            import pyarrow  # noqa: F401  (fail now rather than in the thread)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='episode-log', daemon=True)
+        self._thread.start()
+
+    def write(self, row):
+        self._queue.put(row)
+
+    def close(self):
+        """Write out the queued rows and stop the writer thread"""
+        if self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+    def _run(self):
+        if self.parquet:
+            self._run_parquet()
+        else:
+            self._run_csv()
+
+    def _next_rows(self):
+        """Block for one row, then take whatever else is queued; None at close"""
+        row = self._queue.get()
+        if row is None:
+            return None
+        rows = [row]
+        while len(rows) < self.flush_every:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is None:
+                self._queue.put(None)
+                break
+            rows.append(row)
+        return rows
+
+    def _run_csv(self):
+        new_file = (not self.append or not os.path.exists(self.filename)
+                    or os.path.getsize(self.filename) == 0)
+        with open(self.filename, 'w' if new_file else 'a', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=self.fields)
+            if new_file:
+                writer.writeheader()
+            while True:
+                rows = self._next_rows()
+                if rows is None:
+                    break
+                writer.writerows(rows)
+                f.flush()
+
+    def _run_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        writer = None
+        path = self.filename
+        pending = []
+        if self.append and os.path.exists(self.filename):
+            # A Parquet file cannot be appended to: copy its rows to a new one
+            existing = pq.read_table(self.filename)
+            path = self.filename + '.tmp'
+            writer = pq.ParquetWriter(path, existing.schema)
+            writer.write_table(existing)
+        while True:
+            rows = self._next_rows()
+            if rows is not None:
+                pending.extend(rows)
+            if pending and (rows is None or len(pending) >= self.flush_every):
+                table = pa.Table.from_pylist(pending)
+                if writer is None:
+                    writer = pq.ParquetWriter(path, table.schema)
+                else:
+                    table = table.cast(writer.schema)
+                writer.write_table(table)
+                pending = []
+            if rows is None:
+                break
+        if writer is not None:
+            writer.close()
+            if path != self.filename:
+                os.replace(path, self.filename)
+
+
+def load_episode_log(filename):
+    """Read an episode log back as {column: numpy array}"""
+    if filename.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        table = pq.read_table(filename)
+        return {name: table.column(name).to_numpy() for name in table.column_names}
+
+    with open(filename, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = [[float(value) for value in row] for row in reader]
+    columns = np.array(rows, dtype=np.float64).reshape(len(rows), len(header))
+    return {name: columns[:, i] for i, name in enumerate(header)}
+
+
+def truncate_episode_log(filename, num_episodes):
+    """Keep only the first num_episodes episodes of the log's latest run
+
+    Used on resume, to drop the episodes played after the checkpoint. Rows
+    of earlier runs, which a log written before each run started its own
+    file may hold, are dropped too: the latest run starts at the last row
+    numbered episode 1.
+    """
+    if filename.endswith('.parquet'):
+        import pyarrow.parquet as pq
+        table = pq.read_table(filename)
+        starts = np.flatnonzero(table.column('episode').to_numpy() == 1)
+        start = int(starts[-1]) if len(starts) else 0
+        pq.write_table(table.slice(start, num_episodes), filename)
+        return
+    with open(filename, newline='') as f:
+        lines = f.readlines()
+    if not lines:
+        return
+    header, rows = lines[0], lines[1:]
+    column = next(csv.reader([header])).index('episode')
+    start = 0
+    for i, row in enumerate(csv.reader(rows)):
+        if row and row[column] == '1':
+            start = i
+    with open(filename, 'w', newline='') as f:
+        f.write(header)
+        f.writelines(rows[start:start + num_episodes])
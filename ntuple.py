@@ -0,0 +1,222 @@
+import struct
+import time
+
+import numpy as np
+
+from bitboard import afterstates
+from observations import SYMMETRIES, StatePlayer
+from progress import plot_training_progress, print_progress
+from vec_env import max_exponents, move_boards, spawn_tiles
+
+# Four 6-tuples of cell indices (row-major), each shared across the 8
+# rotations/reflections of the board
+DEFAULT_TUPLES = (
+    (0, 1, 2, 3, 4, 5),
+    (4, 5, 6, 7, 8, 9),
+    (0, 1, 2, 4, 5, 6),
+    (4, 5, 6, 8, 9, 10),
+)
+
+_FILE_MAGIC = b'NTUP'
+_FILE_VERSION = 1
+
+
+class NTupleNetwork:
+    """Afterstate value function: a sum of weights looked up by tile tuples
+
+    Each tuple of cells indexes a table of 16**len(tuple) float32 weights by
+    the exponents in those cells. Every tuple is read under all 8 board
+    symmetries, which share one table, so a board has 8 * len(tuples)
+    features.
+    """
+
+    def __init__(self, tuples=DEFAULT_TUPLES, weights=None):
+        self.tuples = tuple(tuple(t) for t in tuples)
+        tuple_len = len(self.tuples[0])
+        if any(len(t) != tuple_len for t in self.tuples):
+            raise ValueError("All tuples must have the same length")
+        self.tuple_len = tuple_len
+        table_size = 16 ** tuple_len
+
+        positions = []
+        offsets = []
+        for index, cells in enumerate(self.tuples):
+            for perm in SYMMETRIES:
+                positions.append(perm[list(cells)])
+                offsets.append(index * table_size)
+        self._positions = np.array(positions, dtype=np.int64)
+        self._offsets = np.array(offsets, dtype=np.int64)
+        self._powers = 16 ** np.arange(tuple_len, dtype=np.int64)
+        self.num_features = len(positions)
+
+        if weights is None:
+            weights = np.zeros(len(self.tuples) * table_size, dtype=np.float32)
+        self.weights = weights
+
+    def feature_indices(self, boards):
+        """Weight indices of every feature of (N, 4, 4) exponent boards"""
+        flat = boards.reshape(len(boards), 16).astype(np.int64)
+        return (flat[:, self._positions] * self._powers).sum(axis=2) + self._offsets
+
+    def values(self, boards):
+        """Estimated afterstate value of each board"""
+        return self.weights[self.feature_indices(boards)].sum(axis=1)
+
+    def update(self, boards, deltas, learning_rate):
+        """Move each board's value towards its TD target by learning_rate * delta
+
+        The step is split evenly between the board's features. Updates of a
+        weight shared by several boards in the batch are averaged, so the
+        effective step does not grow with the number of games in lockstep.
+        """
+        indices = self.feature_indices(boards).reshape(-1)
+        steps = np.repeat(deltas * (learning_rate / self.num_features), self.num_features)
+        unique, inverse, counts = np.unique(indices, return_inverse=True, return_counts=True)
+        totals = np.bincount(inverse, weights=steps, minlength=len(unique))
+        self.weights[unique] += (totals / counts).astype(np.float32)
+
+    def save(self, filename):
+        """Write the tuples and raw float32 weights to a compact binary file"""
+        with open(filename, 'wb') as f:
+            f.write(_FILE_MAGIC)
+            f.write(struct.pack('<HHH', _FILE_VERSION, len(self.tuples), self.tuple_len))
+            for cells in self.tuples:
+                f.write(bytes(cells))
+            self.weights.astype('<f4', copy=False).tofile(f)
+
+    @classmethod
+    def load(cls, filename):
+        """Read a network written by save()"""
+        with open(filename, 'rb') as f:
+            if f.read(4) != _FILE_MAGIC:
+                raise ValueError(f"{filename} is not an n-tuple weight file")
+            version, num_tuples, tuple_len = struct.unpack('<HHH', f.read(6))
+            if version != _FILE_VERSION:
+                raise ValueError(f"Unsupported n-tuple file version {version}")
+            tuples = [tuple(f.read(tuple_len)) for _ in range(num_tuples)]
+            weights = np.fromfile(f, dtype='<f4', count=num_tuples * 16 ** tuple_len)
+        return cls(tuples, weights.astype(np.float32, copy=False))
+
+
+def _best_afterstates(network, boards):
+    """Greedy move for each board: argmax of score gain + afterstate value
+
+    Returns (afterstates, score_gain, can_move) for the chosen moves.
+    """
+    n = len(boards)
+    repeated = np.repeat(boards, 4, axis=0)
+    actions = np.tile(np.arange(4), n)
+    afterstates, gains, moved = move_boards(repeated, actions)
+
+    values = np.where(moved, gains + network.values(afterstates), -np.inf).reshape(n, 4)
+    best = values.argmax(axis=1)
+    chosen = np.arange(n) * 4 + best
+    return afterstates[chosen], gains[chosen], moved.reshape(n, 4).any(axis=1)
+
+
+def train_ntuple(num_games=100000, num_envs=512, learning_rate=0.5, seed=0,
+                 network=None, weights_file='ntuple_2048.bin', report_every=5000,
+                 plot_file='training_progress.png'):
+    """TD(0) afterstate learning of an n-tuple network
+
+    num_envs games are played in lockstep on NumPy boards with the
+    VectorGame2048Env move and spawn rules; the reward is the game score
+    gain. Finished games are replaced until num_games have been played.
+    Returns the network and the per-game scores and max tiles.
+    """
+    rng = np.random.default_rng(seed)
+    if network is None:
+        network = NTupleNetwork()
+
+    boards = np.zeros((num_envs, 4, 4), dtype=np.uint8)
+    spawn_tiles(boards, np.ones(num_envs, dtype=bool), rng)
+    spawn_tiles(boards, np.ones(num_envs, dtype=bool), rng)
+    scores = np.zeros(num_envs, dtype=np.int64)
+    prev_afterstates = np.zeros_like(boards)
+    has_prev = np.zeros(num_envs, dtype=bool)
+
+    game_scores = []
+    game_max_tiles = []
+    next_report = report_every
+    steps = 0
+    start = time.perf_counter()
+
+    while len(game_scores) < num_games:
+        afterstates, gains, alive = _best_afterstates(network, boards)
+
+        # TD target of the previous afterstate: r + V(next afterstate), or
+        # zero when the game has ended
+        targets = np.where(alive, gains + network.values(afterstates), 0.0)
+        update = has_prev
+        if update.any():
+            prev = prev_afterstates[update]
+            deltas = targets[update] - network.values(prev)
+            network.update(prev, deltas, learning_rate)
+
+        # Record and restart finished games
+        dead = ~alive
+        if dead.any():
+            game_scores.extend(scores[dead].tolist())
+            game_max_tiles.extend(np.left_shift(1, max_exponents(boards[dead]).astype(np.int64)).tolist())
+            afterstates[dead] = 0
+            spawn_tiles(afterstates, dead, rng)
+            scores[dead] = 0
+            gains = np.where(dead, 0, gains)
+
+        prev_afterstates = afterstates.copy()
+        has_prev = alive
+        scores += gains
+        spawn_tiles(afterstates, np.ones(num_envs, dtype=bool), rng)
+        boards = afterstates
+        steps += num_envs
+
+        if len(game_scores) >= next_report:
+            elapsed = time.perf_counter() - start
+            print_progress(steps, game_scores, game_max_tiles)
+            print(f"  Games: {len(game_scores)}, {len(game_scores) / elapsed * 3600:,.0f} games/hour")
+            next_report += report_every
+
+    if weights_file:
+        network.save(weights_file)
+        print(f"N-tuple network saved as '{weights_file}'")
+    if plot_file and game_scores:
+        plot_training_progress(game_scores, game_max_tiles, plot_file)
+
+    return network, game_scores, game_max_tiles
+
+
+class NTupleAgent(StatePlayer):
+    """Greedy player over a trained n-tuple afterstate value function"""
+
+    def __init__(self, network):
+        self.network = network
+
+    @classmethod
+    def load(cls, filename='ntuple_2048.bin'):
+        return cls(NTupleNetwork.load(filename))
+
+    def choose_action(self, state, moves=None):
+        """Best action for a packed board, or None when no move is possible
+
+        moves are the board's afterstates() if the caller already has them.
+        """
+        if moves is None:
+            moves = afterstates(state)
+        actions = []
+        gains = []
+        boards = []
+        for action, (afterstate, gain, moved) in enumerate(moves):
+            if moved:
+                actions.append(action)
+                gains.append(gain)
+                boards.append([(afterstate >> shift) & 0xF for shift in range(0, 64, 4)])
+        if not actions:
+            return None
+
+        boards = np.array(boards, dtype=np.uint8).reshape(-1, 4, 4)
+        values = np.array(gains) + self.network.values(boards)
+        return actions[int(values.argmax())]
+
+
+if __name__ == "__main__":
+    train_ntuple()
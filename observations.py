@@ -0,0 +1,240 @@
+from functools import lru_cache
+import math
+
+from gymnasium import spaces
+import numpy as np
+
+_EXPONENTS = np.arange(16, dtype=np.uint64)[:, None]
+
+# Actions as (row, column) steps: left, up, right, down
+_ACTION_STEPS = ((0, -1), (-1, 0), (0, 1), (1, 0))
+
+
+def _cell_shifts(size):
+    """Bit offsets of the cells of a packed size x size board, row-major"""
+    return np.arange(0, 4 * size * size, 4, dtype=np.uint64)
+
+
+@lru_cache(maxsize=None)
+def board_symmetries(size=4):
+    """(cell permutations, action table) of the 8 symmetries of a board size
+
+    Row k of the permutations holds, for each cell of the transformed board
+    (row-major), the cell of the original board it is taken from; row 0 is
+    the identity. Row k of the action table gives the action on the
+    transformed board equivalent to each original action.
+    """
+    grid = np.arange(size * size).reshape(size, size)
+    perms = []
+    for k in range(4):
+        rotated = np.rot90(grid, k)
+        perms.append(rotated.reshape(-1))
+        perms.append(rotated[:, ::-1].reshape(-1))
+    perms = np.array(perms, dtype=np.int64)
+
+    actions = np.zeros((len(perms), 4), dtype=np.int64)
+    for k, perm in enumerate(perms):
+        # Where each original cell ends up on the transformed board
+        new_cell = np.argsort(perm)
+        for action, (dr, dc) in enumerate(_ACTION_STEPS):
+            # A cell with a neighbour in the direction of the move
+            start = size * max(-dr, 0) + max(-dc, 0)
+            end = new_cell[start + size * dr + dc]
+            start = new_cell[start]
+            step = (end // size - start // size, end % size - start % size)
+            actions[k, action] = _ACTION_STEPS.index(step)
+    return perms, actions
+
+
+SYMMETRIES, SYMMETRY_ACTIONS = board_symmetries(4)
+
+
+def state_exponents(state, size=4):
+    """Row-major tile exponents of a packed board of any size, as a list"""
+    return [(state >> shift) & 0xF for shift in range(0, 4 * size * size, 4)]
+
+
+class Log2Encoder:
+    """Flat float32 vector of the size * size tile exponents (log2 of each tile)"""
+
+    def __init__(self, size=4):
+        self.size = size
+        cells = size * size
+        self.observation_space = spaces.Box(
+            low=0, high=17, shape=(cells,), dtype=np.float32
+        )
+        self.buffer = np.zeros(cells, dtype=np.float32)
+        self._nibbles = np.zeros(cells, dtype=np.uint64)
+        self._shifts = _cell_shifts(size)
+
+    def encode(self, state):
+        if self.size > 4:
+            # Beyond 64 bits; split the Python int cell by cell
+            self.buffer[:] = state_exponents(state, self.size)
+            return self.buffer
+        np.right_shift(np.uint64(state), self._shifts, out=self._nibbles)
+        np.bitwise_and(self._nibbles, 0xF, out=self._nibbles)
+        np.copyto(self.buffer, self._nibbles, casting='unsafe')
+        return self.buffer
+
+    def encode_batch(self, states):
+        return unpack_states(states, self.size).astype(np.float32)
+
+
+class OneHotEncoder:
+    """16 binary size x size planes; plane k marks the cells holding exponent k
+
+    Plane 0 marks the empty cells. The channel-first layout suits conv
+    feature extractors.
+    """
+
+    def __init__(self, size=4):
+        self.size = size
+        cells = size * size
+        self.observation_space = spaces.Box(
+            low=0, high=1, shape=(16, size, size), dtype=np.float32
+        )
+        self.buffer = np.zeros((16, size, size), dtype=np.float32)
+        self._nibbles = np.zeros(cells, dtype=np.uint64)
+        self._planes = np.zeros((16, cells), dtype=np.bool_)
+        self._shifts = _cell_shifts(size)
+
+    def encode(self, state):
+        if self.size > 4:
+            self._nibbles[:] = state_exponents(state, self.size)
+        else:
+            np.right_shift(np.uint64(state), self._shifts, out=self._nibbles)
+            np.bitwise_and(self._nibbles, 0xF, out=self._nibbles)
+        np.equal(self._nibbles, _EXPONENTS, out=self._planes)
+        np.copyto(self.buffer.reshape(16, -1), self._planes)
+        return self.buffer
+
+    def encode_batch(self, states):
+        planes = unpack_states(states, self.size)[:, None, :] == _EXPONENTS[None, :, :]
+        return planes.astype(np.float32).reshape(len(states), 16, self.size, self.size)
+
+
+class PackedEncoder:
+    """The packed board itself as a single uint64, for boards up to 4x4"""
+
+    def __init__(self, size=4):
+        if size > 4:
+            raise ValueError(f"A {size}x{size} board does not fit in a uint64")
+        self.size = size
+        self.observation_space = spaces.Box(
+            low=0, high=(1 << (4 * size * size)) - 1, shape=(1,), dtype=np.uint64
+        )
+        self.buffer = np.zeros(1, dtype=np.uint64)
+
+    def encode(self, state):
+        self.buffer[0] = state
+        return self.buffer
+
+    def encode_batch(self, states):
+        return np.asarray(states, dtype=np.uint64).reshape(-1, 1).copy()
+
+
+def unpack_states(states, size=4):
+    """(N, size * size) uint64 exponents, row-major, of an array of packed boards
+
+    Packed arrays hold boards of up to 4x4 cells.
+    """
+    states = np.asarray(states, dtype=np.uint64).reshape(-1, 1)
+    return (states >> _cell_shifts(size)) & np.uint64(0xF)
+
+
+def pack_states(exponents):
+    """Packed uint64 boards of an (N, cells) array of row-major exponents"""
+    exponents = np.asarray(exponents).astype(np.uint64)
+    if exponents.shape[1] > 16:
+        raise ValueError("Only boards of up to 4x4 cells pack into a uint64")
+    exponents <<= np.arange(0, 4 * exponents.shape[1], 4, dtype=np.uint64)
+    return np.bitwise_or.reduce(exponents, axis=1)
+
+
+def pack_observations(obs):
+    """Packed uint64 boards of a batch of observations of any encoding"""
+    obs = np.asarray(obs)
+    if obs.dtype == np.uint64:
+        return obs.reshape(len(obs), -1)[:, 0].copy()
+    if obs.ndim == 4:
+        return pack_states(obs.reshape(len(obs), 16, -1).argmax(axis=1))
+    return pack_states(obs.reshape(len(obs), -1))
+
+
+def transform_states(states, symmetries, size=4):
+    """Apply symmetry symmetries[i] (see board_symmetries()) to board i"""
+    perms, _ = board_symmetries(size)
+    exponents = np.take_along_axis(unpack_states(states, size), perms[symmetries], axis=1)
+    return pack_states(exponents)
+
+
+def observation_to_state(obs):
+    """Recover the packed board from a single observation of any encoding"""
+    obs = np.asarray(obs)
+    if obs.dtype == np.uint64:
+        return int(obs.reshape(-1)[0])
+    if obs.ndim == 3:
+        exponents = obs.reshape(16, -1).argmax(axis=0)
+    else:
+        exponents = obs.reshape(-1)
+    if len(exponents) > 16:
+        return sum(int(exponent) << (4 * cell) for cell, exponent in enumerate(exponents))
+    exponents = exponents.astype(np.uint64) << _cell_shifts(math.isqrt(len(exponents)))
+    return int(np.bitwise_or.reduce(exponents))
+
+
+class StatePlayer:
+    """Base of the players that pick moves for packed boards
+
+    Subclasses define choose_action(state, moves=None), returning None when
+    no move is possible. predict() feeds it the board of an observation, so
+    such a player stands in for a trained SB3 model.
+    """
+
+    def predict(self, obs, deterministic=True):
+        """The move for a single observation, as (action, None)"""
+        action = self.choose_action(observation_to_state(obs))
+        return np.int64(0 if action is None else action), None
+
+
+OBSERVATION_ENCODERS = {
+    'log2': Log2Encoder,
+    'onehot': OneHotEncoder,
+    'packed': PackedEncoder,
+}
+
+
+def make_encoder(observation='log2', size=4):
+    """Create the size x size encoder for one of the OBSERVATION_ENCODERS names"""
+    try:
+        encoder_class = OBSERVATION_ENCODERS[observation]
+    except KeyError:
+        raise ValueError(f"Unknown observation encoding '{observation}', "
+                         f"expected one of {tuple(OBSERVATION_ENCODERS)}") from None
+    return encoder_class(size)
+
+
+def observation_size(observation_space):
+    """Board size of the observations in observation_space"""
+    if observation_space.dtype == np.uint64:
+        # The highest packed board has every nibble set
+        bits = (int(observation_space.high.max()) + 1).bit_length() - 1
+        return math.isqrt(bits // 4)
+    if len(observation_space.shape) == 3:
+        return observation_space.shape[-1]
+    return math.isqrt(observation_space.shape[0])
+
+
+def encoder_for_space(observation_space):
+    """Create the encoder whose observations match observation_space"""
+    size = observation_size(observation_space)
+    for name, encoder_class in OBSERVATION_ENCODERS.items():
+        try:
+            encoder = encoder_class(size)
+        except ValueError:
+            continue
+        if (encoder.observation_space.shape == observation_space.shape and
+                encoder.observation_space.dtype == observation_space.dtype):
+            return encoder
+    raise ValueError(f"No observation encoder produces {observation_space}")
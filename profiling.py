@@ -0,0 +1,56 @@
+from time import perf_counter_ns
+
+
+class PhaseProfiler:
+    """Cumulative wall time and call counts per named phase
+
+    Typical use times consecutive phases of one function:
+
+        t = profiler.start()
+        ...
+        t = profiler.lap('move', t)
+        ...
+        t = profiler.lap('reward', t)
+    """
+
+    def __init__(self):
+        self.totals = {}
+        self.counts = {}
+
+    def start(self):
+        return perf_counter_ns()
+
+    def lap(self, phase, start):
+        """Charge the time since `start` to `phase` and return the current time"""
+        now = perf_counter_ns()
+        self.totals[phase] = self.totals.get(phase, 0) + now - start
+        self.counts[phase] = self.counts.get(phase, 0) + 1
+        return now
+
+    def reset(self):
+        self.totals.clear()
+        self.counts.clear()
+
+    def summary(self):
+        """{phase: {'calls', 'total_us', 'mean_us'}} in recording order"""
+        return {
+            phase: {
+                'calls': self.counts[phase],
+                'total_us': total / 1000,
+                'mean_us': total / 1000 / self.counts[phase],
+            }
+            for phase, total in self.totals.items()
+        }
+
+
+def merge_summaries(summaries):
+    """Combine the summaries of several profilers (e.g. one per env)"""
+    merged = {}
+    for summary in summaries:
+        for phase, stats in summary.items():
+            entry = merged.setdefault(phase, {'calls': 0, 'total_us': 0.0})
+            entry['calls'] += stats['calls']
+            entry['total_us'] += stats['total_us']
+    for entry in merged.values():
+        entry['mean_us'] = entry['total_us'] / entry['calls']
+    return merged
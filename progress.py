@@ -0,0 +1,71 @@
+import argparse
+
+import numpy as np
+
+
+def print_progress(step, scores, max_tiles, exploration_rate=None, window=100):
+    """Print rolling score and max tile statistics over the last `window` games"""
+    avg_score = np.mean(scores[-window:])
+    avg_max_tile = np.mean(max_tiles[-window:])
+    max_tile_achieved = int(max(max_tiles[-window:]))
+    
+    print(f"Step {step}:")
+    print(f"  Avg Score (last {window}): {avg_score:.2f}")
+    print(f"  Avg Max Tile (last {window}): {avg_max_tile:.2f}")
+    print(f"  Best Max Tile (last {window}): {max_tile_achieved}")
+    if exploration_rate is not None:
+        print(f"  Exploration Rate: {exploration_rate:.3f}")
+    print("-" * 50)
+
+
+def plot_training_progress(scores, max_tiles, filename='training_progress.png', show=False):
+    """Plot scores, max tiles and the running average score to `filename`"""
+    import matplotlib.pyplot as plt
+    
+    plt.figure(figsize=(15, 5))
+    
+    plt.subplot(1, 3, 1)
+    plt.plot(scores)
+    plt.title('Training Scores')
+    plt.xlabel('Episode')
+    plt.ylabel('Score')
+    
+    plt.subplot(1, 3, 2)
+    plt.plot(max_tiles)
+    plt.title('Max Tiles Achieved')
+    plt.xlabel('Episode')
+    plt.ylabel('Max Tile Value')
+    
+    plt.subplot(1, 3, 3)
+    # Running average
+    if len(scores) >= 50:
+        running_avg = [np.mean(scores[max(0, i-49):i+1]) for i in range(len(scores))]
+        plt.plot(running_avg)
+        plt.title('Running Average Score (50 episodes)')
+        plt.xlabel('Episode')
+        plt.ylabel('Average Score')
+    
+    plt.tight_layout()
+    plt.savefig(filename)
+    if show:
+        plt.show()
+    else:
+        plt.close()
+
+
+def plot_episode_log(log_file, filename='training_progress.png'):
+    """Plot the training progress recorded in an episode log file"""
+    from metrics import load_episode_log
+
+    episodes = load_episode_log(log_file)
+    plot_training_progress(episodes['score'], episodes['max_tile'], filename)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plot training progress from an episode log")
+    parser.add_argument('log_file', help="CSV or Parquet episode log written during training")
+    parser.add_argument('--output', default='training_progress.png')
+    args = parser.parse_args()
+
+    plot_episode_log(args.log_file, args.output)
+    print(f"Plot written to '{args.output}'")
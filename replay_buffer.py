@@ -0,0 +1,292 @@
+import json
+import os
+
+import numpy as np
+from stable_baselines3.common.buffers import BaseBuffer, ReplayBuffer
+from stable_baselines3.common.type_aliases import ReplayBufferSamples
+
+from observations import (board_symmetries, encoder_for_space, pack_observations,
+                          transform_states)
+
+
+class CompactReplayBuffer(ReplayBuffer):
+    """DQN replay buffer holding each board as one packed uint64
+
+    A transition takes 15 bytes (a packed board, a uint8 action, a float32
+    reward and two bool flags) instead of the 148 of SB3's ReplayBuffer
+    with log2 observations, or 2068 with one-hot planes. The next board of
+    a transition is the board of the same env's following transition, one
+    row down. Only where that does not hold (episode ends) is the next
+    board kept aside in a dict, by flat row * n_envs + env index; the next
+    boards of the newest row wait in last_next_states until the next add().
+    Observations of any encoding in observations.py are packed on add()
+    and only the sampled batch is decoded back to the env's encoding.
+    Boards up to 4x4 fit in a uint64; larger ones are not supported.
+
+    With augment=True each sampled transition is seen under one of the 8
+    rotations/reflections of the board, drawn at random per sample; the
+    action is remapped to match, so no extra copies are stored.
+
+    Use it with DQN(..., replay_buffer_class=CompactReplayBuffer), passing
+    replay_buffer_kwargs=dict(augment=True) to enable augmentation.
+    """
+
+    def __init__(self, buffer_size, observation_space, action_space, device='auto',
+                 n_envs=1, optimize_memory_usage=False, handle_timeout_termination=True,
+                 augment=False):
+        # Skip ReplayBuffer.__init__, which allocates full-size observation arrays
+        BaseBuffer.__init__(self, buffer_size, observation_space, action_space,
+                            device, n_envs=n_envs)
+        if optimize_memory_usage:
+            raise ValueError("CompactReplayBuffer does not support optimize_memory_usage")
+        self.buffer_size = max(buffer_size // n_envs, 1)
+        self.optimize_memory_usage = False
+        self.handle_timeout_termination = handle_timeout_termination
+        self.augment = augment
+        self.encoder = encoder_for_space(observation_space)
+        if self.encoder.size > 4:
+            raise ValueError("CompactReplayBuffer packs boards of up to 4x4 cells into a uint64")
+        self._allocate()
+
+    def _allocate(self):
+        shape = (self.buffer_size, self.n_envs)
+        self.states = np.zeros(shape, dtype=np.uint64)
+        self.actions = np.zeros(shape, dtype=np.uint8)
+        self.rewards = np.zeros(shape, dtype=np.float32)
+        self.dones = np.zeros(shape, dtype=np.bool_)
+        self.timeouts = np.zeros(shape, dtype=np.bool_)
+        self.last_next_states = np.zeros(self.n_envs, dtype=np.uint64)
+        self.next_state_overrides = {}
+
+    @property
+    def nbytes(self):
+        """Memory taken by the stored transitions, arrays only"""
+        return sum(array.nbytes for array in (self.states, self.actions, self.rewards,
+                                              self.dones, self.timeouts))
+
+    def _keep_last_next_states(self, states):
+        """Keep the newest row's next boards that differ from states
+
+        Called before the row after the newest one is overwritten by
+        states; matching boards are found there on sampling.
+        """
+        if self.size() == 0:
+            return
+        row = (self.pos - 1) % self.buffer_size
+        for env in np.flatnonzero(self.last_next_states != states).tolist():
+            self.next_state_overrides[row * self.n_envs + env] = int(self.last_next_states[env])
+
+    def _drop_overrides(self, rows):
+        """Forget the kept next boards of rows about to be overwritten"""
+        overrides = self.next_state_overrides
+        if overrides:
+            for row in np.atleast_1d(rows).tolist():
+                for index in range(row * self.n_envs, (row + 1) * self.n_envs):
+                    overrides.pop(index, None)
+
+    def add(self, obs, next_obs, action, reward, done, infos):
+        states = pack_observations(obs)
+        self._keep_last_next_states(states)
+        self._drop_overrides(self.pos)
+        self.states[self.pos] = states
+        self.last_next_states[:] = pack_observations(next_obs)
+        self.actions[self.pos] = np.asarray(action).reshape(self.n_envs)
+        self.rewards[self.pos] = reward
+        self.dones[self.pos] = done
+        if self.handle_timeout_termination:
+            self.timeouts[self.pos] = [info.get("TimeLimit.truncated", False) for info in infos]
+
+        self.pos += 1
+        if self.pos == self.buffer_size:
+            self.full = True
+            self.pos = 0
+
+    def extend(self, states, actions, rewards, next_states, dones):
+        """Add packed transitions in bulk, e.g. from an expert dataset
+
+        Consecutive transitions run down each of the n_envs columns in
+        turn, so that a transition's next board is usually the following
+        row's board; a remainder too short for a whole row is dropped, as
+        are the oldest transitions when there are more than the buffer
+        holds. Returns the number of transitions added.
+        """
+        rows = min(len(actions) // self.n_envs, self.buffer_size)
+        if rows == 0:
+            return 0
+        count = rows * self.n_envs
+
+        def columns(values):
+            return np.asarray(values)[-count:].reshape(self.n_envs, rows).T
+
+        states, next_states = columns(states), columns(next_states)
+        index = (self.pos + np.arange(rows)) % self.buffer_size
+        self._keep_last_next_states(states[0])
+        self._drop_overrides(index)
+        for name, values in (('states', states), ('actions', columns(actions)),
+                             ('rewards', columns(rewards)), ('dones', columns(dones))):
+            getattr(self, name)[index] = values
+        self.timeouts[index] = False
+        # Next boards that are not the following row's board, such as game ends
+        for row, env in zip(*np.nonzero(next_states[:-1] != states[1:])):
+            self.next_state_overrides[int(index[row]) * self.n_envs + int(env)] = \
+                int(next_states[row, env])
+        self.last_next_states[:] = next_states[-1]
+
+        if self.pos + rows >= self.buffer_size:
+            self.full = True
+        self.pos = (self.pos + rows) % self.buffer_size
+        return count
+
+    def sample(self, batch_size, env=None):
+        upper_bound = self.buffer_size if self.full else self.pos
+        batch_inds = np.random.randint(0, upper_bound, size=batch_size)
+        return self._get_samples(batch_inds, env=env)
+
+    def next_states_of(self, batch_inds, env_indices):
+        """Packed next boards of the transitions at (row, env) indices"""
+        next_states = self.states[(batch_inds + 1) % self.buffer_size, env_indices]
+        newest = batch_inds == (self.pos - 1) % self.buffer_size
+        next_states[newest] = self.last_next_states[env_indices[newest]]
+        overrides = self.next_state_overrides
+        if overrides:
+            flat = (batch_inds * self.n_envs + env_indices).tolist()
+            for i, index in enumerate(flat):
+                state = overrides.get(index)
+                if state is not None:
+                    next_states[i] = state
+        return next_states
+
+    def _get_samples(self, batch_inds, env=None):
+        env_indices = np.random.randint(0, high=self.n_envs, size=(len(batch_inds),))
+        states = self.states[batch_inds, env_indices]
+        next_states = self.next_states_of(batch_inds, env_indices)
+        actions = self.actions[batch_inds, env_indices]
+        if self.augment:
+            size = self.encoder.size
+            perms, symmetry_actions = board_symmetries(size)
+            symmetries = np.random.randint(0, len(perms), size=len(batch_inds))
+            states = transform_states(states, symmetries, size)
+            next_states = transform_states(next_states, symmetries, size)
+            actions = symmetry_actions[symmetries, actions]
+        # Only use dones that are not due to timeouts
+        dones = self.dones[batch_inds, env_indices] & ~self.timeouts[batch_inds, env_indices]
+
+        data = (
+            self._normalize_obs(self.encoder.encode_batch(states), env),
+            actions.astype(np.int64).reshape(-1, 1),
+            self._normalize_obs(self.encoder.encode_batch(next_states), env),
+            dones.astype(np.float32).reshape(-1, 1),
+            self._normalize_reward(self.rewards[batch_inds, env_indices].reshape(-1, 1), env),
+        )
+        return ReplayBufferSamples(*tuple(map(self.to_torch, data)))
+
+
+class MemmapReplayBuffer(CompactReplayBuffer):
+    """CompactReplayBuffer kept in numpy.memmap files under run_dir
+
+    Transitions are appended in place to one file per field, so the buffer
+    can exceed RAM and survives the process: opening a run_dir that already
+    holds a buffer of the same size resumes it at the position recorded by
+    the last flush(). The position is flushed every flush_every add() calls
+    and on save; transitions added after the last flush are not counted on
+    resume. The next boards kept aside (see CompactReplayBuffer) are
+    flushed with it, to next_states.npz.
+    """
+
+    _FIELDS = (('states', np.uint64), ('actions', np.uint8), ('rewards', np.float32),
+               ('dones', np.bool_), ('timeouts', np.bool_))
+    # Bumped when the files change; version 1 also stored every next board
+    _FORMAT = 2
+
+    def __init__(self, buffer_size, observation_space, action_space, device='auto',
+                 n_envs=1, optimize_memory_usage=False, handle_timeout_termination=True,
+                 augment=False, run_dir='replay_buffer', flush_every=10000):
+        self.run_dir = run_dir
+        self.flush_every = flush_every
+        self._unflushed = 0
+        super().__init__(buffer_size, observation_space, action_space, device, n_envs,
+                         optimize_memory_usage, handle_timeout_termination, augment)
+
+    def _allocate(self):
+        os.makedirs(self.run_dir, exist_ok=True)
+        meta_file = os.path.join(self.run_dir, 'buffer.json')
+        resume = os.path.exists(meta_file)
+        if resume:
+            with open(meta_file) as f:
+                meta = json.load(f)
+            if meta.get('format', 1) != self._FORMAT:
+                raise ValueError(f"Replay buffer in '{self.run_dir}' has an older file format; "
+                                 f"remove it or use another directory")
+            if (meta['buffer_size'], meta['n_envs']) != (self.buffer_size, self.n_envs):
+                raise ValueError(
+                    f"Replay buffer in '{self.run_dir}' holds {meta['buffer_size']}x{meta['n_envs']} "
+                    f"transitions, not {self.buffer_size}x{self.n_envs}"
+                )
+            self.pos = meta['pos']
+            self.full = meta['full']
+
+        shape = (self.buffer_size, self.n_envs)
+        for name, dtype in self._FIELDS:
+            setattr(self, name, np.memmap(os.path.join(self.run_dir, f'{name}.bin'), dtype=dtype,
+                                          mode='r+' if resume else 'w+', shape=shape))
+        self.last_next_states = np.zeros(self.n_envs, dtype=np.uint64)
+        self.next_state_overrides = {}
+        if resume:
+            with np.load(os.path.join(self.run_dir, 'next_states.npz')) as next_states:
+                self.last_next_states[:] = next_states['last']
+                self.next_state_overrides = dict(zip(next_states['index'].tolist(),
+                                                     next_states['state'].tolist()))
+        else:
+            self.flush()
+
+    def add(self, obs, next_obs, action, reward, done, infos):
+        super().add(obs, next_obs, action, reward, done, infos)
+        self._unflushed += 1
+        if self._unflushed >= self.flush_every:
+            self.flush()
+
+    def extend(self, states, actions, rewards, next_states, dones):
+        count = super().extend(states, actions, rewards, next_states, dones)
+        self.flush()
+        return count
+
+    def sample(self, batch_size, env=None):
+        upper_bound = self.buffer_size if self.full else self.pos
+        # Sorted rows turn the memmap reads into one forward sweep
+        batch_inds = np.sort(np.random.randint(0, upper_bound, size=batch_size))
+        return self._get_samples(batch_inds, env=env)
+
+    def flush(self):
+        """Write the buffer to disk and record its position for resuming"""
+        for name, _ in self._FIELDS:
+            getattr(self, name).flush()
+        next_file = os.path.join(self.run_dir, 'next_states.npz')
+        overrides = self.next_state_overrides
+        with open(next_file + '.tmp', 'wb') as f:
+            np.savez(f, last=self.last_next_states,
+                     index=np.fromiter(overrides.keys(), dtype=np.int64, count=len(overrides)),
+                     state=np.fromiter(overrides.values(), dtype=np.uint64, count=len(overrides)))
+        os.replace(next_file + '.tmp', next_file)
+        meta_file = os.path.join(self.run_dir, 'buffer.json')
+        with open(meta_file + '.tmp', 'w') as f:
+            json.dump({'format': self._FORMAT, 'buffer_size': self.buffer_size,
+                       'n_envs': self.n_envs, 'pos': self.pos, 'full': self.full}, f)
+        os.replace(meta_file + '.tmp', meta_file)
+        self._unflushed = 0
+
+    def __getstate__(self):
+        # Pickle (e.g. DQN.save_replay_buffer) only the location of the data
+        self.flush()
+        state = self.__dict__.copy()
+        for name, _ in self._FIELDS:
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        pos, full = self.pos, self.full
+        last_next_states, overrides = self.last_next_states, self.next_state_overrides
+        self._allocate()
+        # The pickled position and next boards win over those last flushed
+        self.pos, self.full = pos, full
+        self.last_next_states, self.next_state_overrides = last_next_states, overrides
@@ -0,0 +1,112 @@
+from functools import lru_cache
+
+import numpy as np
+
+from bitboard import (ROW_MASK, TABLE_MAX_SIZE, key_lines, lookup_table, pack_board,
+                      packed_board, transpose)
+
+# Weights of the shaped reward used by Game2048RLEnv and VectorGame2048Env.
+# Pass a dict with any subset of these keys as `reward_weights` to override.
+DEFAULT_REWARD_WEIGHTS = {
+    'invalid_move': -1.0,     # Flat reward for a move that changes nothing
+    'score': 0.01,            # Per point of score gained
+    'max_tile': 50.0,         # Per log2 of a new highest tile
+    'corner': 5.0,            # Largest tile in a corner
+    'edge': 2.0,              # Largest tile on an edge (but not a corner)
+    'smoothness': 0.1,        # Per log2 step between rough neighbours
+    'monotonicity': 2.0,      # Per monotonic row/column
+    'empty_cells': 0.5,       # Per empty cell
+    'survival': 0.1,          # Per valid move
+    # Adaptive score bonus by episode count: early (< 1000), mid (< 5000), late
+    'adaptive_early': 0.1,
+    'adaptive_mid': 0.05,
+    'adaptive_late': 0.02,
+}
+
+
+def make_reward_weights(overrides=None):
+    """Merge user overrides into the default reward weights"""
+    weights = dict(DEFAULT_REWARD_WEIGHTS)
+    if overrides:
+        unknown = set(overrides) - set(weights)
+        if unknown:
+            raise ValueError(f"Unknown reward weights: {sorted(unknown)}")
+        weights.update(overrides)
+    return weights
+
+
+def line_features(lines):
+    """Heuristic features of (N, L) exponent lines, vectorized
+
+    Returns (smoothness, monotonic, empty_cells, line_max) arrays of N
+    values each. These are the per-line terms of the shaped reward; the
+    board-level terms sum them over rows and/or columns.
+    """
+    lines = np.asarray(lines, dtype=np.int64)
+    first, second = lines[:, :-1], lines[:, 1:]
+
+    # Neighbouring non-empty tiles more than two doublings apart. The
+    # board-level penalty visits every pair from both sides, so count twice.
+    gaps = np.abs(first - second)
+    smoothness = np.where((first != 0) & (second != 0) & (gaps > 2), 2 * gaps, 0).sum(axis=1)
+
+    # Non-empty tiles (at least two) in non-increasing or non-decreasing order
+    tiles = np.take_along_axis(lines, np.argsort(lines == 0, axis=1, kind='stable'), axis=1)
+    pairs = tiles[:, 1:] != 0
+    increasing = (~pairs | (tiles[:, :-1] <= tiles[:, 1:])).all(axis=1)
+    decreasing = (~pairs | (tiles[:, :-1] >= tiles[:, 1:])).all(axis=1)
+    monotonic = (pairs.any(axis=1) & (increasing | decreasing)).astype(np.int64)
+
+    return smoothness, monotonic, (lines == 0).sum(axis=1), lines.max(axis=1)
+
+
+class _LineFeatureCache(dict):
+    """One line feature by line key, computed on first lookup"""
+
+    def __init__(self, size, feature):
+        super().__init__()
+        self.size = size
+        self.feature = feature
+
+    def __missing__(self, key):
+        value = self[key] = int(line_features(key_lines([key], self.size))[self.feature][0])
+        return value
+
+
+@lru_cache(maxsize=None)
+def line_tables(size=4):
+    """(smoothness, monotonic, empty_cells, line_max) lookups by line key
+
+    Indexed by the 4 * size-bit key of a row or column (nibble j = cell
+    j). Up to TABLE_MAX_SIZE they are tables of every line; larger boards
+    get dicts that compute a line's feature the first time it is looked up.
+    """
+    if size > TABLE_MAX_SIZE:
+        return tuple(_LineFeatureCache(size, feature) for feature in range(4))
+    lines = key_lines(np.arange(16 ** size, dtype=np.uint64), size)
+    return tuple(lookup_table(values) for values in line_features(lines))
+
+
+def board_lines(board, size=4):
+    """Row and column keys of a board: (row0..row{size-1}, col0..col{size-1})
+
+    Accepts either a packed state or a size x size list of tile values.
+    """
+    state = board if isinstance(board, int) else pack_board(board)
+    if size != 4:
+        packed = packed_board(size)
+        return tuple(packed.rows(state) + packed.rows(packed.transpose(state)))
+    t = transpose(state)
+    return (state & ROW_MASK, (state >> 16) & ROW_MASK,
+            (state >> 32) & ROW_MASK, state >> 48,
+            t & ROW_MASK, (t >> 16) & ROW_MASK,
+            (t >> 32) & ROW_MASK, t >> 48)
+
+
+def adaptive_scale(episode_count, weights):
+    """Score multiplier of the adaptive bonus for a given episode count"""
+    if episode_count < 1000:
+        return weights['adaptive_early']
+    elif episode_count < 5000:
+        return weights['adaptive_mid']
+    return weights['adaptive_late']
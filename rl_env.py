@@ -1,37 +1,81 @@
 import gymnasium as gym
 from gymnasium import spaces
 import numpy as np
-from game2048 import Game2048
+from bitboard import game_afterstates, game_state, packed_board
+from game2048 import make_game
+from observations import make_encoder
+from profiling import PhaseProfiler
+from reward_shaping import adaptive_scale, board_lines, line_tables, make_reward_weights
 
 class Game2048RLEnv(gym.Env):
-    def __init__(self):
+    def __init__(self, engine='bitboard', reward_weights=None, action_mask_in_info=False,
+                 observation='log2', profile=False, size=4):
         super().__init__()
-        self.game = Game2048()
+        self.engine = engine
+        # Board size: 4 is the classic game, 3 suits curricula, 5+ scaling studies
+        self.size = size
+        # Add a copy of the legal-move mask to every step's info as 'action_mask'
+        self.action_mask_in_info = action_mask_in_info
+        # Overrides for reward_shaping.DEFAULT_REWARD_WEIGHTS
+        self.reward_weights = make_reward_weights(reward_weights)
+        self._bind_tables()
+        self.game = make_game(engine, rng=self.np_random, size=size)
         
         # Action space: 0=left, 1=up, 2=right, 3=down
         self.action_space = spaces.Discrete(4)
         
-        # State space: 4x4 grid with log2 encoding
-        self.observation_space = spaces.Box(
-            low=0, high=17, shape=(16,), dtype=np.float32
-        )
+        # State space: size x size grid as 'log2' exponents, 'onehot' planes or
+        # 'packed' uint64 (boards up to 4x4)
+        self.observation = observation
+        self.encoder = make_encoder(observation, size)
+        self.observation_space = self.encoder.observation_space
         
         self.episode_count = 0
         
+        # Legal-move mask, recomputed lazily when the board changes
+        self._action_mask = np.zeros(4, dtype=np.bool_)
+        self._action_mask_state = None
+        
+        # Per-phase step timings; None keeps step() free of timing calls
+        self.profiler = PhaseProfiler() if profile else None
+        
+    def _bind_tables(self):
+        """Look up the shared move and reward tables of the board size"""
+        # Per-line reward features, by row/column key
+        self._smoothness, self._monotonic, self._empty_cells, self._line_max = line_tables(self.size)
+        self._legal_moves = packed_board(self.size).legal_moves
+    
+    def __getstate__(self):
+        # Pickle (checkpoints, subprocess envs) without the shared tables
+        state = self.__dict__.copy()
+        for name in ('_smoothness', '_monotonic', '_empty_cells', '_line_max', '_legal_moves'):
+            del state[name]
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._bind_tables()
+    
     def reset(self, seed=None, options=None):
         super().reset(seed=seed)
-        self.game = Game2048()
+        # The game draws its tiles from the env's seeded np_random
+        self.game = make_game(self.engine, rng=self.np_random, size=self.size)
         self.episode_count += 1
         return self._get_observation(), {}
     
     def step(self, action):
+        profiler = self.profiler
+        if profiler is not None:
+            t = profiler.start()
+        
         # Map actions
         actions = ['left', 'up', 'right', 'down']
         
         # Store previous state for reward calculation
         prev_score = self.game.score
         prev_max_tile = self.game.get_max_tile()
-        prev_board = [row[:] for row in self.game.board]
+        if profiler is not None:
+            t = profiler.lap('prev', t)
         
         # Execute move
         if actions[action] == 'left':
@@ -42,64 +86,106 @@ class Game2048RLEnv(gym.Env):
             moved = self.game.move_right()
         elif actions[action] == 'down':
             moved = self.game.move_down()
+        if profiler is not None:
+            t = profiler.lap('move', t)
         
         # Calculate enhanced reward
-        reward = self._calculate_enhanced_reward(moved, prev_score, prev_max_tile, prev_board)
+        reward = self._calculate_enhanced_reward(moved, prev_score, prev_max_tile)
+        if profiler is not None:
+            t = profiler.lap('reward', t)
         
         # Add new tile if move was valid
         if moved:
             self.game.add_new_tile()
+        if profiler is not None:
+            t = profiler.lap('spawn', t)
         
         # Check if game is done
         done = not self.game.can_move()
+        if profiler is not None:
+            t = profiler.lap('can_move', t)
         
         # Additional info
         info = {
             'score': self.game.score,
             'max_tile': self.game.get_max_tile(),
-            'moved': moved,
-            'valid_actions': self.get_valid_actions()
+            'moved': moved
         }
+        if self.action_mask_in_info:
+            # A copy: the cached mask is updated in place on later steps
+            info['action_mask'] = self.action_masks().copy()
+        if profiler is not None:
+            t = profiler.lap('info', t)
         
-        return self._get_observation(), reward, done, False, info
+        obs = self._get_observation()
+        if done:
+            # Vec envs keep the final observation (as terminal_observation)
+            # across the reset that would overwrite the shared buffer
+            obs = obs.copy()
+        if profiler is not None:
+            profiler.lap('observation', t)
+        
+        return obs, reward, done, False, info
     
-    def _get_observation(self):
-        """Convert board to log2 encoded flat array with additional features"""
-        obs = np.zeros(16, dtype=np.float32)
-        flat_board = np.array(self.game.board).flatten()
+    def get_profile(self):
+        """Cumulative time and call count of each step() phase
         
-        for i, cell in enumerate(flat_board):
-            if cell > 0:
-                obs[i] = np.log2(cell)
+        Returns {phase: {'calls', 'total_us', 'mean_us'}}, or an empty dict
+        when profiling is disabled.
+        """
+        return self.profiler.summary() if self.profiler is not None else {}
+    
+    def set_profiling(self, enabled):
+        """Turn step() phase profiling on (with fresh counters) or off"""
+        self.profiler = PhaseProfiler() if enabled else None
+    
+    def _get_observation(self):
+        """Encode the board into the encoder's preallocated buffer
         
-        return obs
+        The same array is overwritten by the next reset/step; copy it if it
+        has to be kept. step() returns a copy on the final step of a game.
+        """
+        return self.encoder.encode(self._board_state())
     
-    def _calculate_enhanced_reward(self, moved, prev_score, prev_max_tile, prev_board):
+    def _board_state(self):
+        """Current board as a packed integer (64 bits for 4x4)"""
+        return game_state(self.game)
+    
+    def _board_lines(self):
+        """Packed row and column keys of the current board"""
+        return board_lines(self._board_state(), self.size)
+    
+    def _calculate_enhanced_reward(self, moved, prev_score, prev_max_tile):
         """Enhanced reward function to prevent getting stuck"""
+        weights = self.reward_weights
         if not moved:
-            return -1.0  # Strong penalty for invalid moves
+            return weights['invalid_move']  # Strong penalty for invalid moves
+        
+        # Every heuristic below is a lookup on these row/column keys
+        lines = self._board_lines()
         
         # Base reward for score increase
         score_increase = self.game.score - prev_score
-        score_reward = score_increase * 0.01
+        score_reward = score_increase * weights['score']
         
         # Bonus for reaching higher tiles
-        current_max = self.game.get_max_tile()
+        line_max = self._line_max
+        max_exponent = max(line_max[line] for line in lines[:self.size])
         tile_bonus = 0
-        if current_max > prev_max_tile:
-            tile_bonus = np.log2(current_max) * 50
+        if (1 << max_exponent) > prev_max_tile:
+            tile_bonus = max_exponent * weights['max_tile']
         
         # Strategy-based rewards
-        corner_bonus = self._corner_strategy_reward()
-        smoothness_penalty = self._smoothness_penalty()
-        monotonicity_bonus = self._monotonicity_bonus()
-        empty_cells_bonus = self._empty_cells_bonus()
+        corner_bonus = self._corner_strategy_reward(lines)
+        smoothness_penalty = self._smoothness_penalty(lines)
+        monotonicity_bonus = self._monotonicity_bonus(lines)
+        empty_cells_bonus = self._empty_cells_bonus(lines)
         
         # Adaptive reward based on training progress
         adaptive_bonus = self._adaptive_reward_bonus(score_increase)
         
         # Small survival bonus
-        survival_bonus = 0.1
+        survival_bonus = weights['survival']
         
         total_reward = (score_reward + tile_bonus + corner_bonus + 
                        monotonicity_bonus + empty_cells_bonus + 
@@ -107,104 +193,84 @@ class Game2048RLEnv(gym.Env):
         
         return total_reward
     
-    def _corner_strategy_reward(self):
+    def _corner_strategy_reward(self, lines=None):
         """Reward for keeping largest tile in corner"""
-        max_tile = self.game.get_max_tile()
-        corners = [
-            self.game.board[0][0], self.game.board[0][3],
-            self.game.board[3][0], self.game.board[3][3]
-        ]
-        if max_tile in corners:
-            return 5.0
+        if lines is None:
+            lines = self._board_lines()
+        size = self.size
+        line_max = self._line_max
+        top, bottom, left, right = lines[0], lines[size - 1], lines[size], lines[-1]
+        max_exponent = max(line_max[line] for line in lines[:size])
+        last = 4 * (size - 1)
+        corners = (top & 0xF, top >> last, bottom & 0xF, bottom >> last)
+        if max_exponent in corners:
+            return self.reward_weights['corner']
         
         # Smaller reward for keeping it on edges
-        edges = (list(self.game.board[0]) + list(self.game.board[3]) + 
-                [self.game.board[i][0] for i in range(4)] + 
-                [self.game.board[i][3] for i in range(4)])
-        if max_tile in edges:
-            return 2.0
+        if max_exponent in (line_max[top], line_max[bottom], line_max[left], line_max[right]):
+            return self.reward_weights['edge']
         
         return 0
     
-    def _smoothness_penalty(self):
+    def _smoothness_penalty(self, lines=None):
         """Penalty for having scattered tiles"""
-        penalty = 0
-        for i in range(4):
-            for j in range(4):
-                if self.game.board[i][j] != 0:
-                    neighbors = []
-                    for di, dj in [(0,1), (0,-1), (1,0), (-1,0)]:
-                        ni, nj = i + di, j + dj
-                        if 0 <= ni < 4 and 0 <= nj < 4 and self.game.board[ni][nj] != 0:
-                            neighbors.append(self.game.board[ni][nj])
-                    
-                    for neighbor in neighbors:
-                        diff = abs(np.log2(self.game.board[i][j]) - np.log2(neighbor))
-                        if diff > 2:
-                            penalty += diff * 0.1
-        return penalty
-    
-    def _monotonicity_bonus(self):
+        if lines is None:
+            lines = self._board_lines()
+        smoothness = self._smoothness
+        rough = sum(smoothness[line] for line in lines)
+        return rough * self.reward_weights['smoothness']
+    
+    def _monotonicity_bonus(self, lines=None):
         """Bonus for maintaining monotonic rows/columns"""
-        bonus = 0
-        
-        # Check rows
-        for row in self.game.board:
-            non_zero = [x for x in row if x > 0]
-            if len(non_zero) > 1:
-                if all(non_zero[i] >= non_zero[i+1] for i in range(len(non_zero)-1)) or \
-                   all(non_zero[i] <= non_zero[i+1] for i in range(len(non_zero)-1)):
-                    bonus += 2.0
-        
-        # Check columns
-        for j in range(4):
-            col = [self.game.board[i][j] for i in range(4)]
-            non_zero = [x for x in col if x > 0]
-            if len(non_zero) > 1:
-                if all(non_zero[i] >= non_zero[i+1] for i in range(len(non_zero)-1)) or \
-                   all(non_zero[i] <= non_zero[i+1] for i in range(len(non_zero)-1)):
-                    bonus += 2.0
-        
-        return bonus
-    
-    def _empty_cells_bonus(self):
+        if lines is None:
+            lines = self._board_lines()
+        monotonic = self._monotonic
+        count = sum(monotonic[line] for line in lines)
+        return count * self.reward_weights['monotonicity']
+    
+    def _empty_cells_bonus(self, lines=None):
         """Bonus for maintaining empty cells"""
-        empty_count = sum(row.count(0) for row in self.game.board)
-        return empty_count * 0.5
+        if lines is None:
+            lines = self._board_lines()
+        empty_cells = self._empty_cells
+        empty_count = sum(empty_cells[line] for line in lines[:self.size])
+        return empty_count * self.reward_weights['empty_cells']
     
     def _adaptive_reward_bonus(self, score_increase):
         """Adaptive reward that changes based on training progress"""
-        if self.episode_count < 1000:
-            # Early training: focus on basic moves and merges
-            return score_increase * 0.1
-        elif self.episode_count < 5000:
-            # Mid training: focus on score improvement
-            return score_increase * 0.05
-        else:
-            # Late training: focus on strategy
-            return score_increase * 0.02
+        return score_increase * adaptive_scale(self.episode_count, self.reward_weights)
+    
+    def action_masks(self):
+        """Boolean mask over actions of the moves that would change the board
+        
+        All four moves are checked together from the row/column move tables.
+        The returned array is cached and updated in place until the board
+        changes, so copy it if it has to outlive the current step.
+        """
+        state = self._board_state()
+        if state != self._action_mask_state:
+            moves = self._legal_moves(state)
+            mask = self._action_mask
+            mask[0] = moves & 1
+            mask[1] = moves & 2
+            mask[2] = moves & 4
+            mask[3] = moves & 8
+            self._action_mask_state = state
+        return self._action_mask
+    
+    def afterstates(self):
+        """(packed afterstate, score gain, moved) of each action
+        
+        Computed together for the current board and cached by the game until
+        it changes, so a player that looks at them and the following step()
+        move the board only once per direction.
+        """
+        return game_afterstates(self.game)
     
     def get_valid_actions(self):
         """Get list of valid actions that would change the board"""
-        valid_actions = []
-        current_board = [row[:] for row in self.game.board]
-        
-        test_game = Game2048()
-        for action in range(4):
-            test_game.board = [row[:] for row in current_board]
-            
-            if action == 0:  # left
-                moved = test_game.move_left()
-            elif action == 1:  # up
-                moved = test_game.move_up()
-            elif action == 2:  # right
-                moved = test_game.move_right()
-            elif action == 3:  # down
-                moved = test_game.move_down()
-            
-            if moved:
-                valid_actions.append(action)
-        
+        mask = self.action_masks()
+        valid_actions = [action for action in range(4) if mask[action]]
         return valid_actions if valid_actions else [0]  # Fallback to prevent empty list
     
     def render(self, mode='human'):
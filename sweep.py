@@ -0,0 +1,343 @@
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import contextlib
+import json
+import math
+import multiprocessing
+import os
+import sqlite3
+import time
+import traceback
+
+import numpy as np
+
+from checkpoint import latest_checkpoint
+from evaluate import evaluate
+from train_dqn import DEFAULT_HYPERPARAMS, train_enhanced_dqn
+
+# Search space over train_dqn.DEFAULT_HYPERPARAMS and the TRIAL_OPTIONS of
+# train_enhanced_dqn. A list is a set of choices; a dict draws uniformly
+# from [low, high], log-uniformly with "log": true, rounded with "int": true.
+# Keys left out keep their defaults.
+DEFAULT_SPACE = {
+    'learning_rate': {'low': 1e-4, 'high': 1e-3, 'log': True},
+    'gamma': [0.9, 0.95, 0.99],
+    'buffer_size': [50000, 100000, 200000],
+    'net_arch': [[256, 256], [256, 256, 128], [512, 512, 256, 128]],
+    'exploration_fraction': {'low': 0.1, 'high': 0.5},
+    'exploration_final_eps': [0.01, 0.05, 0.1],
+    'gradient_steps': [1, 2, 4],
+}
+
+# train_enhanced_dqn arguments a search space may set besides hyperparameters
+TRIAL_OPTIONS = ('buffer_size', 'augment', 'num_envs')
+
+# Libraries sizing their thread pools from the environment when loaded
+_THREAD_VARIABLES = ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS')
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS sweeps (
+    id INTEGER PRIMARY KEY,
+    name TEXT,
+    started REAL,
+    settings TEXT,
+    space TEXT
+);
+CREATE TABLE IF NOT EXISTS trials (
+    id INTEGER PRIMARY KEY,
+    sweep_id INTEGER REFERENCES sweeps(id),
+    number INTEGER,
+    params TEXT,
+    run_dir TEXT,
+    status TEXT,
+    rung INTEGER,
+    timesteps INTEGER,
+    score REAL,
+    error TEXT
+);
+CREATE TABLE IF NOT EXISTS evaluations (
+    trial_id INTEGER REFERENCES trials(id),
+    rung INTEGER,
+    timesteps INTEGER,
+    mean_score REAL,
+    median_score REAL,
+    max_score INTEGER,
+    win_rate REAL,
+    max_tile INTEGER,
+    invalid_move_rate REAL,
+    train_seconds REAL,
+    eval_seconds REAL,
+    recorded REAL
+);
+'''
+
+
+def check_space(space):
+    unknown = set(space) - set(DEFAULT_HYPERPARAMS) - set(TRIAL_OPTIONS)
+    if unknown:
+        raise ValueError(f"Unknown search space keys: {sorted(unknown)}")
+
+
+def sample_params(space, rng):
+    """Draw one value for every key of a search space"""
+    params = {}
+    for key, choices in space.items():
+        if isinstance(choices, dict):
+            low, high = choices['low'], choices['high']
+            if choices.get('log'):
+                value = math.exp(rng.uniform(math.log(low), math.log(high)))
+            else:
+                value = rng.uniform(low, high)
+            params[key] = round(value) if choices.get('int') else float(value)
+        else:
+            params[key] = choices[int(rng.integers(len(choices)))]
+    return params
+
+
+def rung_timesteps(min_timesteps, max_timesteps, eta=3):
+    """Training budgets of the successive halving rungs: min * eta^k up to max"""
+    budgets = []
+    timesteps = min_timesteps
+    while timesteps < max_timesteps:
+        budgets.append(timesteps)
+        timesteps *= eta
+    budgets.append(max_timesteps)
+    return budgets
+
+
+def open_database(path):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    db = sqlite3.connect(path)
+    db.executescript(_SCHEMA)
+    return db
+
+
+@contextlib.contextmanager
+def _thread_limits(threads):
+    """Set the thread pool sizes that spawned worker processes start with"""
+    saved = {var: os.environ.get(var) for var in _THREAD_VARIABLES}
+    os.environ.update({var: str(threads) for var in _THREAD_VARIABLES})
+    try:
+        yield
+    finally:
+        for var, value in saved.items():
+            if value is None:
+                del os.environ[var]
+            else:
+                os.environ[var] = value
+
+
+def _init_worker(threads):
+    import torch
+    torch.set_num_threads(threads)
+
+
+def _run_trial(run_dir, params, timesteps, max_timesteps, seed, eval_games, eval_seed):
+    """Train a trial up to timesteps and evaluate its model; runs in a worker
+
+    The worker process changes into run_dir, so train_dqn's model, episode
+    log, plot and checkpoints land there; its output goes to train.log. A
+    trial with a checkpoint is resumed and trained on to the new total.
+    """
+    os.makedirs(run_dir, exist_ok=True)
+    os.chdir(run_dir)
+    hyperparams = {key: value for key, value in params.items() if key in DEFAULT_HYPERPARAMS}
+    options = {key: value for key, value in params.items() if key in TRIAL_OPTIONS}
+
+    resume = latest_checkpoint('checkpoints') is not None
+    start = time.perf_counter()
+    with open('train.log', 'a') as log, contextlib.redirect_stdout(log):
+        # Checkpoints are only taken at the end of each rung
+        train_enhanced_dqn(total_timesteps=timesteps, checkpoint_freq=max_timesteps,
+                           keep_checkpoints=1, resume=resume,
+                           hyperparams=hyperparams, schedule_timesteps=max_timesteps,
+                           seed=seed, progress_bar=False, **options)
+    train_seconds = time.perf_counter() - start
+
+    # Every trial plays the same seeded games
+    report = evaluate('dqn', num_games=eval_games, workers=0, seed=eval_seed,
+                      model_path='dqn_2048_enhanced', batch_size=eval_games)
+    max_tile = max(int(tile) for tile in report['max_tile_counts'])
+    return {
+        'timesteps': timesteps,
+        'mean_score': report['score']['mean'],
+        'median_score': report['score']['median'],
+        'max_score': report['score']['max'],
+        'win_rate': report['win_rate'],
+        'max_tile': max_tile,
+        'invalid_move_rate': report['invalid_move_rate'],
+        'train_seconds': train_seconds,
+        'eval_seconds': report['elapsed_sec'],
+    }
+
+
+def run_sweep(space=None, num_trials=9, min_timesteps=20000, max_timesteps=180000, eta=3,
+              workers=3, threads=1, eval_games=50, seed=0, out_dir='sweeps',
+              database=None, name=None):
+    """Search hyperparameters with successive halving
+
+    num_trials settings are drawn from space and trained for min_timesteps
+    each, eta times longer per rung, up to max_timesteps. After every rung
+    the trials are scored by the mean score of eval_games headless games
+    (the same seeded games for all of them) and only the best 1/eta go on;
+    a trial continues from its end-of-rung checkpoint, with its exploration
+    schedule spanning max_timesteps throughout. Trials of a rung run in a
+    pool of workers spawned processes, each limited to threads CPU threads
+    and replaced after every trial rung.
+
+    Trials, their status and every evaluation are recorded in the SQLite
+    database (default out_dir/sweeps.db); trial runs are kept in
+    out_dir/<name>/trial_<n>. Returns the best trial as a dict.
+    """
+    space = DEFAULT_SPACE if space is None else space
+    check_space(space)
+    name = name or time.strftime('%Y%m%d-%H%M%S')
+    database = database or os.path.join(out_dir, 'sweeps.db')
+    budgets = rung_timesteps(min_timesteps, max_timesteps, eta)
+    settings = dict(num_trials=num_trials, min_timesteps=min_timesteps,
+                    max_timesteps=max_timesteps, eta=eta, workers=workers, threads=threads,
+                    eval_games=eval_games, seed=seed)
+
+    db = open_database(database)
+    with db:
+        sweep_id = db.execute(
+            'INSERT INTO sweeps (name, started, settings, space) VALUES (?, ?, ?, ?)',
+            (name, time.time(), json.dumps(settings), json.dumps(space))).lastrowid
+
+    rng = np.random.default_rng(seed)
+    trials = []
+    for number in range(num_trials):
+        params = sample_params(space, rng)
+        run_dir = os.path.abspath(os.path.join(out_dir, name, f'trial_{number:03d}'))
+        with db:
+            trial_id = db.execute(
+                'INSERT INTO trials (sweep_id, number, params, run_dir, status, rung, timesteps) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (sweep_id, number, json.dumps(params), run_dir, 'pending', None, 0)).lastrowid
+        trials.append({'id': trial_id, 'number': number, 'params': params, 'run_dir': run_dir})
+    print(f"Sweep '{name}': {num_trials} trials, rungs at {budgets} steps, "
+          f"recorded in '{database}'")
+
+    # Fresh spawned processes start with the thread limits and free each
+    # trial's memory (replay buffer, model) when it is done
+    context = multiprocessing.get_context('spawn')
+    survivors = trials
+    with _thread_limits(threads), ProcessPoolExecutor(
+            max_workers=workers, mp_context=context, max_tasks_per_child=1,
+            initializer=_init_worker, initargs=(threads,)) as pool:
+        for rung, timesteps in enumerate(budgets):
+            start = time.perf_counter()
+            with db:
+                db.executemany('UPDATE trials SET status = ? WHERE id = ?',
+                               [('running', trial['id']) for trial in survivors])
+            futures = {
+                pool.submit(_run_trial, trial['run_dir'], trial['params'], timesteps,
+                            max_timesteps, seed + trial['number'], eval_games,
+                            10**6 + seed): trial
+                for trial in survivors
+            }
+            finished = []
+            for future in as_completed(futures):
+                trial = futures[future]
+                try:
+                    result = future.result()
+                except Exception as error:
+                    message = ''.join(traceback.format_exception(error))
+                    print(f"Trial {trial['number']} failed: {error}")
+                    with db:
+                        db.execute('UPDATE trials SET status = ?, rung = ?, error = ? WHERE id = ?',
+                                   ('failed', rung, message, trial['id']))
+                    continue
+                trial['score'] = result['mean_score']
+                finished.append(trial)
+                print(f"Rung {rung} trial {trial['number']}: mean score "
+                      f"{result['mean_score']:.1f} after {timesteps} steps "
+                      f"({result['train_seconds']:.0f}s)")
+                with db:
+                    db.execute(
+                        'INSERT INTO evaluations VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        (trial['id'], rung, timesteps, result['mean_score'],
+                         result['median_score'], result['max_score'], result['win_rate'],
+                         result['max_tile'], result['invalid_move_rate'],
+                         result['train_seconds'], result['eval_seconds'], time.time()))
+                    db.execute('UPDATE trials SET rung = ?, timesteps = ?, score = ? WHERE id = ?',
+                               (rung, timesteps, result['mean_score'], trial['id']))
+
+            if not finished:
+                raise RuntimeError(f"Every trial of rung {rung} failed; see '{database}'")
+            finished.sort(key=lambda trial: trial['score'], reverse=True)
+            last = rung == len(budgets) - 1
+            survivors = finished if last else finished[:math.ceil(len(finished) / eta)]
+            with db:
+                db.executemany('UPDATE trials SET status = ? WHERE id = ?',
+                               [('stopped', trial['id']) for trial in finished[len(survivors):]])
+            print(f"Rung {rung} done in {time.perf_counter() - start:.0f}s, "
+                  f"{len(survivors)} of {len(finished)} trials "
+                  f"{'finished' if last else 'continue'}")
+
+    with db:
+        db.executemany('UPDATE trials SET status = ? WHERE id = ?',
+                       [('completed', trial['id']) for trial in survivors])
+    db.close()
+    best = survivors[0]
+    print(f"Best trial {best['number']}: mean score {best['score']:.1f} with {best['params']}")
+    print(f"Model: '{os.path.join(best['run_dir'], 'dqn_2048_enhanced.zip')}'")
+    return best
+
+
+def print_sweep(database, name=None):
+    """Print the trials of a recorded sweep (the latest one by default)"""
+    db = sqlite3.connect(database)
+    if name is None:
+        row = db.execute('SELECT id, name FROM sweeps ORDER BY id DESC LIMIT 1').fetchone()
+    else:
+        row = db.execute('SELECT id, name FROM sweeps WHERE name = ?', (name,)).fetchone()
+    if row is None:
+        raise ValueError(f"No sweep '{name}' recorded in '{database}'" if name
+                         else f"No sweep recorded in '{database}'")
+    sweep_id, name = row
+    print(f"Sweep '{name}'")
+    rows = db.execute('SELECT number, status, timesteps, score, params FROM trials '
+                      'WHERE sweep_id = ? ORDER BY timesteps DESC, score DESC', (sweep_id,))
+    for number, status, timesteps, score, params in rows:
+        score = f"{score:9.1f}" if score is not None else ' ' * 9
+        print(f"  trial {number:3d} {status:9s} {timesteps:8d} steps {score}  {params}")
+    db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Parallel DQN hyperparameter sweep with successive halving")
+    parser.add_argument('--space', default=None,
+                        help="JSON file with the search space (default DEFAULT_SPACE)")
+    parser.add_argument('--trials', type=int, default=9)
+    parser.add_argument('--min-timesteps', type=int, default=20000,
+                        help="training steps of the first rung")
+    parser.add_argument('--max-timesteps', type=int, default=180000,
+                        help="training steps of the trials that reach the last rung")
+    parser.add_argument('--eta', type=int, default=3,
+                        help="keep the best 1/eta trials of each rung, training eta times longer")
+    parser.add_argument('--workers', type=int, default=3, help="trials trained at once")
+    parser.add_argument('--threads', type=int, default=1, help="CPU threads per trial")
+    parser.add_argument('--eval-games', type=int, default=50,
+                        help="games played to score a trial after each rung")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='sweeps', help="directory for the trial runs")
+    parser.add_argument('--db', default=None, help="SQLite database (default <out>/sweeps.db)")
+    parser.add_argument('--name', default=None, help="sweep name (default: start time)")
+    parser.add_argument('--show', action='store_true',
+                        help="print the trials of sweep --name (or the latest) and exit")
+    args = parser.parse_args()
+
+    if args.show:
+        print_sweep(args.db or os.path.join(args.out, 'sweeps.db'), args.name)
+    else:
+        space = None
+        if args.space:
+            with open(args.space) as f:
+                space = json.load(f)
+        run_sweep(space, num_trials=args.trials, min_timesteps=args.min_timesteps,
+                  max_timesteps=args.max_timesteps, eta=args.eta, workers=args.workers,
+                  threads=args.threads, eval_games=args.eval_games, seed=args.seed,
+                  out_dir=args.out, database=args.db, name=args.name)
@@ -1,106 +1,81 @@
-from rl_env import Game2048RLEnv
-from stable_baselines3 import DQN
+import json
 import time
-import numpy as np
 
-def test_trained_agent():
-    # Load trained model
+from display import IncrementalRenderer
+from evaluate import choose_action, evaluate, load_dqn, make_player, print_report
+from rl_env import Game2048RLEnv
+
+def test_trained_agent(player='dqn', num_games=1000, workers=4, seed=0,
+                       report_file='evaluation_report.json', **player_kwargs):
+    """Headless statistics over many seeded games, written as a JSON report"""
+    report = evaluate(player, num_games=num_games, workers=workers, seed=seed,
+                      **player_kwargs)
+    print_report(report)
+    
+    with open(report_file, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to '{report_file}'")
+    return report
+
+def watch_agent(player='dqn', num_games=1, delay=0.3, fps=None, **player_kwargs):
+    """Watch a player move by move, redrawing the board in place
+
+    With delay=0 and fps set, games run at full speed while the board is
+    redrawn at most fps times per second (spectator mode).
+    """
     env = Game2048RLEnv()
+    model = make_player(player, **player_kwargs)
+    display = IncrementalRenderer(fps=fps)
+    action_names = ['LEFT', 'UP', 'RIGHT', 'DOWN']
+    results = []
     
     try:
-        model = DQN.load("dqn_2048_enhanced")
-        print("Loaded enhanced model")
-    except:
-        try:
-            model = DQN.load("dqn_2048")
-            print("Loaded basic model")
-        except:
-            print("No trained model found! Train the model first.")
-            return
-    
-    # Test statistics
-    scores = []
-    max_tiles = []
-    games_won = 0
-    
-    # Test for multiple episodes
-    num_test_episodes = 10
-    
-    for episode in range(num_test_episodes):
-        obs, info = env.reset()
-        done = False
-        step_count = 0
-        invalid_moves = 0
-        
-        print(f"\n=== Episode {episode + 1}/{num_test_episodes} ===")
-        env.render()
-        
-        while not done and step_count < 1000:  # Prevent infinite loops
-            # Get valid actions
-            valid_actions = env.get_valid_actions()
-            
-            # Predict action
-            action, _ = model.predict(obs, deterministic=True)
+        for episode in range(num_games):
+            obs, info = env.reset()
+            done = False
+            step_count = 0
+            invalid_moves = 0
+            start = time.perf_counter()
+            display.draw(env.game, f"Episode {episode + 1}/{num_games}", force=True)
             
-            # Check if action is valid
-            if action not in valid_actions:
-                print(f"Invalid action {action}, valid actions: {valid_actions}")
-                action = valid_actions[0]  # Use first valid action
-                invalid_moves += 1
-            
-            obs, reward, done, truncated, info = env.step(action)
-            
-            step_count += 1
-            action_names = ['LEFT', 'UP', 'RIGHT', 'DOWN']
-            print(f"Step {step_count}: {action_names[action]}, Reward: {reward:.2f}, Score: {info['score']}")
-            
-            env.render()
-            time.sleep(0.3)  # Pause to watch the game
-            
-            if done or truncated:
-                final_score = info['score']
-                final_max_tile = info['max_tile']
+            while not done:
+                # Predict action
+                action = choose_action(model, env, obs)
                 
-                scores.append(final_score)
-                max_tiles.append(final_max_tile)
+                # Replace invalid actions by the first valid one
+                if not env.action_masks()[action]:
+                    action = env.get_valid_actions()[0]
+                    invalid_moves += 1
                 
-                if final_max_tile >= 2048:
-                    games_won += 1
-                    print("🎉 WON! Reached 2048!")
+                obs, reward, done, truncated, info = env.step(action)
+                step_count += 1
                 
-                print(f"Game Over! Final Score: {final_score}, Max Tile: {final_max_tile}")
-                print(f"Steps taken: {step_count}, Invalid moves: {invalid_moves}")
-                break
-    
-    # Print statistics
-    print(f"\n{'='*50}")
-    print("TESTING RESULTS:")
-    print(f"{'='*50}")
-    print(f"Games played: {num_test_episodes}")
-    print(f"Games won (2048+): {games_won}")
-    print(f"Win rate: {games_won/num_test_episodes*100:.1f}%")
-    print(f"Average score: {np.mean(scores):.2f}")
-    print(f"Best score: {max(scores)}")
-    print(f"Average max tile: {np.mean(max_tiles):.2f}")
-    print(f"Best max tile: {max(max_tiles)}")
-    
-    # Tile achievement breakdown
-    tile_counts = {}
-    for tile in max_tiles:
-        tile_counts[tile] = tile_counts.get(tile, 0) + 1
+                rate = step_count / (time.perf_counter() - start)
+                display.draw(env.game, f"Episode {episode + 1}/{num_games}  Step {step_count}: "
+                                       f"{action_names[action]:5s} Reward: {reward:8.2f}  "
+                                       f"Invalid: {invalid_moves}  {rate:.0f} moves/sec")
+                if delay:
+                    time.sleep(delay)  # Pause to watch the game
+            
+            display.draw(env.game, f"Episode {episode + 1}/{num_games} finished", force=True)
+            results.append((info, step_count, invalid_moves))
+    finally:
+        display.close()
     
-    print(f"\nMax tile achievements:")
-    for tile in sorted(tile_counts.keys(), reverse=True):
-        print(f"  {tile}: {tile_counts[tile]} games ({tile_counts[tile]/num_test_episodes*100:.1f}%)")
+    for info, step_count, invalid_moves in results:
+        if info['max_tile'] >= 2048:
+            print("🎉 WON! Reached 2048!")
+        print(f"Game Over! Final Score: {info['score']}, Max Tile: {info['max_tile']}")
+        print(f"Steps taken: {step_count}, Invalid moves: {invalid_moves}")
+
+def test_single_game_detailed(model_path=None, delay=0.3):
+    """Test a single game with detailed move-by-move analysis
 
-def test_single_game_detailed():
-    """Test a single game with detailed move-by-move analysis"""
+    Pauses delay seconds after each move.
+    """
     env = Game2048RLEnv()
     
-    try:
-        model = DQN.load("dqn_2048_enhanced")
-    except:
-        model = DQN.load("dqn_2048")
+    model = load_dqn(model_path)
     
     obs, info = env.reset()
     done = False
@@ -137,16 +112,15 @@ def test_single_game_detailed():
             print(f"Final max tile: {info['max_tile']}")
             break
         
-        input("Press Enter for next move...")
+        if delay:
+            time.sleep(delay)
 
 if __name__ == "__main__":
-    print("Choose testing mode:")
-    print("1. Test multiple games (statistics)")
-    print("2. Test single game (detailed)")
-    
-    choice = input("Enter choice (1 or 2): ").strip()
-    
-    if choice == "2":
-        test_single_game_detailed()
-    else:
-        test_trained_agent()
+    import sys
+
+    from cli import main as cli_main
+    # python test_agent.py [eval | watch] [options], as `python -m cli eval/watch`;
+    # the detailed single-game mode is `watch --detailed`
+    args = sys.argv[1:]
+    command = args.pop(0) if args and args[0] in ('eval', 'watch') else 'eval'
+    sys.exit(cli_main([command, *args]))
@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from benchmark import sample_states
+from bitboard import BitboardGame2048, PackedBoard, game_afterstates, pack_board, packed_board
+from game2048 import Game2048, make_game
+
+MOVES = ('move_left', 'move_up', 'move_right', 'move_down')
+
+
+def test_board_edits_do_not_desync_the_state():
+    game = BitboardGame2048(np.random.default_rng(0))
+    board = game.board
+    board[1] = [2, 2, 0, 0]
+    board[0][0] = 2048
+    assert game.board != board
+    assert game.board == make_game('bitboard', np.random.default_rng(0)).board
+
+
+def test_board_assignment_sets_the_state():
+    game = BitboardGame2048(np.random.default_rng(0))
+    board = [[0] * 4 for _ in range(4)]
+    board[1] = [2, 2, 0, 0]
+    game.board = board
+    assert game.board == board
+    game.move_left()
+    assert game.board[1] == [4, 0, 0, 0]
+    assert game.score == 4
+
+
+@pytest.mark.parametrize('size', [3, 4, 5])
+def test_bitboard_plays_like_the_classic_game(size):
+    actions = np.random.default_rng(size)
+    for seed in range(5):
+        classic = Game2048(np.random.default_rng(seed), size)
+        bitboard = BitboardGame2048(np.random.default_rng(seed), size)
+        while classic.can_move():
+            assert bitboard.can_move()
+            if actions.random() < 0.5:
+                assert game_afterstates(bitboard) == tuple(
+                    (pack_board(board), gain, moved) for board, gain, moved in classic.afterstates())
+            move = MOVES[actions.integers(4)]
+            moved = getattr(classic, move)()
+            assert getattr(bitboard, move)() == moved
+            if moved:
+                classic.add_new_tile()
+                bitboard.add_new_tile()
+            assert bitboard.board == classic.board
+            assert bitboard.score == classic.score
+            assert bitboard.get_max_tile() == classic.get_max_tile()
+        assert not bitboard.can_move()
+
+
+def test_merging_two_32768_tiles_raises():
+    game = BitboardGame2048(np.random.default_rng(0))
+    board = [[0] * 4 for _ in range(4)]
+    board[0] = [32768, 16384, 16384, 0]
+    game.board = board
+    with pytest.raises(OverflowError):
+        game.move_left()
+
+    board[0] = [32768, 0, 0, 0]
+    board[3] = [32768, 0, 0, 0]
+    with pytest.raises(OverflowError):
+        game.board = board
+
+
+@pytest.mark.parametrize('size', [3, 4, 5, 6])
+def test_legal_moves_match_the_afterstates(size):
+    board = packed_board(size)
+    for state in sample_states(300, seed=size, size=size):
+        moves = sum(1 << action for action, (_, _, moved) in enumerate(board.afterstates(state))
+                    if moved)
+        # The 4x4 board's unrolled function, and the general one for every size
+        assert board.legal_moves(state) == moves
+        assert PackedBoard.legal_moves(board, state) == moves
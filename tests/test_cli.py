@@ -0,0 +1,50 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cli
+
+
+def test_play_startup_stays_within_import_budget():
+    elapsed, modules = cli.measure_startup('play')
+    heavy = [name for name in cli.PLAY_FORBIDDEN_MODULES if name in modules]
+    assert not heavy, f"play imports {heavy}"
+    assert elapsed <= cli.PLAY_IMPORT_BUDGET, (
+        f"play imports take {elapsed * 1000:.1f} ms, "
+        f"over the {cli.PLAY_IMPORT_BUDGET * 1000:.0f} ms budget")
+
+
+def test_parsing_imports_no_command_module():
+    code = ("import sys\n"
+            "import cli\n"
+            "for argv in (['play'], ['train'], ['eval'], ['watch'], ['bench']):\n"
+            "    cli.build_parser().parse_args(argv)\n"
+            "print(' '.join(sorted({name.split('.')[0] for name in sys.modules})))\n")
+    result = subprocess.run([sys.executable, '-c', code], capture_output=True, text=True,
+                            check=True, cwd=os.path.dirname(os.path.abspath(cli.__file__)))
+    modules = set(result.stdout.split())
+    loaded = modules & (set(cli.COMMAND_MODULES.values()) | set(cli.PLAY_FORBIDDEN_MODULES))
+    assert not loaded, f"parsing imports {sorted(loaded)}"
+
+
+def test_check_play_startup_fails_over_budget(capsys):
+    assert not cli.check_play_startup(budget=0.0, repeats=1)
+    assert 'budget 0 ms' in capsys.readouterr().out
+
+
+def test_main_runs_the_command_module(monkeypatch):
+    calls = []
+    monkeypatch.setattr(cli, 'load_command', lambda command: cli.COMMAND_MODULES[command])
+    monkeypatch.setitem(cli.COMMANDS, 'eval', lambda module, args: calls.append((module, args)))
+    assert cli.main(['eval', '--player', 'random', '--games', '3']) == 0
+    (module, args), = calls
+    assert module == 'evaluate' and args.player == 'random' and args.games == 3
+
+
+def test_main_rejects_unsupported_sizes():
+    with pytest.raises(SystemExit):
+        cli.main(['play', '--autoplay', 'expectimax', '--size', '5'])
+    with pytest.raises(SystemExit):
+        cli.main(['train', '--expert-data', 'data', '--size', '3'])
@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from evaluate import evaluate, play_game, play_games_batched, summarize, wilson_interval
+from rl_env import Game2048RLEnv
+
+
+def test_wilson_interval():
+    assert wilson_interval(0, 0) == (0.0, 0.0)
+    low, high = wilson_interval(50, 100)
+    assert low == pytest.approx(0.4038, abs=1e-4) and high == pytest.approx(0.5962, abs=1e-4)
+    # No successes (or no failures) still leaves room on the open side
+    low, high = wilson_interval(0, 20)
+    assert low == 0.0 and 0.0 < high < 0.2
+    low, high = wilson_interval(20, 20)
+    assert 0.8 < low < 1.0 and high == 1.0
+
+
+def test_summarize():
+    games = [{'score': score, 'max_tile': tile, 'won': tile >= 2048, 'steps': 10,
+              'invalid_moves': invalid}
+             for score, tile, invalid in ((100, 128, 0), (300, 2048, 1), (200, 256, 1))]
+    report = summarize(games, elapsed=2.0)
+    assert report['score']['median'] == 200 and report['score']['max'] == 300
+    assert report['max_tile_counts'] == {'2048': 1, '256': 1, '128': 1}
+    assert report['win_rate'] == pytest.approx(1 / 3)
+    assert report['invalid_move_rate'] == pytest.approx(2 / 30)
+    assert report['steps_per_sec'] == 15.0
+
+
+def test_games_follow_their_seeds_across_workers():
+    def games(**kwargs):
+        report = evaluate('expectimax', depth=1, max_steps=60, include_games=True, **kwargs)
+        return report['games']
+
+    serial = games(num_games=4, workers=0, seed=5)
+    assert games(num_games=4, workers=2, seed=5, chunk_size=1) == serial
+    # Game i of a run is the game of seed + i in any other run
+    assert games(num_games=1, workers=0, seed=7) == serial[2:3]
+    assert [game['seed'] for game in serial] == [5, 6, 7, 8]
+    assert len({game['score'] for game in serial}) > 1
+
+
+class CountingPlayer:
+    """Deterministic player that counts its predict() calls"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def predict(self, obs, deterministic=True):
+        self.calls += 1
+        obs = np.asarray(obs)
+        # Left, up or right by board, some of them invalid moves
+        actions = obs.reshape(-1, 16).sum(axis=1).astype(np.int64) % 3
+        return (actions if obs.ndim > 1 else actions[0]), None
+
+
+@pytest.mark.parametrize('max_steps', [None, 40])
+def test_batched_games_match_single_games(max_steps):
+    seeds = list(range(7))
+    env = Game2048RLEnv()
+    single = [play_game(CountingPlayer(), env, seed, max_steps, record=True) for seed in seeds]
+
+    player = CountingPlayer()
+    batched = play_games_batched(player, seeds, batch_size=3, max_steps=max_steps, record=True)
+    assert batched == single
+    assert any(game['invalid_moves'] for game in single)
+    # One predict() call per step of the longest-running batch slot
+    assert player.calls < sum(game['steps'] for game in single) / 2
@@ -0,0 +1,34 @@
+import time
+
+import numpy as np
+
+from bitboard import BitboardGame2048
+from expectimax import ExpectimaxAgent
+from rl_env import Game2048RLEnv
+
+
+def test_time_budget_bounds_each_move():
+    agent = ExpectimaxAgent(max_depth=8, time_budget=0.02, workers=0)
+    game = BitboardGame2048(np.random.default_rng(0))
+    times = []
+    for _ in range(20):
+        start = time.perf_counter()
+        action = agent.choose_action(game.state)
+        times.append(time.perf_counter() - start)
+        game._move(action)
+        game.add_new_tile()
+    # Depth 1 of each root move runs without a deadline, hence the slack
+    assert max(times) < 0.1
+
+
+def test_predict_plays_the_board_of_an_observation():
+    agent = ExpectimaxAgent(max_depth=2, workers=0)
+    env = Game2048RLEnv(observation='onehot')
+    obs, _ = env.reset(seed=3)
+    action, _ = agent.predict(obs)
+    assert action == agent.choose_action(env.game.state)
+
+    # A full board without merges has no move; predict still returns one
+    env.game.board = [[2, 4, 2, 4], [4, 2, 4, 2]] * 2
+    action, _ = agent.predict(env._get_observation())
+    assert action == 0
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+import cli
+import train_dqn
+from expert_data import generate_dataset, load_dataset
+
+
+@pytest.mark.parametrize('workers', [0, 1])
+def test_dataset_chains_each_game(tmp_path, workers):
+    paths = generate_dataset(str(tmp_path), 'random', num_games=3, games_per_shard=2,
+                             workers=workers, max_steps=50)
+    assert len(paths) == 2
+    data = load_dataset(str(tmp_path))
+    assert len(data['actions']) == 150
+    # Within a game, each transition starts where the previous one ended
+    ends = np.flatnonzero(data['dones'][:-1])
+    chained = np.ones(len(data['actions']) - 1, dtype=bool)
+    chained[ends] = False
+    chained[[49, 99]] = False
+    assert (data['states'][1:][chained] == data['next_states'][:-1][chained]).all()
+
+
+def test_expert_data_needs_4x4_boards(tmp_path):
+    with pytest.raises(ValueError):
+        train_dqn.train_enhanced_dqn(expert_data=str(tmp_path), size=5)
+    with pytest.raises(SystemExit):
+        cli.main(['train', '--expert-data', str(tmp_path), '--size', '5'])
@@ -0,0 +1,20 @@
+import random
+
+import numpy as np
+
+from game2048 import TileSpawner
+
+
+def test_unseeded_spawners_have_their_own_streams():
+    random.seed(0)
+    first = [TileSpawner().draw(16) for _ in range(20)]
+    random.seed(0)
+    second = [TileSpawner().draw(16) for _ in range(20)]
+    # Reseeding the global random module must not replay the same games
+    assert first != second
+
+
+def test_seeded_spawner_follows_its_generator():
+    spawners = [TileSpawner(np.random.default_rng(7), block_size=16) for _ in range(2)]
+    draws = [[spawner.draw(16) for _ in range(50)] for spawner in spawners]
+    assert draws[0] == draws[1]
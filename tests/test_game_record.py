@@ -0,0 +1,31 @@
+import pytest
+
+from game_record import GameRecord, GameRecordWriter, read_records
+
+
+def write(path, seeds, **kwargs):
+    with GameRecordWriter(path, **kwargs) as writer:
+        for seed in seeds:
+            writer.write(GameRecord(seed, [0, 1, 2, 3] * seed, score=seed))
+
+
+def test_writer_appends_to_an_existing_file(tmp_path):
+    path = str(tmp_path / 'games.grec')
+    write(path, [1, 2])
+    write(path, [3])
+    assert [record.seed for record in read_records(path)] == [1, 2, 3]
+
+    write(path, [4], append=False)
+    assert [record.seed for record in read_records(path)] == [4]
+
+
+def test_append_checks_the_existing_header(tmp_path):
+    path = tmp_path / 'games.grec'
+    write(str(path), [1], spawns=True)
+    with pytest.raises(ValueError):
+        write(str(path), [2])
+
+    path.write_bytes(b'not a record file')
+    with pytest.raises(ValueError):
+        write(str(path), [2])
+    assert path.read_bytes() == b'not a record file'
@@ -0,0 +1,25 @@
+from input_handler import InputHandler
+
+
+def feed(*chunks):
+    handler = InputHandler()
+    for chunk in chunks:
+        handler._feed(chunk)
+    return list(handler.actions)
+
+
+def test_escape_sequences_are_read_to_their_final_byte():
+    assert feed('\x1b[A\x1bOB\x1b[C\x1b[D') == ['up', 'down', 'right', 'left']
+    # Ctrl+Up is not a move, and none of its bytes are read as keys
+    assert feed('\x1b[1;5Aw') == ['up']
+    assert feed('\x1b[1;5A\x1b[1;2D') == []
+
+
+def test_sequences_split_across_reads():
+    assert feed('\x1b', '[', 'B') == ['down']
+    assert feed('\x1b[1;', '5D', 'd') == ['right']
+
+
+def test_lone_escape_keeps_the_next_key():
+    assert feed('\x1bw') == ['up']
+    assert feed('\x1b\x1b[A') == ['up']
@@ -0,0 +1,55 @@
+import numpy as np
+
+from benchmark import sample_states
+from bitboard import move_state
+from ntuple import NTupleAgent, NTupleNetwork, _best_afterstates, train_ntuple
+from observations import unpack_states
+
+
+def boards_of(states):
+    return unpack_states(states).astype(np.uint8).reshape(-1, 4, 4)
+
+
+def test_update_moves_values_towards_the_target():
+    network = NTupleNetwork()
+    boards = boards_of(sample_states(50))
+    # A board whose features all hit different weights moves by exactly
+    # learning_rate * delta
+    board = next(b for b in boards if len(set(network.feature_indices(b[None])[0])) ==
+                 network.num_features)[None]
+    network.update(board, np.array([10.0]), 0.5)
+    assert np.isclose(network.values(board)[0], 5.0)
+
+    # Updates of the same weights within a batch are averaged
+    network.update(np.repeat(board, 3, axis=0), np.array([2.0, 2.0, 2.0]), 0.5)
+    assert np.isclose(network.values(board)[0], 6.0)
+
+
+def test_training_is_seeded_and_saves(tmp_path):
+    def train():
+        return train_ntuple(num_games=100, num_envs=16, seed=3, weights_file=None,
+                            plot_file=None, report_every=10 ** 9)
+
+    network, scores, max_tiles = train()
+    assert len(scores) >= 100 and len(max_tiles) == len(scores)
+    assert network.weights.any()
+    again, again_scores, _ = train()
+    assert again_scores == scores
+    assert (again.weights == network.weights).all()
+
+    path = str(tmp_path / 'ntuple.bin')
+    network.save(path)
+    loaded = NTupleNetwork.load(path)
+    assert loaded.tuples == network.tuples
+    assert (loaded.weights == network.weights).all()
+
+
+def test_agent_plays_the_greedy_afterstate():
+    network, _, _ = train_ntuple(num_games=50, num_envs=16, weights_file=None,
+                                 plot_file=None, report_every=10 ** 9)
+    agent = NTupleAgent(network)
+    states = sample_states(100, seed=1)
+    afterstates, _, _ = _best_afterstates(network, boards_of(states))
+    for state, afterstate in zip(states, afterstates):
+        action = agent.choose_action(state)
+        assert (boards_of([move_state(state, action)[0]]) == afterstate).all()
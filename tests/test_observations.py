@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from benchmark import sample_states
+from observations import (OBSERVATION_ENCODERS, encoder_for_space, make_encoder,
+                          observation_to_state, pack_observations, state_exponents)
+
+
+@pytest.mark.parametrize('observation', list(OBSERVATION_ENCODERS))
+def test_encodings_round_trip(observation):
+    encoder = make_encoder(observation)
+    states = sample_states(200)
+    encoded = [encoder.encode(state).copy() for state in states]
+    batch = encoder.encode_batch(np.array(states, dtype=np.uint64))
+    assert batch.shape == (len(states),) + encoder.observation_space.shape
+    assert batch.dtype == encoder.observation_space.dtype
+    assert (batch == np.array(encoded)).all()
+    assert [observation_to_state(obs) for obs in encoded] == states
+    assert pack_observations(batch).tolist() == states
+    assert type(encoder_for_space(encoder.observation_space)) is type(encoder)
+
+
+def test_encoders_reuse_their_buffer():
+    encoder = make_encoder('onehot')
+    first, second = sample_states(2)
+    obs = encoder.encode(first)
+    assert encoder.encode(second) is obs
+    assert observation_to_state(obs) == second
+
+
+@pytest.mark.parametrize('observation', ['log2', 'onehot'])
+def test_boards_beyond_64_bits(observation):
+    encoder = make_encoder(observation, 5)
+    for state in sample_states(50, size=5):
+        obs = encoder.encode(state)
+        assert observation_to_state(obs) == state
+        exponents = obs.argmax(axis=0).reshape(-1) if observation == 'onehot' else obs
+        assert list(exponents) == state_exponents(state, 5)
+    with pytest.raises(ValueError):
+        make_encoder('packed', 5)
@@ -0,0 +1,128 @@
+from copy import deepcopy
+
+import numpy as np
+import pytest
+import torch
+from stable_baselines3.common.buffers import ReplayBuffer
+
+from benchmark import sample_states
+from bitboard import packed_board
+from observations import pack_observations
+from replay_buffer import CompactReplayBuffer, MemmapReplayBuffer
+from rl_env import Game2048RLEnv
+
+
+def collect(buffers, num_envs, steps, seed=0, observation='log2'):
+    """Feed buffers the transitions of random games, as DQN stores them"""
+    envs = [Game2048RLEnv(observation=observation) for _ in range(num_envs)]
+    obs = np.array([env.reset(seed=seed + i)[0] for i, env in enumerate(envs)])
+    rng = np.random.default_rng(seed)
+    for _ in range(steps):
+        actions = np.array([rng.choice(env.get_valid_actions()) for env in envs])
+        next_obs, new_obs, rewards, dones = [], [], [], []
+        for env, action in zip(envs, actions):
+            observation_, reward, done, truncated, info = env.step(action)
+            # The final board of a game is stored; the next game starts anew
+            next_obs.append(observation_)
+            new_obs.append(env.reset()[0] if done else observation_)
+            rewards.append(reward)
+            dones.append(done)
+        for buffer in buffers:
+            buffer.add(obs, np.array(next_obs), actions, np.array(rewards), np.array(dones),
+                       [{} for _ in envs])
+        obs = np.array(new_obs)
+
+
+@pytest.mark.parametrize('observation', ['log2', 'onehot'])
+@pytest.mark.parametrize('steps', [300, 1000])
+def test_samples_match_sb3_replay_buffer(observation, steps):
+    space = Game2048RLEnv(observation=observation)
+    args = (500, space.observation_space, space.action_space, 'cpu', 2)
+    reference, compact = ReplayBuffer(*args), CompactReplayBuffer(*args)
+    collect([reference, compact], 2, steps, observation=observation)
+    assert compact.next_state_overrides
+
+    for seed in range(5):
+        np.random.seed(seed)
+        expected = reference.sample(256)
+        np.random.seed(seed)
+        samples = compact.sample(256)
+        for name, values in expected._asdict().items():
+            if values is not None:
+                assert torch.equal(getattr(samples, name), values), name
+
+
+def test_extend_keeps_the_next_board_of_each_transition():
+    space = Game2048RLEnv().observation_space
+    compact = CompactReplayBuffer(200, space, Game2048RLEnv().action_space, 'cpu', 2)
+    collect([compact], 2, 30)
+
+    states = np.arange(1, 91, dtype=np.uint64)
+    next_states = states + 1
+    dones = np.zeros(90, dtype=bool)
+    # Game ends, where the next transition starts a new board
+    for end in (10, 44, 60):
+        next_states[end] = 1000 + end
+        dones[end] = True
+    added = compact.extend(states, np.zeros(90), np.zeros(90), next_states, dones)
+    assert added == 90
+
+    rows = (30 + np.arange(45)) % 100
+    for env in range(2):
+        found = compact.next_states_of(rows, np.full(45, env))
+        assert (found == next_states[45 * env:45 * (env + 1)]).all()
+
+
+def test_augmented_samples_stay_consistent():
+    env = Game2048RLEnv()
+    buffer = CompactReplayBuffer(1000, env.observation_space, env.action_space, 'cpu',
+                                 augment=True)
+    board = packed_board(4)
+    rng = np.random.default_rng(0)
+    states, actions, next_states = [], [], []
+    for state in sample_states(300):
+        action = int(rng.choice([a for a, (_, _, moved) in enumerate(board.afterstates(state))
+                                 if moved]))
+        states.append(state)
+        actions.append(action)
+        # The afterstate, so that each sample can be checked by moving
+        next_states.append(board.move_state(state, action)[0])
+    buffer.extend(states, actions, np.zeros(300), next_states, np.zeros(300, dtype=bool))
+
+    np.random.seed(0)
+    samples = buffer.sample(512)
+    sampled = zip(pack_observations(samples.observations.numpy()).tolist(),
+                  samples.actions.numpy().reshape(-1).tolist(),
+                  pack_observations(samples.next_observations.numpy()).tolist())
+    transformed = 0
+    for state, action, next_state in sampled:
+        assert board.move_state(state, action)[0] == next_state
+        transformed += state not in states
+    assert transformed > 300
+
+
+def test_memmap_buffer_resumes_from_its_files(tmp_path):
+    env = Game2048RLEnv()
+    args = (400, env.observation_space, env.action_space, 'cpu', 2)
+    run_dir = str(tmp_path / 'replay')
+    compact = CompactReplayBuffer(*args)
+    memmap = MemmapReplayBuffer(*args, run_dir=run_dir, flush_every=50)
+    collect([compact, memmap], 2, 300)
+    memmap.flush()
+    del memmap
+
+    resumed = MemmapReplayBuffer(*args, run_dir=run_dir)
+    assert (resumed.pos, resumed.full) == (compact.pos, compact.full)
+    assert resumed.next_state_overrides == compact.next_state_overrides
+    for name in ('states', 'actions', 'rewards', 'dones', 'last_next_states'):
+        assert (getattr(resumed, name) == getattr(compact, name)).all(), name
+    rows, envs = np.divmod(np.arange(400), 2)
+    assert (resumed.next_states_of(rows, envs) == compact.next_states_of(rows, envs)).all()
+
+    # A checkpointed copy keeps its own position
+    copy = deepcopy(resumed)
+    collect([resumed], 2, 10, seed=1)
+    assert copy.pos == compact.pos and resumed.pos != compact.pos
+
+    with pytest.raises(ValueError):
+        MemmapReplayBuffer(800, *args[1:], run_dir=run_dir)
@@ -0,0 +1,47 @@
+from bitboard import BitboardGame2048, packed_board
+from observations import observation_to_state
+from rl_env import Game2048RLEnv
+
+
+def test_step_does_not_decode_the_bitboard(monkeypatch):
+    env = Game2048RLEnv(profile=True)
+    env.reset(seed=0)
+
+    def decode(game):
+        raise AssertionError("step() decoded the board")
+
+    monkeypatch.setattr(BitboardGame2048, 'board', property(decode))
+    for action in range(4):
+        env.step(action)
+    assert 'copy' not in env.get_profile()
+
+
+def test_info_action_masks_are_kept_per_step():
+    env = Game2048RLEnv(action_mask_in_info=True)
+    env.reset(seed=1)
+    infos = []
+    masks = []
+    done = False
+    while not done:
+        action = env.get_valid_actions()[0]
+        _, _, done, _, info = env.step(action)
+        infos.append(info)
+        masks.append(env.action_masks().tolist())
+    assert [info['action_mask'].tolist() for info in infos] == masks
+    assert len({tuple(mask) for mask in masks}) > 1
+
+
+def test_terminal_observation_survives_the_reset():
+    from stable_baselines3.common.vec_env import DummyVecEnv
+
+    venv = DummyVecEnv([Game2048RLEnv])
+    venv.seed(2)
+    venv.reset()
+    dones = [False]
+    while not dones[0]:
+        action = venv.envs[0].get_valid_actions()[0]
+        obs, _, dones, infos = venv.step([action])
+    # The final board has no legal move, unlike the new game's first board
+    terminal = observation_to_state(infos[0]['terminal_observation'])
+    assert packed_board(4).legal_moves(terminal) == 0
+    assert packed_board(4).legal_moves(observation_to_state(obs[0])) != 0
@@ -0,0 +1,96 @@
+from concurrent.futures import Future
+import json
+import sqlite3
+
+import numpy as np
+import pytest
+
+import sweep
+
+
+class InlinePool:
+    """ProcessPoolExecutor stand-in running every trial in the test process"""
+
+    def __init__(self, **kwargs):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def submit(self, fn, *args):
+        future = Future()
+        try:
+            future.set_result(fn(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+
+def test_rung_timesteps():
+    assert sweep.rung_timesteps(100, 900, eta=3) == [100, 300, 900]
+    assert sweep.rung_timesteps(100, 500, eta=3) == [100, 300, 500]
+    assert sweep.rung_timesteps(100, 100) == [100]
+
+
+def test_sample_params_follow_the_space():
+    space = {'learning_rate': {'low': 1e-4, 'high': 1e-2, 'log': True},
+             'gradient_steps': {'low': 1, 'high': 8, 'int': True},
+             'gamma': [0.9, 0.99]}
+    draws = [sweep.sample_params(space, np.random.default_rng(seed)) for seed in range(20)]
+    for params in draws:
+        assert 1e-4 <= params['learning_rate'] <= 1e-2
+        assert isinstance(params['gradient_steps'], int) and 1 <= params['gradient_steps'] <= 8
+        assert params['gamma'] in (0.9, 0.99)
+    assert sweep.sample_params(space, np.random.default_rng(3)) == draws[3]
+    with pytest.raises(ValueError, match='not_a_key'):
+        sweep.check_space({'not_a_key': [1]})
+
+
+def test_successive_halving(tmp_path, monkeypatch):
+    # A trial scores its learning rate, so the ranking is known; trial 2 fails
+    calls = []
+
+    def run_trial(run_dir, params, timesteps, max_timesteps, seed, eval_games, eval_seed):
+        calls.append((run_dir, timesteps))
+        if run_dir.endswith('trial_002'):
+            raise RuntimeError('diverged')
+        return {'timesteps': timesteps, 'mean_score': params['learning_rate'] * 1e6,
+                'median_score': 0.0, 'max_score': 0, 'win_rate': 0.0, 'max_tile': 0,
+                'invalid_move_rate': 0.0, 'train_seconds': 0.0, 'eval_seconds': 0.0}
+
+    monkeypatch.setattr(sweep, 'ProcessPoolExecutor', InlinePool)
+    monkeypatch.setattr(sweep, '_run_trial', run_trial)
+    space = {'learning_rate': {'low': 1e-4, 'high': 1e-3}}
+    best = sweep.run_sweep(space, num_trials=10, min_timesteps=100, max_timesteps=900, eta=3,
+                           seed=1, out_dir=str(tmp_path), name='test')
+
+    # 10 trials, 9 of them scored, the best ceil(9/3) = 3 then 1 continue
+    assert [sum(1 for _, steps in calls if steps == budget) for budget in (100, 300, 900)] \
+        == [10, 3, 1]
+    db = sqlite3.connect(tmp_path / 'sweeps.db')
+    trials = db.execute('SELECT number, params, status, rung, timesteps, score FROM trials '
+                        'ORDER BY number').fetchall()
+    rates = {number: json.loads(params)['learning_rate'] for number, params, *_ in trials}
+    ranked = sorted((number for number in rates if number != 2), key=rates.get, reverse=True)
+    assert best['number'] == ranked[0]
+    status = {number: (status, rung, timesteps) for number, _, status, rung, timesteps, _ in trials}
+    assert status[2] == ('failed', 0, 0)
+    assert status[ranked[0]] == ('completed', 2, 900)
+    assert [status[number] for number in ranked[1:3]] == [('stopped', 1, 300)] * 2
+    assert all(status[number] == ('stopped', 0, 100) for number in ranked[3:])
+    assert db.execute('SELECT COUNT(*) FROM evaluations').fetchone()[0] == 9 + 3 + 1
+    db.close()
+
+
+def test_sweep_fails_when_a_whole_rung_fails(tmp_path, monkeypatch):
+    def run_trial(*args):
+        raise RuntimeError('out of memory')
+
+    monkeypatch.setattr(sweep, 'ProcessPoolExecutor', InlinePool)
+    monkeypatch.setattr(sweep, '_run_trial', run_trial)
+    with pytest.raises(RuntimeError, match='rung 0'):
+        sweep.run_sweep({'gamma': [0.9]}, num_trials=2, min_timesteps=100, max_timesteps=300,
+                        out_dir=str(tmp_path), name='test')
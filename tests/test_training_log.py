@@ -0,0 +1,46 @@
+import csv
+import os
+
+import train_dqn
+from checkpoint import latest_checkpoint, list_checkpoints, load_checkpoint
+
+# A small, fast network that starts learning almost at once
+HYPERPARAMS = dict(learning_starts=100, net_arch=[32], gradient_steps=1,
+                   target_update_interval=200)
+
+
+def read_log(filename):
+    with open(filename, newline='') as f:
+        return list(csv.DictReader(f))
+
+
+def train(**kwargs):
+    train_dqn.train_enhanced_dqn(buffer_size=2000, checkpoint_freq=500, keep_checkpoints=3,
+                                 hyperparams=HYPERPARAMS, seed=0, progress_bar=False, **kwargs)
+
+
+def test_resume_keeps_only_this_runs_episodes(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(train_dqn, 'plot_episode_log', lambda *args, **kwargs: None)
+    # An earlier run's log, which the new run must not mix with its own
+    with open('training_episodes.csv', 'w') as f:
+        f.write('episode,timestep,score,max_tile,reward,length,invalid_moves,wall_time\n')
+        for episode in range(1, 4):
+            f.write(f'{episode},{episode * 100},99999,2048,0.0,100,0,1.0\n')
+
+    train(total_timesteps=1500)
+    first_run = read_log('training_episodes.csv')
+    assert [int(row['episode']) for row in first_run] == list(range(1, len(first_run) + 1))
+    assert all(row['score'] != '99999' for row in first_run)
+
+    # Resume from the middle checkpoint, as if the run had stopped after it
+    os.remove(latest_checkpoint('checkpoints'))
+    checkpoint = load_checkpoint(list_checkpoints('checkpoints')[-1])
+    kept = checkpoint['callbacks'][0]['num_episodes']
+    assert 0 < kept < len(first_run)
+    train(resume=True)
+
+    resumed = read_log('training_episodes.csv')
+    assert [int(row['episode']) for row in resumed] == list(range(1, len(resumed) + 1))
+    assert resumed[:kept] == first_run[:kept]
+    assert int(resumed[kept]['timestep']) > checkpoint['attributes']['num_timesteps']
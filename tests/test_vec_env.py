@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+
+from benchmark import sample_states
+from bitboard import packed_board
+from observations import state_exponents
+from rl_env import Game2048RLEnv
+from train_dqn import Game2048VecEnv
+from vec_env import can_move_boards, move_boards, shaped_rewards
+
+MOVES = ('move_left', 'move_up', 'move_right', 'move_down')
+
+
+def to_boards(states, size):
+    return np.array([state_exponents(state, size) for state in states],
+                    dtype=np.uint8).reshape(-1, size, size)
+
+
+# 6x6 boards have no move tables and slide their lines directly
+@pytest.mark.parametrize('size', [3, 4, 6])
+def test_moves_and_rewards_match_the_scalar_env(size):
+    states = sample_states(200, seed=size, size=size)
+    actions = np.random.default_rng(size).integers(4, size=len(states))
+    prev_boards = to_boards(states, size)
+    boards, gains, moved = move_boards(prev_boards, actions)
+    rewards = shaped_rewards(prev_boards, boards, gains, moved, np.ones(len(states)))
+
+    board = packed_board(size)
+    env = Game2048RLEnv(size=size)
+    env.reset(seed=0)
+    new_states, expected_gains, expected_rewards = [], [], []
+    for state, action in zip(states, actions.tolist()):
+        env.game.state = state
+        env.game.score = 0
+        prev_max_tile = env.game.get_max_tile()
+        env_moved = getattr(env.game, MOVES[action])()
+        expected_rewards.append(env._calculate_enhanced_reward(env_moved, 0, prev_max_tile))
+        new_states.append(env.game.state)
+        expected_gains.append(env.game.score)
+    assert (boards == to_boards(new_states, size)).all()
+    assert gains.tolist() == expected_gains
+    assert moved.tolist() == [new != old for new, old in zip(new_states, states)]
+    assert np.allclose(rewards, expected_rewards)
+    assert can_move_boards(prev_boards).tolist() == [board.can_move(s) for s in states]
+
+
+def test_vec_env_resets_finished_games():
+    def play(seed):
+        venv = Game2048VecEnv(8)
+        venv.seed(seed)
+        observations = [venv.reset()]
+        finals = []
+        actions = np.random.default_rng(seed).integers(4, size=(300, 8))
+        for step_actions in actions:
+            obs, rewards, dones, infos = venv.step(step_actions)
+            observations.append(obs)
+            for i in np.flatnonzero(dones):
+                finals.append(infos[i]['terminal_observation'])
+                # A new game starts with two tiles
+                assert np.count_nonzero(obs[i]) == 2
+        return np.array(observations), np.array(finals)
+
+    observations, finals = play(0)
+    assert len(finals) > 0
+    assert not can_move_boards(finals.reshape(-1, 4, 4).astype(np.uint8)).any()
+    again, _ = play(0)
+    assert (again == observations).all()
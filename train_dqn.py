@@ -1,123 +1,370 @@
 import gymnasium as gym
 from stable_baselines3 import DQN
+from stable_baselines3.common.buffers import ReplayBuffer
 from stable_baselines3.common.env_checker import check_env
 from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.vec_env import VecEnv
 from rl_env import Game2048RLEnv
+from vec_env import VectorGame2048Env
+from checkpoint import AsyncCheckpointCallback, latest_checkpoint, load_checkpoint, restore_state
+from expert_data import behaviour_cloning, prefill_replay_buffer
+from metrics import EpisodeLogWriter, RingBuffer, truncate_episode_log
+from profiling import merge_summaries
+from replay_buffer import CompactReplayBuffer, MemmapReplayBuffer
+from progress import plot_episode_log, print_progress
+import copy
 import numpy as np
-import matplotlib.pyplot as plt
+import os
+import time
+import torch
+
+# Settings of the DQN built by train_enhanced_dqn; pass any of them in its
+# hyperparams dict (or --hyperparams) to override
+DEFAULT_HYPERPARAMS = {
+    'learning_rate': 5e-4,            # Higher learning rate
+    'gamma': 0.95,                    # Lower discount for immediate rewards
+    'batch_size': 128,                # Larger batch size
+    'tau': 1.0,
+    'train_freq': 4,
+    'gradient_steps': 2,              # More gradient steps per update
+    'target_update_interval': 5000,   # More frequent target updates
+    'learning_starts': 10000,         # Start learning after more steps
+    'exploration_fraction': 0.4,      # Longer exploration phase
+    'exploration_initial_eps': 1.0,
+    'exploration_final_eps': 0.1,     # Higher final exploration
+    'net_arch': [512, 512, 256, 128], # Larger network
+}
+
 
 class TrainingCallback(BaseCallback):
-    def __init__(self, check_freq: int, verbose=1):
+    """Track every finished episode and report rolling statistics
+
+    Episode outcomes go into ring buffers of the last `window` episodes and,
+    when episode_log is set, are streamed row by row to that CSV/Parquet
+    file by a background writer (see metrics.EpisodeLogWriter).
+    """
+
+    def __init__(self, check_freq: int, verbose=1, log_profile=False,
+                 episode_log='training_episodes.csv', window=100):
         super(TrainingCallback, self).__init__(verbose)
         self.check_freq = check_freq
-        self.scores = []
-        self.max_tiles = []
-        self.episode_rewards = []
-        self.invalid_move_counts = []
-        
+        # Record env step() phase timings (envs created with profile=True)
+        self.log_profile = log_profile
+        self.episode_log = episode_log
+        self.window = window
+        self.scores = RingBuffer(window)
+        self.max_tiles = RingBuffer(window)
+        self.episode_rewards = RingBuffer(window)
+        self.episode_lengths = RingBuffer(window)
+        self.invalid_move_counts = RingBuffer(window)
+        self.num_episodes = 0
+        self._writer = None
+        self._rewards = None
+        self._elapsed = 0.0
+        # Set by load_state(): continue the episode log instead of replacing it
+        self._resumed = False
+
+    def _on_training_start(self) -> None:
+        if self._rewards is None:
+            num_envs = self.training_env.num_envs
+            self._rewards = np.zeros(num_envs, dtype=np.float64)
+            self._lengths = np.zeros(num_envs, dtype=np.int64)
+            self._invalid = np.zeros(num_envs, dtype=np.int64)
+        self._start_time = time.time() - self._elapsed
+        if self.episode_log:
+            self._writer = EpisodeLogWriter(self.episode_log, append=self._resumed)
+
     def _on_step(self) -> bool:
+        infos = self.locals['infos']
+        self._rewards += self.locals['rewards']
+        self._lengths += 1
+        self._invalid += [not info.get('moved', True) for info in infos]
+
+        for i in np.flatnonzero(self.locals['dones']):
+            self._record_episode(i, infos[i])
+
         if self.n_calls % self.check_freq == 0:
-            # Get info from the last episode
-            if len(self.locals.get('infos', [])) > 0:
-                info = self.locals['infos'][0]
-                if 'score' in info:
-                    self.scores.append(info['score'])
-                    self.max_tiles.append(info['max_tile'])
-                    
-                    if len(self.scores) >= 100:
-                        avg_score = np.mean(self.scores[-100:])
-                        avg_max_tile = np.mean(self.max_tiles[-100:])
-                        max_tile_achieved = max(self.max_tiles[-100:])
-                        
-                        print(f"Step {self.n_calls}:")
-                        print(f"  Avg Score (last 100): {avg_score:.2f}")
-                        print(f"  Avg Max Tile (last 100): {avg_max_tile:.2f}")
-                        print(f"  Best Max Tile (last 100): {max_tile_achieved}")
-                        print(f"  Exploration Rate: {self.model.exploration_rate:.3f}")
-                        print("-" * 50)
-        
+            if self.log_profile:
+                self._log_profile()
+            if len(self.scores) > 0:
+                self.logger.record('episode/score_mean', self.scores.mean())
+                self.logger.record('episode/max_tile_mean', self.max_tiles.mean())
+                if self.verbose:
+                    print_progress(self.n_calls, self.scores.values(), self.max_tiles.values(),
+                                   exploration_rate=self.model.exploration_rate,
+                                   window=self.window)
+
         return True
 
-def train_enhanced_dqn():
-    # Create environment
-    env = Game2048RLEnv()
+    def _on_training_end(self) -> None:
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+    def get_state(self):
+        """Counters and rolling statistics, for checkpointing"""
+        return copy.deepcopy({
+            'n_calls': self.n_calls,
+            'num_episodes': self.num_episodes,
+            'buffers': (self.scores, self.max_tiles, self.episode_rewards,
+                        self.episode_lengths, self.invalid_move_counts),
+            'episodes_in_progress': (self._rewards, self._lengths, self._invalid),
+            'elapsed': time.time() - self._start_time,
+        })
+
+    def load_state(self, state):
+        """Continue from get_state(), dropping logged episodes recorded after it"""
+        self.n_calls = state['n_calls']
+        self.num_episodes = state['num_episodes']
+        (self.scores, self.max_tiles, self.episode_rewards,
+         self.episode_lengths, self.invalid_move_counts) = state['buffers']
+        self._rewards, self._lengths, self._invalid = state['episodes_in_progress']
+        self._elapsed = state['elapsed']
+        self._resumed = True
+        if self.episode_log and os.path.exists(self.episode_log):
+            truncate_episode_log(self.episode_log, self.num_episodes)
+
+    def _record_episode(self, i, info):
+        """Store the outcome of the episode env i has just finished"""
+        self.num_episodes += 1
+        row = {
+            'episode': self.num_episodes,
+            'timestep': self.num_timesteps,
+            'score': info['score'],
+            'max_tile': info['max_tile'],
+            'reward': float(self._rewards[i]),
+            'length': int(self._lengths[i]),
+            'invalid_moves': int(self._invalid[i]),
+            'wall_time': round(time.time() - self._start_time, 3),
+        }
+        self.scores.append(row['score'])
+        self.max_tiles.append(row['max_tile'])
+        self.episode_rewards.append(row['reward'])
+        self.episode_lengths.append(row['length'])
+        self.invalid_move_counts.append(row['invalid_moves'])
+        if self._writer is not None:
+            self._writer.write(row)
+        self._rewards[i] = 0.0
+        self._lengths[i] = 0
+        self._invalid[i] = 0
     
-    # Check if environment is valid
-    check_env(env)
+    def _log_profile(self):
+        """Record the mean µs/step of each env step() phase to the SB3 logger"""
+        if not self.training_env.has_attr('get_profile'):
+            return
+        profile = merge_summaries(self.training_env.env_method('get_profile'))
+        for phase, stats in profile.items():
+            self.logger.record(f"profile/{phase}_us", stats['mean_us'])
+
+class Game2048VecEnv(VecEnv):
+    """SB3 VecEnv adapter around the NumPy-batched VectorGame2048Env"""
+
+    def __init__(self, num_envs, size=4):
+        self.venv = VectorGame2048Env(num_envs, size=size)
+        super().__init__(num_envs, self.venv.single_observation_space,
+                         self.venv.single_action_space)
+        self._actions = None
+
+    def reset(self):
+        seed = self._seeds[0]
+        obs, _ = self.venv.reset(seed=seed)
+        self._reset_seeds()
+        return obs
+
+    def step_async(self, actions):
+        self._actions = actions
+
+    def step_wait(self):
+        obs, rewards, terminated, truncated, infos = self.venv.step(self._actions)
+        dones = terminated | truncated
+
+        info_list = []
+        for i in range(self.num_envs):
+            info = {
+                'score': int(infos['score'][i]),
+                'max_tile': int(infos['max_tile'][i]),
+                'moved': bool(infos['moved'][i]),
+            }
+            if dones[i]:
+                info['terminal_observation'] = infos['final_obs'][i]
+                info['TimeLimit.truncated'] = bool(truncated[i] and not terminated[i])
+            info_list.append(info)
+
+        return obs, rewards.astype(np.float32), dones, info_list
+
+    def close(self):
+        self.venv.close()
+
+    def get_attr(self, attr_name, indices=None):
+        return [getattr(self.venv, attr_name) for _ in self._get_indices(indices)]
+
+    def set_attr(self, attr_name, value, indices=None):
+        setattr(self.venv, attr_name, value)
+
+    def env_method(self, method_name, *method_args, indices=None, **method_kwargs):
+        method = getattr(self.venv, method_name)
+        return [method(*method_args, **method_kwargs) for _ in self._get_indices(indices)]
+
+    def env_is_wrapped(self, wrapper_class, indices=None):
+        return [False for _ in self._get_indices(indices)]
+
+
+def make_hyperparams(overrides=None):
+    """Merge overrides into the default DQN hyperparameters"""
+    hyperparams = copy.deepcopy(DEFAULT_HYPERPARAMS)
+    if overrides:
+        unknown = set(overrides) - set(hyperparams)
+        if unknown:
+            raise ValueError(f"Unknown hyperparameters: {sorted(unknown)}")
+        hyperparams.update(overrides)
+    return hyperparams
+
+
+def train_enhanced_dqn(num_envs=1, profile=False, buffer_size=200000, augment=False,
+                       replay_dir=None, total_timesteps=None, checkpoint_dir='checkpoints',
+                       checkpoint_freq=50000, keep_checkpoints=3, resume=False,
+                       expert_data=None, pretrain='prefill', size=4, hyperparams=None,
+                       schedule_timesteps=None, seed=None, progress_bar=True):
+    # Resuming continues the latest checkpoint with the settings it was made
+    # with; a total_timesteps given alongside extends (or ends) the run there
+    state = None
+    if resume:
+        path = latest_checkpoint(checkpoint_dir)
+        if path is None:
+            raise FileNotFoundError(f"No checkpoint to resume in '{checkpoint_dir}'")
+        print(f"Resuming from '{path}'")
+        state = load_checkpoint(path)
+        saved = state['config']
+        num_envs, profile, buffer_size, augment, replay_dir = (
+            saved[key] for key in ('num_envs', 'profile', 'buffer_size', 'augment', 'replay_dir'))
+        if total_timesteps is None:
+            total_timesteps = saved['total_timesteps']
+        size = saved.get('size', 4)
+        hyperparams = saved.get('hyperparams')
+        schedule_timesteps = saved.get('schedule_timesteps')
+        seed = saved.get('seed')
+    if total_timesteps is None:
+        total_timesteps = 1000000
+    hyperparams = make_hyperparams(hyperparams)
+    if expert_data and state is None and size != 4:
+        # The datasets hold 4x4 games, and only the compact buffer takes them in bulk
+        raise ValueError(f"--expert-data holds 4x4 games; it cannot warm start size {size}")
+    config = dict(num_envs=num_envs, profile=profile, buffer_size=buffer_size,
+                  augment=augment, replay_dir=replay_dir, total_timesteps=total_timesteps,
+                  size=size, hyperparams=hyperparams, schedule_timesteps=schedule_timesteps,
+                  seed=seed)
     
-    # Create callback for monitoring
-    callback = TrainingCallback(check_freq=5000)
+    # Create environment; several games are batched through NumPy in one env
+    if num_envs > 1:
+        env = Game2048VecEnv(num_envs, size=size)
+    else:
+        env = Game2048RLEnv(profile=profile, size=size)
+        
+        # Check if environment is valid
+        if state is None:
+            check_env(env)
+    
+    # Create callback for monitoring; profile adds per-phase step timings
+    # (profile/<phase>_us) to the SB3 logger output
+    callback = TrainingCallback(check_freq=5000, log_profile=profile)
+    # Periodic checkpoints, written by a background thread
+    checkpoints = AsyncCheckpointCallback(checkpoint_freq, checkpoint_dir, keep_checkpoints,
+                                          callbacks=[callback], config=config)
+    
+    # Replay buffer in RAM, or in memmap files under replay_dir that are
+    # picked up again by the next run with the same replay_dir
+    replay_buffer_kwargs = dict(augment=augment)
+    if size > 4:
+        # Packed uint64 boards hold up to 4x4; store larger boards as observations
+        if replay_dir:
+            raise ValueError("--replay-dir stores boards of up to 4x4 cells")
+        replay_buffer_class = ReplayBuffer
+        replay_buffer_kwargs = {}
+        if augment:
+            print("Board symmetry augmentation needs the compact buffer; disabled")
+    elif replay_dir:
+        replay_buffer_class = MemmapReplayBuffer
+        replay_buffer_kwargs['run_dir'] = replay_dir
+    else:
+        replay_buffer_class = CompactReplayBuffer
+    learning_starts = hyperparams['learning_starts']
+    # SB3 spreads exploration_fraction over the timesteps of this run; rescale
+    # it so the schedule spans schedule_timesteps instead (runs trained in
+    # stages, as by sweep.py, then explore the same way as one long run)
+    exploration_fraction = hyperparams['exploration_fraction']
+    if schedule_timesteps:
+        exploration_fraction *= schedule_timesteps / total_timesteps
     
-    # Create enhanced DQN model
+    # Create enhanced DQN model (see DEFAULT_HYPERPARAMS for the settings)
     model = DQN(
         "MlpPolicy",
         env,
-        learning_rate=5e-4,  # Higher learning rate
-        buffer_size=200000,  # Larger buffer
-        learning_starts=10000,  # Start learning after more steps
-        batch_size=128,  # Larger batch size
-        tau=1.0,
-        gamma=0.95,  # Lower discount for immediate rewards
-        train_freq=4,
-        gradient_steps=2,  # More gradient steps per update
-        target_update_interval=5000,  # More frequent target updates
-        exploration_fraction=0.4,  # Longer exploration phase
-        exploration_initial_eps=1.0,
-        exploration_final_eps=0.1,  # Higher final exploration
+        learning_rate=hyperparams['learning_rate'],
+        buffer_size=buffer_size,  # Larger buffer
+        replay_buffer_class=replay_buffer_class,  # Boards packed to uint64 up to 4x4
+        # augment: random board rotation/reflection per sampled transition
+        replay_buffer_kwargs=replay_buffer_kwargs,
+        learning_starts=learning_starts,
+        batch_size=hyperparams['batch_size'],
+        tau=hyperparams['tau'],
+        gamma=hyperparams['gamma'],
+        train_freq=hyperparams['train_freq'],
+        gradient_steps=hyperparams['gradient_steps'],
+        target_update_interval=hyperparams['target_update_interval'],
+        exploration_fraction=exploration_fraction,
+        exploration_initial_eps=hyperparams['exploration_initial_eps'],
+        exploration_final_eps=hyperparams['exploration_final_eps'],
         policy_kwargs=dict(
-            net_arch=[512, 512, 256, 128],  # Larger network
+            net_arch=list(hyperparams['net_arch']),
             activation_fn=torch.nn.ReLU
         ),
+        seed=seed,
         verbose=1,
         device='auto'  # Use GPU if available
     )
     
+    if state is not None:
+        restore_state(model, state, [callback])
+    else:
+        # Warm start from an expert dataset (see expert_data.py): 'prefill'
+        # the replay buffer, 'bc' behaviour-clone the Q-network, or 'both'
+        if expert_data:
+            if pretrain in ('prefill', 'both'):
+                added = prefill_replay_buffer(model, expert_data)
+                print(f"Replay buffer prefilled with {added} expert transitions")
+            if pretrain in ('bc', 'both'):
+                behaviour_cloning(model, expert_data)
+        # Prefilled or resumed on-disk buffers already hold warm-up transitions
+        buffered = model.replay_buffer.size() * model.replay_buffer.n_envs
+        model.learning_starts = max(0, learning_starts - buffered)
+    
     print("Starting enhanced training...")
     print("This may take 2-6 hours depending on your hardware.")
     print("The agent should start showing better performance after ~50,000 steps.")
     
     # Train the model
     model.learn(
-        total_timesteps=1000000,  # More training steps
-        callback=callback,
-        progress_bar=True
+        total_timesteps=total_timesteps - model.num_timesteps,  # More training steps
+        callback=[callback, checkpoints],
+        reset_num_timesteps=state is None,
+        progress_bar=progress_bar
     )
     
     # Save the model
     model.save("dqn_2048_enhanced")
+    if replay_dir:
+        model.replay_buffer.flush()
     
     print("Enhanced training completed!")
     print("Model saved as 'dqn_2048_enhanced'")
     
-    # Plot training progress
-    if len(callback.scores) > 0:
-        plt.figure(figsize=(15, 5))
-        
-        plt.subplot(1, 3, 1)
-        plt.plot(callback.scores)
-        plt.title('Training Scores')
-        plt.xlabel('Episode')
-        plt.ylabel('Score')
-        
-        plt.subplot(1, 3, 2)
-        plt.plot(callback.max_tiles)
-        plt.title('Max Tiles Achieved')
-        plt.xlabel('Episode')
-        plt.ylabel('Max Tile Value')
-        
-        plt.subplot(1, 3, 3)
-        # Running average
-        if len(callback.scores) >= 50:
-            running_avg = [np.mean(callback.scores[max(0, i-49):i+1]) for i in range(len(callback.scores))]
-            plt.plot(running_avg)
-            plt.title('Running Average Score (50 episodes)')
-            plt.xlabel('Episode')
-            plt.ylabel('Average Score')
-        
-        plt.tight_layout()
-        plt.savefig('training_progress.png')
-        plt.show()
+    # Plot training progress from the episode log (also possible mid-run
+    # with: python progress.py training_episodes.csv)
+    if callback.num_episodes > 0:
+        plot_episode_log(callback.episode_log)
 
 if __name__ == "__main__":
-    import torch
-    train_enhanced_dqn()
+    import sys
+
+    from cli import main as cli_main
+    sys.exit(cli_main(['train', *sys.argv[1:]]))